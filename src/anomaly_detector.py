@@ -0,0 +1,165 @@
+import csv
+import os
+import numpy as np
+import kghb_schema
+import kg_id_dictionary
+
+here = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(here, '../data/evaluation_results/anomaly_state.npz')
+ALERTS_PATH = os.path.join(here, '../data/evaluation_results/anomaly_alerts.csv')
+
+ALERTS_HEADER = ['Analysis date', 'KG id', 'Metric', 'Previous value', 'Value', 'Expected', 'Z-score', 'Severity']
+
+class AnomalyDetector:
+    def __init__(self, metrics=('Availability score', 'Licensing score'), state_path=STATE_PATH, alerts_path=ALERTS_PATH,
+                 alpha=0.3, threshold=3.0, min_std=0.05, min_observations=3):
+        '''
+            Online detection of sudden quality regressions of every KG. For every KG and metric only an exponentially weighted mean and variance,
+            the last value and the number of values seen are kept, in arrays indexed by the dictionary code of the KG (see kg_id_dictionary.py).
+            Every new snapshot is compared with the state and then folded into it, with vectorized operations over all the KGs.
+
+            :param metrics: list of the column names of the metrics to watch.
+            :param state_path: path to the npz file in which the state is persisted.
+            :param alerts_path: path to the csv file in which the alerts are appended.
+            :param alpha: weight of the new value in the exponentially weighted mean and variance.
+            :param threshold: a value is a regression if it is more than threshold standard deviations below the mean.
+            :param min_std: lower bound of the standard deviation, so that a KG that never changed is not flagged for a tiny change.
+            :param min_observations: number of values of a KG needed before its values can be flagged.
+        '''
+        self.metrics = list(metrics)
+        self.state_path = state_path
+        self.alerts_path = alerts_path
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_std = min_std
+        self.min_observations = min_observations
+
+        self.last_date = ''
+        shape = (0, len(self.metrics))
+        self.mean = np.zeros(shape)
+        self.var = np.zeros(shape)
+        self.last = np.full(shape, np.nan)
+        self.count = np.zeros(shape, dtype=np.int32)
+        if os.path.isfile(state_path):
+            self.load()
+
+    def load(self):
+        '''
+            Load the persisted state, the metrics that were not watched before start from an empty state.
+        '''
+        with np.load(self.state_path, allow_pickle=False) as state:
+            stored_metrics = list(state['metrics'])
+            self.last_date = str(state['last_date'])
+            n_kgs = state['mean'].shape[0]
+            self.mean = np.zeros((n_kgs, len(self.metrics)))
+            self.var = np.zeros((n_kgs, len(self.metrics)))
+            self.last = np.full((n_kgs, len(self.metrics)), np.nan)
+            self.count = np.zeros((n_kgs, len(self.metrics)), dtype=np.int32)
+            for index, metric in enumerate(self.metrics):
+                if metric in stored_metrics:
+                    stored = stored_metrics.index(metric)
+                    self.mean[:, index] = state['mean'][:, stored]
+                    self.var[:, index] = state['var'][:, stored]
+                    self.last[:, index] = state['last'][:, stored]
+                    self.count[:, index] = state['count'][:, stored]
+
+    def save(self):
+        '''
+            Persist the state.
+        '''
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        np.savez(self.state_path, metrics=np.array(self.metrics), last_date=np.array(self.last_date),
+                 mean=self.mean, var=self.var, last=self.last, count=self.count)
+
+    def _grow(self, n_kgs):
+        '''
+            Extend the state to the KGs added to the dictionary since the last update.
+        '''
+        missing = n_kgs - self.mean.shape[0]
+        if missing > 0:
+            self.mean = np.vstack([self.mean, np.zeros((missing, len(self.metrics)))])
+            self.var = np.vstack([self.var, np.zeros((missing, len(self.metrics)))])
+            self.last = np.vstack([self.last, np.full((missing, len(self.metrics)), np.nan)])
+            self.count = np.vstack([self.count, np.zeros((missing, len(self.metrics)), dtype=np.int32)])
+
+    def update(self, file_path, save=True):
+        '''
+            Compare a new snapshot with the state, append the regressions to the alerts file and update the state.
+            A snapshot not more recent than the last one processed is skipped. Returns the list of the alerts.
+
+            :param file_path: path to the snapshot.
+            :param save: if True, the state is persisted after the update.
+        '''
+        analysis_date = kghb_schema.snapshot_date(file_path).isoformat()
+        if analysis_date <= self.last_date:
+            print(f"Anomaly detection: {os.path.basename(file_path)} already processed")
+            return []
+
+        kg_ids = kg_id_dictionary.get_dictionary()
+        df = kghb_schema.read_snapshot(file_path, usecols=['KG id'] + self.metrics)
+        codes = kg_ids.encode(df['KG id'])
+        # A KG analyzed twice in the same snapshot keeps its first row
+        codes, first = np.unique(codes, return_index=True)
+        values = df[self.metrics].to_numpy(dtype=float, na_value=np.nan)[first]
+        for index, metric in enumerate(self.metrics):
+            if not kghb_schema.is_comparable(metric, file_path):
+                values[:, index] = np.nan
+        self._grow(len(kg_ids))
+
+        mean = self.mean[codes]
+        var = self.var[codes]
+        count = self.count[codes]
+        observed = ~np.isnan(values)
+
+        # Regressions: values far below the expected one, for the KGs with enough history
+        std = np.maximum(np.sqrt(var), self.min_std)
+        z_scores = np.where(observed, (values - mean) / std, np.nan)
+        flagged = observed & (count >= self.min_observations) & (z_scores <= -self.threshold)
+
+        # Exponentially weighted mean and variance, the first value of a KG initializes its mean
+        difference = np.where(observed, values - mean, 0)
+        increment = self.alpha * difference
+        new_mean = np.where(count > 0, mean + increment, np.where(observed, values, mean))
+        new_var = np.where(count > 0, (1 - self.alpha) * (var + difference * increment), var)
+        self.mean[codes] = np.where(observed, new_mean, mean)
+        self.var[codes] = np.where(observed, new_var, var)
+        previous = self.last[codes]
+        self.last[codes] = np.where(observed, values, previous)
+        self.count[codes] = count + observed
+        self.last_date = analysis_date
+
+        rows, columns = np.nonzero(flagged)
+        alerts = []
+        for row, column in zip(rows, columns):
+            z_score = z_scores[row, column]
+            severity = 'critical' if z_score <= -2 * self.threshold or values[row, column] == 0 else 'warning'
+            alerts.append([analysis_date, kg_ids.index[codes[row]], self.metrics[column], float(previous[row, column]), float(values[row, column]),
+                           float(mean[row, column]), float(z_score), severity])
+        alerts.sort(key=lambda alert: alert[6])
+        self._write_alerts(alerts)
+        if save:
+            self.save()
+        return alerts
+
+    def _write_alerts(self, alerts):
+        if not alerts:
+            return
+        os.makedirs(os.path.dirname(self.alerts_path) or '.', exist_ok=True)
+        new_file = not os.path.isfile(self.alerts_path)
+        with open(self.alerts_path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(ALERTS_HEADER)
+            writer.writerows(alerts)
+
+    def replay(self, file_paths):
+        '''
+            Process a list of snapshots in order of analysis date (e.g. to build the state from the history), saving the state once at the end.
+
+            :param file_paths: list of paths to the snapshots.
+        '''
+        alerts = []
+        for file_path in sorted(file_paths, key=lambda file_path: os.path.basename(file_path)):
+            alerts += self.update(file_path, save=False)
+        self.save()
+        return alerts
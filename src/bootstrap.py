@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+def _batch_statistics(values, uniforms):
+    '''
+        Median and mean of the resamples of a batch, for every metric.
+        A resample is kept as the number of times each KG is drawn: the means are a single matrix product, and the medians are read
+        from the cumulative counts in the sorted order of each metric, without sorting the resamples.
+
+        :param values: 2-D array (KGs x metrics) without missing values.
+        :param uniforms: 2-D array (resamples x KGs) of uniform numbers in [0, 1), turned into the resampling indexes.
+    '''
+    n_resamples = uniforms.shape[0]
+    n_kgs = values.shape[0]
+    indexes = (uniforms[:, :n_kgs] * n_kgs).astype(np.intp)
+    indexes += np.arange(n_resamples)[:, None] * n_kgs
+    counts = np.bincount(indexes.ravel(), minlength=n_resamples * n_kgs).reshape(n_resamples, n_kgs)
+
+    means = counts @ values / n_kgs
+    medians = np.empty((n_resamples, values.shape[1]))
+    # Positions (0-based) of the middle elements of a sorted resample, they are the same if the number of KGs is odd
+    low, high = (n_kgs - 1) // 2, n_kgs // 2
+    for metric in range(values.shape[1]):
+        order = np.argsort(values[:, metric], kind='stable')
+        cumulative = np.cumsum(counts[:, order], axis=1)
+        sorted_values = values[order, metric]
+        medians[:, metric] = (sorted_values[np.argmax(cumulative > low, axis=1)] + sorted_values[np.argmax(cumulative > high, axis=1)]) / 2
+    return medians, means
+
+def bootstrap_ci(values, n_resamples=10000, confidence=0.95, seed=42, n_jobs=1, batch_size=500):
+    '''
+        Percentile bootstrap confidence intervals of the median and of the mean of every column of a matrix.
+        The resamples are drawn once, as a matrix of uniform numbers shared by all the metrics, and the metrics with the same missing values
+        share the same resampling counts. Each batch has its own seed, so the result does not depend on n_jobs.
+
+        :param values: 2-D array (KGs x metrics), NaN for the missing values.
+        :param n_resamples: number of bootstrap resamples.
+        :param confidence: confidence level of the intervals.
+        :param seed: seed of the random generator.
+        :param n_jobs: number of threads among which to split the batches of resamples.
+        :param batch_size: number of resamples evaluated at once, it bounds the memory used (batch_size x KGs x metrics values).
+    '''
+    values = np.asarray(values, dtype=float)
+    n_kgs, n_metrics = values.shape
+    batches = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    uniforms = [np.random.default_rng(batch_seed).random((size, n_kgs)) for batch_seed, size in zip(seeds, batches)]
+
+    # Group the metrics by their missing values, the KGs with a value are compacted at the start of each resample
+    groups = {}
+    for metric in range(n_metrics):
+        valid = ~np.isnan(values[:, metric])
+        groups.setdefault(valid.tobytes(), (valid, []))[1].append(metric)
+
+    medians = np.full((n_resamples, n_metrics), np.nan)
+    means = np.full((n_resamples, n_metrics), np.nan)
+    for valid, metrics in groups.values():
+        if not valid.any():
+            continue
+        group_values = values[valid][:, metrics]
+
+        def run(batch):
+            return _batch_statistics(group_values, uniforms[batch])
+
+        if n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(run, range(len(batches))))
+        else:
+            results = [run(batch) for batch in range(len(batches))]
+        medians[:, metrics] = np.concatenate([result[0] for result in results])
+        means[:, metrics] = np.concatenate([result[1] for result in results])
+
+    alpha = (1 - confidence) / 2
+    median_ci = np.quantile(medians, [alpha, 1 - alpha], axis=0)
+    mean_ci = np.quantile(means, [alpha, 1 - alpha], axis=0)
+    return {'Median': median_ci, 'Mean': mean_ci}
@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+import matplotlib
+import matplotlib.pyplot as plt
+import pandas as pd
+
+INDEX_FILENAME = '.chart_cache.json'
+
+class ChartCache:
+    def __init__(self, renderer_version, formats=(('png', None),), enabled=True):
+        '''
+            Skips the rendering of the charts whose data and parameters did not change since they were last saved.
+            The key of a chart is a hash of its data, its parameters, the renderer version and the output formats, and it is stored
+            in a small index in the chart output folder.
+
+            :param renderer_version: version of the drawing code, to be changed whenever the look of the charts changes.
+            :param formats: list of (format, dpi) in which every chart is saved, e.g. [('png', 100), ('png', 300), ('svg', None)]. dpi None uses the figure dpi.
+            :param enabled: if False, every chart is rendered again.
+        '''
+        self.renderer_version = renderer_version
+        self.formats = [tuple(output_format) for output_format in formats]
+        self.enabled = enabled
+        self.indexes = {}
+
+    def key(self, data, params):
+        '''
+            Return the hash of the data and the parameters of a chart.
+
+            :param data: list of the DataFrames drawn in the chart.
+            :param params: dict with the parameters of the chart (title, labels, ...).
+        '''
+        digest = hashlib.sha256()
+        header = {'renderer': self.renderer_version, 'matplotlib': matplotlib.__version__, 'formats': self.formats, 'params': params}
+        digest.update(json.dumps(header, sort_keys=True, default=str).encode('utf-8'))
+        for df in data:
+            digest.update(json.dumps([str(column) for column in df.columns]).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def output_files(self, output_path):
+        '''
+            Return the files written for a chart, one for each format. The first png keeps the plain name, the other dpis get a suffix (e.g. chart@300dpi.png).
+
+            :param output_path: path of the chart, with or without extension.
+        '''
+        base, extension = os.path.splitext(output_path)
+        if extension not in ('.png', '.svg'):
+            base = output_path
+        files = []
+        seen = set()
+        for output_format, dpi in self.formats:
+            suffix = '' if output_format not in seen else f'@{dpi}dpi'
+            seen.add(output_format)
+            files.append(f'{base}{suffix}.{output_format}')
+        return files
+
+    def _index(self, folder):
+        if folder not in self.indexes:
+            index_path = os.path.join(folder, INDEX_FILENAME)
+            if os.path.isfile(index_path):
+                with open(index_path, 'r', encoding='utf-8') as file:
+                    self.indexes[folder] = json.load(file)
+            else:
+                self.indexes[folder] = {}
+        return self.indexes[folder]
+
+    def is_fresh(self, output_path, key):
+        '''
+            Check if a chart was already saved, in every format, with the same key.
+
+            :param output_path: path of the chart.
+            :param key: key returned by key().
+        '''
+        if not self.enabled:
+            return False
+        index = self._index(os.path.dirname(output_path))
+        if index.get(os.path.basename(output_path)) != key:
+            return False
+        return all(os.path.isfile(file) for file in self.output_files(output_path))
+
+    def save(self, output_path, key, image=None, **savefig_kwargs):
+        '''
+            Save the current pyplot figure in every format, close it and record its key.
+
+            :param output_path: path of the chart.
+            :param key: key returned by key().
+            :param image: RGBA buffer of the figure already rendered by the Agg canvas, the png at the figure dpi is written from it instead of rendering again.
+            :param savefig_kwargs: other arguments for savefig (e.g. bbox_inches).
+        '''
+        figure = plt.gcf()
+        for file, (output_format, dpi) in zip(self.output_files(output_path), self.formats):
+            if image is not None and output_format == 'png' and dpi in (None, figure.dpi) and not savefig_kwargs:
+                plt.imsave(file, image)
+            else:
+                figure.savefig(file, format=output_format, dpi=dpi or 'figure', **savefig_kwargs)
+        plt.close(figure)
+        self.record(output_path, key)
+
+    def record(self, output_path, key):
+        '''
+            Record the key of a chart whose files were written by the caller (e.g. the panels cropped from a grid), so that is_fresh checks it like the others.
+
+            :param output_path: path of the chart.
+            :param key: key returned by key().
+        '''
+        folder = os.path.dirname(output_path)
+        index = self._index(folder)
+        index[os.path.basename(output_path)] = key
+        with open(os.path.join(folder, INDEX_FILENAME), 'w', encoding='utf-8') as file:
+            json.dump(index, file, indent=2, sort_keys=True)
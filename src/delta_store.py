@@ -0,0 +1,262 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import kghb_schema
+import kg_id_dictionary
+import snapshot_archive
+
+here = os.path.dirname(os.path.abspath(__file__))
+DELTA_STORE_PATH = os.path.join(here, '../data/quality_data/delta_store')
+
+# Marker columns of the delta rows that are not cells: KG removed, KG added, full row order
+REMOVED, ADDED, ORDER = -1, -2, -3
+
+DELTA_SCHEMA = pa.schema([('code', pa.int32()), ('column', pa.int16()), ('value', pa.string())])
+
+# The tables are small and have many columns, the arrow schema and the column statistics would take more space than the data
+PARQUET_OPTIONS = {'compression': 'zstd', 'compression_level': 19, 'store_schema': False, 'write_statistics': False}
+
+class DeltaStore:
+    def __init__(self, store_path=DELTA_STORE_PATH, keyframe_interval=8):
+        '''
+            Stores the history of the snapshots as periodic keyframes (full snapshots) plus, for every week, only the cells that changed
+            from the previous snapshot, keyed by the dictionary code of the KG id (see kg_id_dictionary.py).
+            The cells are kept as raw text, so that a reconstructed snapshot is identical to the original csv.
+
+            :param store_path: path to the folder with the keyframes, the deltas and the manifest.
+            :param keyframe_interval: a keyframe is written every keyframe_interval snapshots, it bounds the number of deltas applied to reconstruct a date.
+        '''
+        self.store_path = store_path
+        self.keyframe_interval = keyframe_interval
+        self.manifest_path = os.path.join(store_path, 'manifest.json')
+        self.snapshots = []
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                self.snapshots = json.load(file)['snapshots']
+        self._last = None
+
+    def _save_manifest(self):
+        with open(self.manifest_path, 'w', encoding='utf-8') as file:
+            json.dump({'keyframe_interval': self.keyframe_interval, 'snapshots': self.snapshots}, file, indent=2)
+
+    def dates(self):
+        '''
+            Return the analysis dates in the store, in order.
+        '''
+        return [snapshot['date'] for snapshot in self.snapshots]
+
+    def build(self, source):
+        '''
+            Build the store from scratch with all the snapshots of a folder or an archive.
+
+            :param source: path to the folder or archive with the snapshots (see snapshot_archive.list_snapshots).
+        '''
+        os.makedirs(self.store_path, exist_ok=True)
+        for snapshot in self.snapshots:
+            for kind in ('keyframe', 'delta'):
+                if snapshot.get(kind) and os.path.isfile(os.path.join(self.store_path, snapshot[kind])):
+                    os.remove(os.path.join(self.store_path, snapshot[kind]))
+        self.snapshots = []
+        self._last = None
+        for file_path in snapshot_archive.list_snapshots(source):
+            self.add(file_path, save=False)
+        self._save_manifest()
+        kg_id_dictionary.get_dictionary().save()
+
+    def add(self, file_path, save=True):
+        '''
+            Append a snapshot more recent than the ones already in the store.
+
+            :param file_path: path to the snapshot.
+            :param save: if True, the manifest and the KG id dictionary are saved.
+        '''
+        analysis_date = kghb_schema.snapshot_date(file_path).isoformat()
+        if self.snapshots and analysis_date <= self.snapshots[-1]['date']:
+            raise ValueError(f"The store already has snapshots up to {self.snapshots[-1]['date']}, rebuild it to add {analysis_date}")
+        os.makedirs(self.store_path, exist_ok=True)
+
+        df = kghb_schema.read_snapshot(file_path, raw=True)
+        codes = kg_id_dictionary.get_dictionary().encode(df['KG id'])
+        current = (list(df.columns), codes, {column: df[column].to_numpy(dtype=object) for column in df.columns})
+        raw_bytes = os.path.getsize(file_path) if not snapshot_archive.is_member(file_path) else len(df.to_csv(index=False).encode('utf-8'))
+        # Snapshots with a KG id repeated or missing cannot be keyed by KG, they are always stored whole
+        unique_keys = len(np.unique(codes)) == len(codes) and not df['KG id'].isna().any()
+        record = {'date': analysis_date, 'columns': list(df.columns), 'rows': len(df), 'raw_bytes': raw_bytes, 'unique_keys': bool(unique_keys),
+                  'keyframe': None, 'delta': None}
+
+        if self.snapshots and unique_keys and self.snapshots[-1]['unique_keys']:
+            previous = self._last if self._last is not None and self._last[0] == self.snapshots[-1]['date'] else (self.snapshots[-1]['date'], self._state(self.snapshots[-1]['date']))
+            record['delta'] = f'{analysis_date}.delta.parquet'
+            pq.write_table(self._delta(previous[1], current), os.path.join(self.store_path, record['delta']), **PARQUET_OPTIONS)
+
+        if len(self.snapshots) % self.keyframe_interval == 0 or record['delta'] is None:
+            record['keyframe'] = f'{analysis_date}.keyframe.parquet'
+            table = pa.Table.from_pandas(df, preserve_index=False).append_column('__code', pa.array(codes, pa.int32())).replace_schema_metadata(None)
+            pq.write_table(table, os.path.join(self.store_path, record['keyframe']), **PARQUET_OPTIONS)
+
+        self.snapshots.append(record)
+        self._last = (analysis_date, current)
+        if save:
+            self._save_manifest()
+            kg_id_dictionary.get_dictionary().save()
+
+    def _delta(self, previous, current):
+        '''
+            Compute the cells that changed between two snapshots, as a table of (code, column, value) rows.
+            column is the position of the column in the new snapshot, or one of the markers REMOVED, ADDED and ORDER.
+        '''
+        previous_columns, previous_codes, previous_values = previous
+        columns, codes, values = current
+        position = pd.Index(previous_codes).get_indexer(codes)
+        common = position >= 0
+
+        parts = [
+            (np.setdiff1d(previous_codes, codes), REMOVED, None),
+            (codes[~common], ADDED, None),
+        ]
+        # The row order is stored only if it is not the previous order without the removed KGs followed by the added KGs
+        kept = previous_codes[np.isin(previous_codes, codes)]
+        if not np.array_equal(np.concatenate([kept, codes[~common]]), codes):
+            parts.append((codes, ORDER, None))
+
+        for index, column in enumerate(columns):
+            new_values = values[column]
+            old_values = np.full(len(codes), None, dtype=object)
+            if column in previous_values:
+                old_values[common] = previous_values[column][position[common]]
+            old_na = pd.isna(old_values)
+            new_na = pd.isna(new_values)
+            changed = (old_na != new_na) | (~old_na & ~new_na & (old_values != new_values))
+            if changed.any():
+                parts.append((codes[changed], index, new_values[changed]))
+
+        return pa.table({
+            'code': pa.array(np.concatenate([np.asarray(part_codes, dtype=np.int32) for part_codes, marker, part_values in parts]), pa.int32()),
+            'column': pa.array(np.concatenate([np.full(len(part_codes), marker, dtype=np.int16) for part_codes, marker, part_values in parts]), pa.int16()),
+            'value': pa.array(np.concatenate([part_values if part_values is not None else np.full(len(part_codes), None, dtype=object)
+                                              for part_codes, marker, part_values in parts]), pa.string()),
+        }, schema=DELTA_SCHEMA)
+
+    def _load_keyframe(self, snapshot):
+        table = pq.read_table(os.path.join(self.store_path, snapshot['keyframe']))
+        codes = table.column('__code').to_numpy().astype(np.int32)
+        return (snapshot['columns'], codes, {column: table.column(column).to_numpy(zero_copy_only=False).astype(object) for column in snapshot['columns']})
+
+    def _apply(self, state, snapshot):
+        '''
+            Apply the delta of a snapshot to the state of the previous one.
+        '''
+        previous_columns, previous_codes, previous_values = state
+        delta = pq.read_table(os.path.join(self.store_path, snapshot['delta']))
+        delta_codes = delta.column('code').to_numpy()
+        delta_columns = delta.column('column').to_numpy()
+        delta_values = delta.column('value').to_numpy(zero_copy_only=False)
+
+        removed = delta_codes[delta_columns == REMOVED]
+        added = delta_codes[delta_columns == ADDED]
+        order = delta_codes[delta_columns == ORDER]
+        if len(order) == 0:
+            order = np.concatenate([previous_codes[~np.isin(previous_codes, removed)], added]).astype(np.int32)
+
+        position = pd.Index(previous_codes).get_indexer(order)
+        common = position >= 0
+        values = {}
+        for index, column in enumerate(snapshot['columns']):
+            column_values = np.full(len(order), None, dtype=object)
+            if column in previous_values:
+                column_values[common] = previous_values[column][position[common]]
+            in_column = delta_columns == index
+            if in_column.any():
+                column_values[pd.Index(order).get_indexer(delta_codes[in_column])] = delta_values[in_column]
+            values[column] = column_values
+        return (snapshot['columns'], order, values)
+
+    def _state(self, analysis_date):
+        '''
+            Reconstruct the codes and the values of every column of a snapshot, starting from the closest keyframe before it.
+        '''
+        dates = self.dates()
+        if analysis_date not in dates:
+            raise KeyError(f"No snapshot of {analysis_date} in the store")
+        target = dates.index(analysis_date)
+        start = max(index for index in range(target + 1) if self.snapshots[index]['keyframe'])
+        state = self._load_keyframe(self.snapshots[start])
+        for snapshot in self.snapshots[start + 1:target + 1]:
+            state = self._apply(state, snapshot)
+        return state
+
+    def reconstruct(self, analysis_date):
+        '''
+            Return a snapshot as kghb_schema.read_snapshot(file_path, raw=True) would load it from the original csv.
+
+            :param analysis_date: analysis date in ISO format (e.g. 2024-11-24).
+        '''
+        columns, codes, values = self._state(analysis_date)
+        return pd.DataFrame({column: values[column] for column in columns}, columns=columns)
+
+    def write_csv(self, analysis_date, output_path):
+        '''
+            Write a reconstructed snapshot as csv.
+
+            :param analysis_date: analysis date in ISO format.
+            :param output_path: path to the csv to write.
+        '''
+        self.reconstruct(analysis_date).to_csv(output_path, index=False)
+
+    def scan_deltas(self, columns=None, start=None, end=None):
+        '''
+            Return the changed cells of every snapshot (from start to end, both included) directly from the deltas, without reconstructing the snapshots.
+            One row (Analysis date, KG id, Column, Value) for every cell that changed, Column is 'Presence' (Value 'added' or 'removed') for the KGs that appear or disappear.
+            The first snapshot and the snapshots stored only as keyframes have no delta.
+
+            :param columns: list of the columns to keep, None keeps all of them.
+            :param start: first analysis date in ISO format, None from the first snapshot.
+            :param end: last analysis date in ISO format, None up to the last snapshot.
+        '''
+        kg_index = kg_id_dictionary.get_dictionary().index
+        scans = []
+        for snapshot in self.snapshots:
+            if not snapshot['delta'] or (start and snapshot['date'] < start) or (end and snapshot['date'] > end):
+                continue
+            names = np.array(snapshot['columns'] + ['Presence', 'Presence'], dtype=object)
+            filters = None
+            if columns is not None:
+                wanted = [index for index, column in enumerate(snapshot['columns']) if column in columns] + ([REMOVED, ADDED] if 'Presence' in columns else [])
+                filters = [('column', 'in', wanted)]
+            delta = pq.read_table(os.path.join(self.store_path, snapshot['delta']), filters=filters)
+            delta_columns = delta.column('column').to_numpy()
+            delta = delta.filter(pa.array(delta_columns != ORDER))
+            delta_columns = delta.column('column').to_numpy()
+            markers = {REMOVED: 'removed', ADDED: 'added'}
+            scans.append(pd.DataFrame({
+                'Analysis date': snapshot['date'],
+                'KG id': kg_index[delta.column('code').to_numpy()],
+                'Column': names[delta_columns],
+                'Value': [markers[column] if column < 0 else value for column, value in zip(delta_columns, delta.column('value').to_pylist())],
+            }))
+
+        if not scans:
+            return pd.DataFrame(columns=['Analysis date', 'KG id', 'Column', 'Value'])
+        return pd.concat(scans, ignore_index=True)
+
+    def compression_report(self):
+        '''
+            Return the size of the original csv files, the size of the store and the compression ratio between them.
+        '''
+        raw_bytes = sum(snapshot['raw_bytes'] for snapshot in self.snapshots)
+        keyframe_bytes = sum(os.path.getsize(os.path.join(self.store_path, snapshot['keyframe'])) for snapshot in self.snapshots if snapshot['keyframe'])
+        delta_bytes = sum(os.path.getsize(os.path.join(self.store_path, snapshot['delta'])) for snapshot in self.snapshots if snapshot['delta'])
+        stored_bytes = keyframe_bytes + delta_bytes + os.path.getsize(self.manifest_path)
+        return {
+            'Snapshots': len(self.snapshots),
+            'Keyframes': sum(1 for snapshot in self.snapshots if snapshot['keyframe']),
+            'Raw csv bytes': raw_bytes,
+            'Keyframe bytes': keyframe_bytes,
+            'Delta bytes': delta_bytes,
+            'Stored bytes': stored_bytes,
+            'Compression ratio': raw_bytes / stored_bytes if stored_bytes else np.nan,
+        }
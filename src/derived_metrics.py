@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+import pandas as pd
+import list_metrics_over_time
+
+# A metric derived from the columns of a snapshot: compute receives a DataFrame with the input columns and returns one value per KG.
+DerivedMetric = namedtuple('DerivedMetric', ['inputs', 'compute'])
+
+def _provenance(df):
+    '''
+        P1: 1 if an author or a publisher is indicated in the KG, 0 otherwise.
+    '''
+    publisher = df['Publisher']
+    has_publisher = (publisher != '-') & (publisher != '[]') & (publisher != 'absent')
+    return ((df['Author (metadata)'] != 'False') | has_publisher).astype(int)
+
+def _extensional_conciseness(df):
+    '''
+        CN2: the value is written followed by a description (e.g. "0.97 ..."), only the number is kept.
+    '''
+    return pd.to_numeric(df['Extensional conciseness'].str.split(' ').str[0], errors='coerce')
+
+def list_length(metric):
+    '''
+        Derived metric with the number of elements of a metric that has a list as value (NaN if the value is not a list).
+
+        :param metric: column name of the metric.
+    '''
+    return DerivedMetric([metric], lambda df: list_metrics_over_time.explode_list_column(df[metric])[1])
+
+# The key is also the name of the csv file in which the stats over time are written.
+DERIVED_METRICS = {
+    'P1-Provenance_information': DerivedMetric(['Author (metadata)', 'Publisher'], _provenance),
+    'extensional_conciseness': DerivedMetric(['Extensional conciseness'], _extensional_conciseness),
+    'number_of_vocabularies': list_length('Vocabularies'),
+    'number_of_serialization_formats': list_length('Serialization formats'),
+    'number_of_languages': list_length('Languages (query)'),
+    'number_of_media_types': list_length('metadata-media-type'),
+}
+
+def register(name, inputs, compute):
+    '''
+        Add a derived metric to the registry, it will be computed in the same scan of the other ones.
+
+        :param name: name of the metric, used as csv file name.
+        :param inputs: list of the columns needed to compute the metric.
+        :param compute: function that receives a DataFrame with the input columns and returns a Series with the metric value of every KG.
+    '''
+    DERIVED_METRICS[name] = DerivedMetric(list(inputs), compute)
+
+def get_metrics(names=None):
+    '''
+        Return the registered metrics with the given names, None returns all of them.
+
+        :param names: list of metric names.
+    '''
+    if names is None:
+        return dict(DERIVED_METRICS)
+    return {name: DERIVED_METRICS[name] for name in names}
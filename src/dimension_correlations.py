@@ -0,0 +1,214 @@
+import os
+import numpy as np
+import pandas as pd
+import kghb_schema
+import kg_id_dictionary
+
+here = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.path.join(here, '../data/evaluation_results/dimension_correlations_state.npz')
+EXPORT_PATH = os.path.join(here, '../data/evaluation_results/dimension_correlations.npz')
+
+TOPICS = ['cross-domain','geography','government','life-sciences','linguistic','media','publications','social-networking','user-generated','no-domain','all']
+
+# Sufficient statistics kept for every topic and snapshot, each one a (dimensions x dimensions) matrix over the pairwise complete rows:
+# number of rows, mean of the row dimension, sum of its squared deviations and co-moment of the two dimensions, of the values and of their ranks
+MOMENTS = ['n', 'mean', 'm2', 'comoment', 'rank_mean', 'rank_m2', 'rank_comoment']
+
+def pairwise_moments(values):
+    '''
+        Return the number of rows, the means, the sums of squared deviations and the co-moments of every pair of columns,
+        computed over the rows in which both columns have a value (as pandas.DataFrame.corr does).
+        mean[i, j] and m2[i, j] refer to column i over the rows complete for the pair (i, j).
+
+        :param values: (rows x columns) matrix, NaN for the missing values.
+    '''
+    present = ~np.isnan(values)
+    both = present[:, :, None] & present[:, None, :]
+    n = both.sum(axis=0)
+    filled = np.where(present, values, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.einsum('ri,rij->ij', filled, both) / n
+    # Deviations from the mean of the pair, two passes so that the co-moments are exact
+    deviations = np.where(both, filled[:, :, None] - np.nan_to_num(mean)[None], 0)
+    m2 = (deviations ** 2).sum(axis=0)
+    comoment = (deviations * deviations.transpose(0, 2, 1)).sum(axis=0)
+    return n, mean, m2, comoment
+
+def pairwise_rank_moments(values):
+    '''
+        Same as pairwise_moments, on the ranks of the values (average rank for the ties), as used by the Spearman correlation.
+        The ranks of a pair are taken over the rows complete for that pair, so the pairs with missing values are ranked on their own.
+
+        :param values: (rows x columns) matrix, NaN for the missing values.
+    '''
+    ranks = pd.DataFrame(values).rank().to_numpy()
+    n, mean, m2, comoment = pairwise_moments(ranks)
+    present = ~np.isnan(values)
+    # Only the pairs of columns with different missing rows need their own ranks
+    differ = (present[:, :, None] != present[:, None, :]).any(axis=0)
+    for i, j in zip(*np.nonzero(np.triu(differ, 1))):
+        rows = present[:, i] & present[:, j]
+        pair_n, pair_mean, pair_m2, pair_comoment = pairwise_moments(pd.DataFrame(values[rows][:, [i, j]]).rank().to_numpy())
+        mean[i, j], mean[j, i] = pair_mean[0, 1], pair_mean[1, 0]
+        m2[i, j], m2[j, i] = pair_m2[0, 1], pair_m2[1, 0]
+        comoment[i, j] = comoment[j, i] = pair_comoment[0, 1]
+    return n, mean, m2, comoment
+
+def merge_moments(a, b):
+    '''
+        Merge the pairwise moments of two sets of rows (Chan's parallel formulas), the result is the same as computing them on all the rows.
+
+        :param a: tuple (n, mean, m2, comoment) returned by pairwise_moments.
+        :param b: tuple (n, mean, m2, comoment) returned by pairwise_moments.
+    '''
+    n_a, mean_a, m2_a, comoment_a = a
+    n_b, mean_b, m2_b, comoment_b = b
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(n > 0, n_a * n_b / n, 0)
+        delta = np.where((n_a > 0) & (n_b > 0), mean_b - mean_a, 0)
+        mean = np.where(n_a > 0, np.nan_to_num(mean_a) + delta * n_b / n, mean_b)
+    mean = np.where(n > 0, mean, np.nan)
+    m2 = np.nan_to_num(m2_a) + np.nan_to_num(m2_b) + delta ** 2 * weight
+    comoment = np.nan_to_num(comoment_a) + np.nan_to_num(comoment_b) + delta * np.swapaxes(delta, -1, -2) * weight
+    return n, mean, m2, comoment
+
+def correlation(m2, comoment):
+    '''
+        Return the correlation matrix from the pairwise moments, NaN for the pairs with fewer than two rows or a constant column.
+    '''
+    with np.errstate(invalid='ignore', divide='ignore'):
+        corr = comoment / np.sqrt(m2 * np.swapaxes(m2, -1, -2))
+    corr[~np.isfinite(corr)] = np.nan
+    return np.clip(corr, -1, 1)
+
+class DimensionCorrelations:
+    def __init__(self, dimensions=kghb_schema.DIMENSION_SCORES, topics=TOPICS, state_path=STATE_PATH, only_sparql_up=True):
+        '''
+            Pearson and Spearman correlation matrices of the quality dimensions, for every topic and snapshot.
+            For every topic and snapshot only the sufficient statistics of the pairs of dimensions are kept (see MOMENTS), so a new snapshot
+            is added without reading the previous ones, and the matrices of a period are obtained by merging the statistics of its snapshots.
+
+            :param dimensions: list of the column names of the dimension scores.
+            :param topics: list of the topics, 'all' is the LOD Cloud and 'no-domain' the KGs without a topic.
+            :param state_path: path to the npz file in which the statistics are persisted.
+            :param only_sparql_up: boolean that if True, only the KGs with the SPARQL endpoint online are considered.
+        '''
+        self.dimensions = list(dimensions)
+        self.topics = list(topics)
+        self.state_path = state_path
+        self.only_sparql_up = only_sparql_up
+
+        self.dates = []
+        shape = (len(self.topics), 0, len(self.dimensions), len(self.dimensions))
+        self.moments = {moment: np.zeros(shape) for moment in MOMENTS}
+        if os.path.isfile(state_path):
+            self.load()
+
+    def load(self):
+        '''
+            Load the persisted statistics, the ones computed for other dimensions, topics or KGs selection are discarded.
+        '''
+        with np.load(self.state_path, allow_pickle=False) as state:
+            if list(state['dimensions']) != self.dimensions or list(state['topics']) != self.topics or bool(state['only_sparql_up']) != self.only_sparql_up:
+                print("Dimension correlations: the persisted statistics were computed with other settings, they are computed again")
+                return
+            self.dates = [str(analysis_date) for analysis_date in state['dates']]
+            self.moments = {moment: state[moment] for moment in MOMENTS}
+
+    def save(self):
+        '''
+            Persist the statistics.
+        '''
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        np.savez_compressed(self.state_path, dimensions=np.array(self.dimensions), topics=np.array(self.topics), dates=np.array(self.dates, dtype=str),
+                            only_sparql_up=np.array(self.only_sparql_up), **self.moments)
+
+    def update(self, file_path, save=True):
+        '''
+            Compute the statistics of a snapshot for every topic and add them, replacing the ones of a snapshot with the same analysis date.
+
+            :param file_path: path to the snapshot (by default the canonical ones in ../data/quality_data/all_kgs_analyzed).
+            :param save: if True, the statistics are persisted after the update.
+        '''
+        analysis_date = kghb_schema.snapshot_date(file_path).isoformat()
+        df = kghb_schema.read_snapshot(file_path, usecols=['KG id', 'Sparql endpoint'] + self.dimensions)
+        values = df[self.dimensions].to_numpy(dtype=float, na_value=np.nan)
+        # The dimensions calculated differently in the snapshot (e.g. the Understandability score before May 5, 2024) are not correlated
+        for index, dimension in enumerate(self.dimensions):
+            if not kghb_schema.is_comparable(dimension, file_path):
+                values[:, index] = np.nan
+        kg_ids = kg_id_dictionary.get_dictionary()
+        codes = kg_ids.encode(df['KG id'])
+        selected = (df['Sparql endpoint'] == 'Available').to_numpy() if self.only_sparql_up else np.ones(len(df), dtype=bool)
+
+        snapshot = {moment: [] for moment in MOMENTS}
+        for topic in self.topics:
+            topic_values = values[selected & kg_ids.topic_mask(codes, topic)]
+            for moment, matrix in zip(MOMENTS, pairwise_moments(topic_values) + pairwise_rank_moments(topic_values)[1:]):
+                snapshot[moment].append(matrix)
+
+        if analysis_date in self.dates:
+            position = self.dates.index(analysis_date)
+            for moment in MOMENTS:
+                self.moments[moment][:, position] = snapshot[moment]
+        else:
+            position = int(np.searchsorted(self.dates, analysis_date))
+            self.dates.insert(position, analysis_date)
+            for moment in MOMENTS:
+                self.moments[moment] = np.insert(self.moments[moment], position, snapshot[moment], axis=1)
+        if save:
+            self.save()
+
+    def replay(self, file_paths, skip_known=True):
+        '''
+            Add a list of snapshots (e.g. the whole history), saving the statistics once at the end.
+
+            :param file_paths: list of paths to the snapshots.
+            :param skip_known: if True, the snapshots whose analysis date is already in the statistics are not read again.
+        '''
+        for file_path in file_paths:
+            if skip_known and kghb_schema.snapshot_date(file_path).isoformat() in self.dates:
+                continue
+            self.update(file_path, save=False)
+        self.save()
+
+    def correlations(self, method='pearson'):
+        '''
+            Return the (topics x snapshots x dimensions x dimensions) tensor of the correlation matrices of every snapshot.
+
+            :param method: 'pearson' or 'spearman'.
+        '''
+        prefix = {'pearson': '', 'spearman': 'rank_'}[method]
+        return correlation(self.moments[f'{prefix}m2'], self.moments[f'{prefix}comoment'])
+
+    def pooled(self, start=None, end=None, method='pearson'):
+        '''
+            Return the (topics x dimensions x dimensions) correlation matrices of all the rows of the snapshots in a period, merging their statistics.
+            For the Spearman correlation the values are ranked within each snapshot.
+
+            :param start: first analysis date (YYYY-MM-DD, inclusive), None for no lower bound.
+            :param end: last analysis date (YYYY-MM-DD, inclusive), None for no upper bound.
+            :param method: 'pearson' or 'spearman'.
+        '''
+        prefix = {'pearson': '', 'spearman': 'rank_'}[method]
+        shape = (len(self.topics), len(self.dimensions), len(self.dimensions))
+        merged = (np.zeros(shape), np.full(shape, np.nan), np.zeros(shape), np.zeros(shape))
+        for position, analysis_date in enumerate(self.dates):
+            if (start is None or analysis_date >= start) and (end is None or analysis_date <= end):
+                snapshot = tuple(self.moments[moment][:, position] for moment in ['n', f'{prefix}mean', f'{prefix}m2', f'{prefix}comoment'])
+                merged = merge_moments(merged, snapshot)
+        return correlation(merged[2], merged[3])
+
+    def export(self, export_path=EXPORT_PATH):
+        '''
+            Write the correlation tensors in a compressed npz file for the charts: the topics, dates and dimensions labels,
+            the pearson and spearman (topics x snapshots x dimensions x dimensions) tensors in single precision and the number of KGs of every pair.
+
+            :param export_path: path to the npz file.
+        '''
+        os.makedirs(os.path.dirname(export_path) or '.', exist_ok=True)
+        np.savez_compressed(export_path, topics=np.array(self.topics), dates=np.array(self.dates, dtype=str), dimensions=np.array(self.dimensions),
+                            pearson=self.correlations('pearson').astype(np.float32), spearman=self.correlations('spearman').astype(np.float32),
+                            n=self.moments['n'].astype(np.int32))
+        return export_path
@@ -1,23 +1,73 @@
 import pandas as pd
+import numpy as np
 import os
 import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib.transforms import Bbox
+from chart_cache import ChartCache
+
+# Change it whenever the drawing code changes, so that the cached charts are rendered again.
+RENDERER_VERSION = '2'
 
 TOPICS = ['all','cross-domain','geography','government','life-sciences','linguistic','media','publications','social-networking','user-generated']
 
+def box_stats(df, label_column):
+    '''
+        Convert the rows of a stats csv (Min, Q1, Median, Q3, Max and, if present, Mean) into the box statistics drawn by Axes.bxp,
+        so that the boxes are exactly the precomputed values and nothing is recomputed.
+
+        :param df: DataFrame with the stats, one row for each box.
+        :param label_column: column with the label of each box.
+    '''
+    stats = []
+    for row in df.to_dict('records'):
+        box = {
+            'label': row[label_column],
+            'whislo': row['Min'],
+            'q1': row['Q1'],
+            'med': row['Median'],
+            'q3': row['Q3'],
+            'whishi': row['Max'],
+            'fliers': [],
+        }
+        if 'Mean' in row:
+            box['mean'] = row['Mean']
+        stats.append(box)
+    return stats
+
+def draw_boxes(ax, stats, colors, positions=None, widths=0.6, linewidth=1.5, showmeans=False):
+    '''
+        Draw precomputed boxes on an axis, each filled with its color.
+
+        :param ax: matplotlib Axes.
+        :param stats: list of box statistics returned by box_stats.
+        :param colors: list with the fill color of each box.
+        :param positions: x position of each box, by default 1, 2, 3, ...
+    '''
+    line_props = {'color': '0.25', 'linewidth': linewidth}
+    artists = ax.bxp(stats, positions=positions, widths=widths, patch_artist=True, showmeans=showmeans, showfliers=False,
+                     boxprops={'edgecolor': '0.25', 'linewidth': linewidth}, medianprops=line_props, whiskerprops=line_props, capprops=line_props,
+                     meanprops={'marker': 'D', 'markerfacecolor': 'white', 'markeredgecolor': '0.25'})
+    for box, color in zip(artists['boxes'], colors):
+        box.set_facecolor(color)
+    return artists
+
 
 class GenerateCharts:
 
-    def __init__(self,evaluation_results_path = False,charts_output = './charts') -> None:
+    def __init__(self,evaluation_results_path = False,charts_output = './charts',formats = (('png', None),),use_cache = True) -> None:
         '''
             Creates a list of CSV files that are to be parsed.
 
             :param evaluations_results_path: path to the folder that contains the evaluation results csv files.
             :param charts_output: path to the folder in which to place the generated graphs.
+            :param formats: list of (format, dpi) in which to save every chart, e.g. [('png', 100), ('png', 300), ('svg', None)].
+            :param use_cache: if True, the charts whose data did not change since the last run are not rendered again.
 
         '''
         self.analysis_results_files = []
         self.output_file = charts_output
+        self.cache = ChartCache(RENDERER_VERSION, formats, use_cache)
         # Get all csv filename from the dir
         if(evaluation_results_path):
             for filename in os.listdir(evaluation_results_path):
@@ -46,56 +96,54 @@ class GenerateCharts:
             else:
                 df_filtered = df
 
-            df_melted = df_filtered.melt(id_vars='Analysis date', value_vars=['Min', 'Q1', 'Median', 'Q3', 'Max'], 
-                var_name='Statistic', value_name='Value')
+            df_filtered = df_filtered.assign(**{'Analysis date': df_filtered['Analysis date'].dt.strftime('%Y-%m-%d')})
             
             if metric_analyzed == 'Representational-Consistency score':
                 metric_analyzed = 'Interoperability score'
             if metric_analyzed == 'Volatility score':
                 metric_analyzed = 'Timeliness score'
+
+            output_path = self.output_file + '/' + metric_analyzed
+            key = self.cache.key([df_filtered], {'chart': 'over_time', 'title': metric_analyzed})
+            if self.cache.is_fresh(output_path, key):
+                continue
             
             plt.figure(figsize=(20, 9))
             plt.ylim(0, 1.009)
-            sns.boxplot(x='Analysis date', y='Value', hue='Analysis date', data=df_melted,saturation=1)
+            draw_boxes(plt.gca(), box_stats(df_filtered, 'Analysis date'), sns.color_palette(n_colors=len(df_filtered)))
             plt.xticks(fontsize=18)
             plt.yticks(fontsize=18)
             plt.title(metric_analyzed, weight='bold',fontsize=20)
             plt.xlabel('Date',weight='bold',fontsize=18)
             plt.ylabel('Values',weight='bold',fontsize=18)
-            plt.savefig(self.output_file + '/' + metric_analyzed)
-            plt.close()
+            self.cache.save(output_path, key)
     
     def generate_boxplots_punctual(self,input_file,output_filename,xlabel='Dimension'):
         '''
             Generate a box for a specific metric for a punctual analysis.
 
-            :param input_file: filename of the file that contains the evaluation data about the metric.
+            :param input_file: filename of the file that contains the evaluation data about the metric, or the table already in memory (e.g. results.punctual(topic, 'dimensions_stats') of quality_api.evaluate).
         '''
-        df = pd.read_csv(input_file)
+        df = input_file if isinstance(input_file, pd.DataFrame) else pd.read_csv(input_file)
 
-        df_melted = df.melt(id_vars='Dimension', value_vars=['Min', 'Q1', 'Median', 'Q3', 'Max'], 
-                            var_name='Statistic', value_name='Value')
+        output_path = f'{self.output_file}/{output_filename}'
+        key = self.cache.key([df], {'chart': 'punctual', 'xlabel': xlabel})
+        if self.cache.is_fresh(output_path, key):
+            return
 
-        plt.figure(figsize=(60, 40))
+        plt.figure(figsize=(15, 10))
 
-        flierprops = {
-            'marker': 'o',
-            'markerfacecolor': 'auto',
-            'markersize': 30
-        }
-
-        sns.boxplot(x='Dimension', y='Value', hue='Dimension', data=df_melted, saturation=1,linewidth=4,flierprops=flierprops)
+        draw_boxes(plt.gca(), box_stats(df, 'Dimension'), sns.color_palette(n_colors=len(df)))
         
-        plt.xticks(rotation=90, fontsize=60)
-        plt.yticks(fontsize=60)
+        plt.xticks(rotation=90, fontsize=15)
+        plt.yticks(fontsize=15)
 
         plt.ylim(0, 1.009)
-        plt.title(f'Quality {xlabel} Evaluation', fontsize=60, weight='bold', ha='center')
-        plt.xlabel(xlabel, fontsize=60, weight='bold')
-        plt.ylabel('Values', fontsize=60, weight='bold')
+        plt.title(f'Quality {xlabel} Evaluation', fontsize=15, weight='bold', ha='center')
+        plt.xlabel(xlabel, fontsize=15, weight='bold')
+        plt.ylabel('Values', fontsize=15, weight='bold')
         
-        plt.savefig(f'{self.output_file}/{output_filename}', bbox_inches='tight')
-        plt.close()
+        self.cache.save(output_path, key, bbox_inches='tight')
 
     def generate_combined_boxplot_over_time(self, time_period_range, plot_title,image_name,dimensions_to_exclude = [],palette='Set2'):
         """
@@ -139,17 +187,29 @@ class GenerateCharts:
             dfs.append(df_filtered)
 
         data = pd.concat(dfs)
+        data['Analysis date'] = data['Analysis date'].dt.strftime('%Y-%m-%d')
 
-        melted_data = pd.melt(
-            data, 
-            id_vars=['Analysis date', 'Dimension'], 
-            value_vars=['Min', 'Q1', 'Median', 'Q3', 'Max'], 
-            var_name='Statistic', 
-            value_name='Value'
-        )
+        output_path = f'{self.output_file}/{image_name}'
+        key = self.cache.key([data], {'chart': 'combined_over_time', 'title': plot_title, 'palette': palette})
+        if self.cache.is_fresh(output_path, key):
+            return
+        dates = sorted(data['Analysis date'].unique())
+        dimensions = list(dict.fromkeys(data['Dimension']))
+        colors = sns.color_palette(palette, len(dimensions))
 
+        # For every date, a group of boxes (one for each dimension) spread over a width of 0.8 around the date position
         plt.figure(figsize=(40, 16))
-        sns.boxplot(x='Analysis date', y='Value', hue='Dimension', data=melted_data,saturation=1,palette=palette)
+        ax = plt.gca()
+        width = 0.8 / len(dimensions)
+        date_position = {date: position for position, date in enumerate(dates)}
+        for index, (dimension, color) in enumerate(zip(dimensions, colors)):
+            dimension_data = data[data['Dimension'] == dimension]
+            positions = [date_position[date] - 0.4 + width * (index + 0.5) for date in dimension_data['Analysis date']]
+            draw_boxes(ax, box_stats(dimension_data, 'Dimension'), [color] * len(positions), positions=positions, widths=width * 0.9)
+        ax.set_xticks(range(len(dates)), dates)
+        ax.set_xlim(-0.5, len(dates) - 0.5)
+        handles = [plt.Rectangle((0, 0), 1, 1, facecolor=color, edgecolor='0.25') for color in colors]
+        plt.legend(handles, dimensions, bbox_to_anchor=(1.01, 1), loc='best',fontsize=19.5, borderaxespad=0.2)
 
         plt.ylim(0, 1.009)
         plt.xticks(fontsize=30)
@@ -157,16 +217,15 @@ class GenerateCharts:
         plt.xlabel("Analysis Date",weight='bold',fontsize=30)
         plt.ylabel("Value",weight='bold',fontsize=30)
         plt.title(plot_title,fontsize=30,weight='bold')
-
-        plt.legend(bbox_to_anchor=(1.01, 1), loc='best',fontsize=19.5, borderaxespad=0.2)
         
-        plt.savefig(f'{self.output_file}/{image_name}')
-        plt.close()
+        self.cache.save(output_path, key)
     
-    def generate_boxplot_by_topic(self, filter):
+    def generate_boxplot_by_topic(self, filter, grid=False, results=None):
         """
         Creates a boxplot with a focus on the same dimensions/categories as the domain changes.
         :param filter: 'dim' or 'cat'. 'dim' generates boxplot by dimensions as the domain changes. 'cat' generates boxplot by categories as the domain changes.
+        :param grid: if True, all the dimensions/categories are drawn as panels of a single figure, rendered once, and each panel is also exported as a cropped image.
+        :param results: the Results of quality_api.evaluate or the results store (results_store.get_store()), if given the stats are taken from it instead of the csv files.
         """
         dataframes = []
         for topic in TOPICS:
@@ -176,7 +235,10 @@ class GenerateCharts:
             else:
                 out_path = "../charts/by_domain/by_dimensions"
                 path = f"../data/evaluation_results/2024/{topic}/punctual/dimensions_stats.csv"
-            df = pd.read_csv(path)
+            if results is not None:
+                df = results.frame(os.path.relpath(path, '../data')).copy()
+            else:
+                df = pd.read_csv(path)
             df['Source'] = topic
             dataframes.append(df)
         
@@ -186,16 +248,20 @@ class GenerateCharts:
         palette = sns.color_palette("husl", len(TOPICS))
         color_map = dict(zip(TOPICS, palette))
 
+        if grid:
+            self.boxplot_by_topic_grid(combined_df, dimensions, color_map, out_path)
+            return
+
         for dim in dimensions:
-            plt.figure(figsize=(20, 10))
             filtered_df = combined_df[combined_df['Dimension'] == dim]
-            
-            long_df = filtered_df.melt(id_vars=['Source'], 
-                                    value_vars=['Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'],
-                                    var_name='Statistic',
-                                    value_name='Value')
-            
-            sns.boxplot(data=long_df, x='Source', y='Value', hue='Source',palette=color_map, legend=False)
+            output_path = f'{out_path}/{dim}.png'
+            key = self.cache.key([filtered_df], {'chart': 'by_topic', 'dimension': dim, 'topics': TOPICS})
+            if self.cache.is_fresh(output_path, key):
+                continue
+
+            plt.figure(figsize=(20, 10))
+
+            draw_boxes(plt.gca(), box_stats(filtered_df, 'Source'), [color_map[topic] for topic in filtered_df['Source']], showmeans=True)
             plt.xlabel("",weight='bold',fontsize=30)
             plt.ylabel("Value",weight='bold',fontsize=30)
             plt.title(f"Boxplot for {dim}",fontsize=30,weight='bold')
@@ -209,8 +275,63 @@ class GenerateCharts:
             plt.xticks([])
             plt.tight_layout()
             
-            plt.savefig(f'{out_path}/{dim}.png')
-            plt.close()
+            self.cache.save(output_path, key)
+
+    def boxplot_by_topic_grid(self, combined_df, dimensions, color_map, out_path, ncols=4):
+        """
+        Draws the boxplot by topic of every dimension/category as a panel of one grid figure. The figure is rendered once,
+        then every panel is cropped from the rendered image and saved as {dimension}_panel.png (in every format), next to the whole grid,
+        without replacing the single charts drawn by generate_boxplot_by_topic.
+        Unlike the single charts, the panels label the topics on the x-axis instead of using a legend, so that they can be used on their own.
+
+        :param combined_df: DataFrame with the punctual stats of all the topics (the topic is in the 'Source' column).
+        :param dimensions: names of the dimensions/categories to draw, one panel each.
+        :param color_map: dict with the color of each topic.
+        :param out_path: path to the folder in which to place the charts.
+        :param ncols: number of panels in each row of the grid.
+        """
+        output_path = f'{out_path}/by_topic_grid.png'
+        key = self.cache.key([combined_df], {'chart': 'by_topic_grid', 'topics': TOPICS, 'ncols': ncols})
+        panel_paths = {dim: f'{out_path}/{dim}_panel.png' for dim in dimensions}
+        if self.cache.is_fresh(output_path, key) and all(self.cache.is_fresh(panel_path, key) for panel_path in panel_paths.values()):
+            return
+
+        # Every panel owns an equal cell of the figure, with its labels inside the cell, so no layout pass is needed and cropping is exact
+        nrows = -(-len(dimensions) // ncols)
+        figure = plt.figure(figsize=(6 * ncols, 4.5 * nrows))
+        cells = []
+        for index, dim in enumerate(dimensions):
+            row, column = divmod(index, ncols)
+            left, bottom = column / ncols, 1 - (row + 1) / nrows
+            ax = figure.add_axes([left + 0.12 / ncols, bottom + 0.3 / nrows, 0.84 / ncols, 0.6 / nrows])
+            cells.append((dim, row, column))
+
+            filtered_df = combined_df[combined_df['Dimension'] == dim]
+            draw_boxes(ax, box_stats(filtered_df, 'Source'), [color_map[topic] for topic in filtered_df['Source']], showmeans=True, linewidth=1)
+            ax.set_title(f"Boxplot for {dim}", fontsize=14, weight='bold')
+            ax.set_ylabel("Value", weight='bold', fontsize=12)
+            ax.set_ylim(0, 1.009)
+            ax.tick_params(axis='x', labelrotation=45, labelsize=10)
+            for label in ax.get_xticklabels():
+                label.set_horizontalalignment('right')
+
+        figure.canvas.draw()
+        image = np.asarray(figure.canvas.buffer_rgba())
+        height, width = image.shape[:2]
+        figure_width, figure_height = figure.get_size_inches()
+        for dim, row, column in cells:
+            top, bottom = round(row * height / nrows), round((row + 1) * height / nrows)
+            left, right = round(column * width / ncols), round((column + 1) * width / ncols)
+            # The png at the figure dpi is cropped from the rendered image, the other formats save only the cell of the panel
+            cell = Bbox.from_bounds(column * figure_width / ncols, (nrows - row - 1) * figure_height / nrows, figure_width / ncols, figure_height / nrows)
+            for file, (output_format, dpi) in zip(self.cache.output_files(panel_paths[dim]), self.cache.formats):
+                if output_format == 'png' and dpi in (None, figure.dpi):
+                    plt.imsave(file, image[top:bottom, left:right])
+                else:
+                    figure.savefig(file, format=output_format, dpi=dpi or 'figure', bbox_inches=cell)
+            self.cache.record(panel_paths[dim], key)
+
+        self.cache.save(output_path, key, image=image)
 
     def swinging_sparql_bubble_chart(self,filename):
         """
@@ -220,6 +341,10 @@ class GenerateCharts:
         :param filename: name of the file in which the data are present regarding the average percentage of availability had.
         """
         df = pd.read_csv(filename)
+        output_path = f'{self.output_file}/availability_sparql_over_time'
+        key = self.cache.key([df], {'chart': 'swinging_sparql_bubble'})
+        if self.cache.is_fresh(output_path, key):
+            return
         try:
             plt.figure(figsize=(8,6))
             minsize = min(df['Number of KGs'])*4
@@ -227,7 +352,6 @@ class GenerateCharts:
             sns.scatterplot(x="Percentage of availability",y="Number of KGs",data=df, sizes=(minsize, maxsize), size='Number of KGs')
             plt.xlabel("Percentage of Availability", fontsize=16)
             plt.ylabel("Number of KGs", fontsize=16)
-            plt.savefig(f'{self.output_file}/availability_sparql_over_time')
-            plt.close()
+            self.cache.save(output_path, key)
         except Exception as e:
             pass
\ No newline at end of file
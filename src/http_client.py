@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.util.retry import Retry
+
+here = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(here, '../data/http_cache')
+
+# cache: the responses are reused while fresh and revalidated with ETag/Last-Modified as the Cache-Control headers say.
+# record: as cache, but every response is stored, also the ones that the server marks as not cacheable.
+# replay: the responses are only read from the cache, a request never goes on the network.
+MODES = ('cache', 'record', 'replay')
+
+TIMEOUT = 30
+RETRY = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=('GET', 'HEAD'),
+              respect_retry_after_header=True, raise_on_status=False)
+
+# Request headers that select a different representation of the same URL, part of the cache key
+KEY_HEADERS = ('Accept', 'Accept-Language')
+
+# Status codes that can be stored without an explicit expiration time (RFC 9111, 4.2.2)
+HEURISTICALLY_CACHEABLE = (200, 203, 204, 206, 300, 301, 308, 404, 405, 410, 414, 501)
+# Without an explicit expiration time, a response is fresh for 10% of the time since its last modification, at most one day
+HEURISTIC_FRACTION = 0.1
+HEURISTIC_MAX_AGE = 86400
+
+class ReplayMiss(requests.ConnectionError):
+    '''
+        Raised in replay mode when a request was not recorded.
+    '''
+
+def cache_control(headers):
+    '''
+        Parse a Cache-Control header into a dict directive -> value (None for the directives without a value).
+    '''
+    directives = {}
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+def _timestamp(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def freshness_lifetime(headers, status_code=200):
+    '''
+        Return for how many seconds a response stays fresh, from max-age, Expires or, if none of them is given, from Last-Modified.
+    '''
+    directives = cache_control(headers)
+    if 'no-cache' in directives:
+        return 0
+    if directives.get('max-age') is not None:
+        try:
+            return max(int(directives['max-age']), 0)
+        except ValueError:
+            return 0
+    date = _timestamp(headers.get('Date')) or time.time()
+    if 'Expires' in headers:
+        expires = _timestamp(headers['Expires'])
+        return max(expires - date, 0) if expires is not None else 0
+    last_modified = _timestamp(headers.get('Last-Modified'))
+    if last_modified is not None and status_code in HEURISTICALLY_CACHEABLE:
+        return min(max(date - last_modified, 0) * HEURISTIC_FRACTION, HEURISTIC_MAX_AGE)
+    return 0
+
+class HTTPClient:
+    def __init__(self, cache_path=CACHE_PATH, mode='cache', retry=RETRY, pool_maxsize=10):
+        '''
+            HTTP client shared by the modules that download resources (LOD Cloud SVGs and dump, KGs metadata).
+            The connections are kept alive in a pool, the failed requests are retried with an exponential backoff
+            and the responses are stored on disk (one json with the status and the headers and one file with the body for every response),
+            so that a repeated run only goes on the network for the resources that changed.
+
+            :param cache_path: path to the folder of the cache.
+            :param mode: one of MODES.
+            :param retry: urllib3 Retry policy of the requests.
+            :param pool_maxsize: number of connections kept alive for every host.
+        '''
+        if mode not in MODES:
+            raise ValueError(f'Unknown HTTP mode {mode}, expected one of {MODES}')
+        self.cache_path = cache_path
+        self.mode = mode
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def _key(self, url, headers):
+        selected = '\n'.join(f'{name}: {headers.get(name, "")}' for name in KEY_HEADERS)
+        return hashlib.sha256(f'GET {url}\n{selected}'.encode('utf-8')).hexdigest()
+
+    def _load(self, key, headers):
+        try:
+            with open(os.path.join(self.cache_path, f'{key}.json'), encoding='utf-8') as file:
+                entry = json.load(file)
+            with open(os.path.join(self.cache_path, f'{key}.body'), 'rb') as file:
+                entry['content'] = file.read()
+        except (OSError, ValueError):
+            return None
+        # A response that varies on a request header is reused only for the same value of the header
+        if any(headers.get(name) != value for name, value in entry['vary'].items()):
+            return None
+        return entry
+
+    def _store(self, key, response, headers):
+        vary = [name.strip() for name in response.headers.get('Vary', '').split(',') if name.strip()]
+        entry = {'url': response.url, 'status_code': response.status_code, 'reason': response.reason, 'headers': dict(response.headers),
+                 'vary': {name: headers.get(name) for name in vary}, 'stored': time.time()}
+        self._write(key, entry, response.content)
+
+    def _write(self, key, entry, content=None):
+        with self.lock:
+            os.makedirs(self.cache_path, exist_ok=True)
+            # Every file is replaced at once, a run interrupted while writing never leaves a truncated entry
+            if content is not None:
+                temporary = os.path.join(self.cache_path, f'{key}.body.tmp')
+                with open(temporary, 'wb') as file:
+                    file.write(content)
+                os.replace(temporary, os.path.join(self.cache_path, f'{key}.body'))
+            temporary = os.path.join(self.cache_path, f'{key}.json.tmp')
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump({name: value for name, value in entry.items() if name != 'content'}, file)
+            os.replace(temporary, os.path.join(self.cache_path, f'{key}.json'))
+
+    def _storable(self, response):
+        if self.mode == 'record':
+            return True
+        directives = cache_control(response.headers)
+        if 'no-store' in directives or response.headers.get('Vary', '').strip() == '*':
+            return False
+        explicit = directives.get('max-age') is not None or 'Expires' in response.headers
+        validators = 'ETag' in response.headers or 'Last-Modified' in response.headers
+        return (explicit or response.status_code in HEURISTICALLY_CACHEABLE) and (explicit or validators)
+
+    def _is_fresh(self, entry):
+        headers = CaseInsensitiveDict(entry['headers'])
+        try:
+            age = max(int(headers.get('Age', 0)), 0)
+        except ValueError:
+            age = 0
+        return age + time.time() - entry['stored'] < freshness_lifetime(headers, entry['status_code'])
+
+    def _response(self, entry):
+        response = requests.Response()
+        response.status_code = entry['status_code']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.url = entry['url']
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = entry['content']
+        return response
+
+    def get(self, url, headers=None, timeout=TIMEOUT, **kwargs):
+        '''
+            Send a GET request, or answer it from the cache. The returned object is a requests.Response in both cases.
+
+            :param url: URL of the resource.
+            :param headers: dict of request headers, a 'Cache-Control: no-cache' header skips the fresh responses of the cache.
+            :param timeout: seconds to wait for the server.
+        '''
+        headers = CaseInsensitiveDict(headers or {})
+        key = self._key(url, headers)
+        entry = self._load(key, headers)
+        if self.mode == 'replay':
+            if entry is None:
+                raise ReplayMiss(f'{url} was not recorded in {self.cache_path}')
+            self.stats['hits'] += 1
+            return self._response(entry)
+        if entry is not None and 'no-cache' not in cache_control(headers) and self._is_fresh(entry):
+            self.stats['hits'] += 1
+            return self._response(entry)
+
+        conditional = CaseInsensitiveDict(headers)
+        if entry is not None:
+            stored_headers = CaseInsensitiveDict(entry['headers'])
+            if 'ETag' in stored_headers:
+                conditional['If-None-Match'] = stored_headers['ETag']
+            if 'Last-Modified' in stored_headers:
+                conditional['If-Modified-Since'] = stored_headers['Last-Modified']
+        response = self.session.get(url, headers=conditional, timeout=timeout, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            # Not modified: the stored response is reused, with the headers updated by the 304 (RFC 9111, 4.3.4)
+            self.stats['revalidated'] += 1
+            entry['headers'].update({name: value for name, value in response.headers.items()
+                                     if name.lower() not in ('content-length', 'content-encoding', 'transfer-encoding')})
+            entry['stored'] = time.time()
+            self._write(key, entry)
+            return self._response(entry)
+
+        self.stats['misses'] += 1
+        if self._storable(response):
+            self._store(key, response, headers)
+        return response
+
+_clients = {}
+
+def get_client(cache_path=CACHE_PATH):
+    '''
+        Return the client shared by all the modules of the process, with its connection pool.
+
+        :param cache_path: path to the folder of the cache.
+    '''
+    cache_path = os.path.abspath(cache_path)
+    if cache_path not in _clients:
+        _clients[cache_path] = HTTPClient(cache_path)
+    return _clients[cache_path]
+
+def set_mode(mode):
+    '''
+        Set the mode (see MODES) of the shared client, e.g. 'record' for a run that has to be replayed offline and then 'replay'.
+    '''
+    if mode not in MODES:
+        raise ValueError(f'Unknown HTTP mode {mode}, expected one of {MODES}')
+    get_client().mode = mode
+
+def get(url, headers=None, **kwargs):
+    '''
+        Send a GET request with the shared client, see HTTPClient.get.
+    '''
+    return get_client().get(url, headers, **kwargs)
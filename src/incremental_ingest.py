@@ -0,0 +1,123 @@
+import os
+import time
+from quality_evaluation_over_time import QualityEvaluationOT
+from split_lodc_kgs_by_topic import SplitLODCKGsByTopic
+import kghb_schema
+import kg_id_dictionary
+import results_store
+from anomaly_detector import AnomalyDetector
+import snapshot_catalog
+from dimension_correlations import DimensionCorrelations
+
+class SnapshotIngest:
+    def __init__(self, snapshot_path, topics, quality_data_path='../data/quality_data/only_from_LODC'):
+        '''
+            Process a single new KGHeartBeat snapshot, instead of the whole history: filter the LOD Cloud KGs, split them by topic, add the category scores
+            and add one row to the statistics over time of every topic.
+
+            :param snapshot_path: path to the new csv returned by KGHeartBeat (e.g. ../data/quality_data/all_kgs_analyzed/2024-11-24.csv).
+            :param topics: list of the topics to update, 'all' is the entire LOD Cloud.
+            :param quality_data_path: path to the folder with the quality data split by topic.
+        '''
+        self.snapshot_path = snapshot_path
+        self.filename = os.path.basename(snapshot_path)
+        self.topics = topics
+        self.quality_data_path = quality_data_path
+
+    def stages(self):
+        '''
+            Return the ordered list of (stage name, function) that make up the ingest.
+        '''
+        return [
+            ('filter_lodc', self.filter_lodc),
+            ('split_by_topic', self.split_by_topic),
+            ('detect_anomalies', self.detect_anomalies),
+            ('dimension_correlations', self.update_correlations),
+            ('category_score', self.add_category_score),
+            ('catalog', self.update_catalog),
+            ('stats_over_time', self.update_stats_over_time),
+            ('export_csv', self.export_csv),
+        ]
+
+    def filter_lodc(self):
+        '''
+            Extract only the KGs from LODCloud from the new snapshot.
+        '''
+        os.makedirs(os.path.join(self.quality_data_path, 'all'), exist_ok=True)
+        analysis = QualityEvaluationOT(os.path.join(self.quality_data_path, 'all'), './evaluation_results/all/over_time')
+        analysis.filter_snapshot_lodc(self.snapshot_path, os.path.join(self.quality_data_path, 'all'))
+
+    def split_by_topic(self):
+        '''
+            Split the new snapshot by topic.
+        '''
+        SplitLODCKGsByTopic().split_snapshot(self.snapshot_path, quality_data_path=self.quality_data_path)
+        kg_id_dictionary.get_dictionary().save()
+
+    def detect_anomalies(self):
+        '''
+            Compare the scores of every KG in the new snapshot with its history and append the sudden regressions to the alerts file.
+        '''
+        alerts = AnomalyDetector().update(os.path.join(self.quality_data_path, 'all', self.filename))
+        print(f"Ingest of {self.filename}: {len(alerts)} quality regressions detected")
+
+    def update_correlations(self):
+        '''
+            Add the correlation matrices of the dimensions in the new snapshot, for every topic, and export the updated tensors.
+        '''
+        correlations = DimensionCorrelations()
+        correlations.update(self.snapshot_path)
+        correlations.export()
+
+    def add_category_score(self):
+        '''
+            Add the category scores to the copy of the new snapshot of every topic.
+        '''
+        for topic in self.topics:
+            analysis = QualityEvaluationOT(os.path.join(self.quality_data_path, topic), f'./evaluation_results/{topic}/over_time')
+            analysis.add_category_score_to_file(os.path.join(self.quality_data_path, topic, self.filename))
+
+    def update_catalog(self):
+        '''
+            Add the new snapshot, and its copy for every topic, to the snapshot catalog.
+        '''
+        paths = [self.snapshot_path] + [os.path.join(self.quality_data_path, topic, self.filename) for topic in self.topics]
+        snapshot_catalog.get_catalog().refresh([path for path in paths if os.path.isfile(path)])
+
+    def update_stats_over_time(self):
+        '''
+            Add the statistics of the new snapshot to the over time csv of every topic.
+        '''
+        for topic in self.topics:
+            analysis = QualityEvaluationOT(os.path.join(self.quality_data_path, topic), f'./evaluation_results/{topic}/over_time')
+            file_path = os.path.join(self.quality_data_path, topic, self.filename)
+            analysis.update_stats_over_time(file_path, kghb_schema.CATEGORY_SCORES, 'by_category')
+            analysis.update_stats_over_time(file_path, kghb_schema.DIMENSION_SCORES, 'by_dimension')
+
+    def export_csv(self):
+        '''
+            Commit the updated statistics to the results store and export them as csv, for the charts.
+        '''
+        store = results_store.get_store()
+        for topic in self.topics:
+            store.export_csv(topic)
+
+    def run(self, should_stop=None):
+        '''
+            Run every stage of the ingest and return a record with the status and the time spent in each stage (in seconds).
+
+            :param should_stop: function checked before every stage, if it returns True the remaining stages are cancelled.
+        '''
+        timings = {}
+        for name, stage in self.stages():
+            if should_stop is not None and should_stop():
+                print(f"Ingest of {self.filename}: cancelled before {name}")
+                return {'status': 'cancelled', 'timings': timings}
+            start = time.perf_counter()
+            stage()
+            # The results of every stage are committed at once, an ingest stopped later does not lose them
+            results_store.get_store().commit()
+            timings[name] = time.perf_counter() - start
+            print(f"Ingest of {self.filename}: {name} done in {timings[name]:.2f}s")
+
+        return {'status': 'done', 'timings': timings}
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import kghb_schema
+import lodcloud_index
+
+here = os.path.dirname(os.path.abspath(__file__))
+DICTIONARY_PATH = os.path.join(here, '../data/kg_id_dictionary.json')
+LODCLOUD_PATH = lodcloud_index.LODCLOUD_PATH
+KGS_BY_TOPIC_PATH = os.path.join(here, '../data/kgs_by_topic.json')
+
+class KGIdDictionary:
+    def __init__(self, dictionary_path=DICTIONARY_PATH):
+        '''
+            Loads the global dictionary that maps every KG id to a compact int32 code, along with the LOD Cloud and topic membership of each KG.
+            If the dictionary was never persisted, it is built from the LOD Cloud dump and from the KGs split by topic.
+
+            :param dictionary_path: path to the JSON file in which the dictionary is persisted.
+        '''
+        self.dictionary_path = dictionary_path
+        # The snapshots can be read in parallel threads, the ids are added under a lock
+        self.lock = threading.RLock()
+        if os.path.isfile(dictionary_path):
+            with open(dictionary_path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.topics = data['topics']
+            self.index = pd.Index(data['ids'], dtype=object)
+            self.in_lodc = np.array(data['in_lodc'], dtype=bool)
+            self.topic_bits = np.array(data['topic_bits'], dtype=np.uint32)
+        else:
+            self.topics = []
+            self.index = pd.Index([], dtype=object)
+            self.in_lodc = np.zeros(0, dtype=bool)
+            self.topic_bits = np.zeros(0, dtype=np.uint32)
+            self.refresh_membership()
+
+    def __len__(self):
+        return len(self.index)
+
+    def _add(self, ids):
+        '''
+            Append new ids to the dictionary, the codes already assigned never change.
+        '''
+        self.index = self.index.append(pd.Index(ids, dtype=object))
+        self.in_lodc = np.concatenate([self.in_lodc, np.zeros(len(ids), dtype=bool)])
+        self.topic_bits = np.concatenate([self.topic_bits, np.zeros(len(ids), dtype=np.uint32)])
+
+    def encode(self, ids):
+        '''
+            Map KG ids to their int32 code, stripping them once. Ids never seen before are added to the dictionary.
+
+            :param ids: iterable of KG ids.
+        '''
+        if isinstance(getattr(ids, 'dtype', None), pd.CategoricalDtype) and ids.cat.categories is self.index:
+            return ids.cat.codes.to_numpy().astype(np.int32)
+        ids = pd.Series(ids, copy=False).astype(str).str.strip()
+        with self.lock:
+            codes = self.index.get_indexer(ids)
+            unknown = codes < 0
+            if unknown.any():
+                self._add(pd.unique(ids[unknown]))
+                codes[unknown] = self.index.get_indexer(ids[unknown])
+
+        return codes.astype(np.int32)
+
+    def categorical(self, ids):
+        '''
+            Return the KG ids as a pandas Categorical whose codes are the global dictionary codes.
+
+            :param ids: iterable of KG ids.
+        '''
+        with self.lock:
+            return pd.Categorical.from_codes(self.encode(ids), categories=self.index)
+
+    def refresh_membership(self, lodcloud_path=LODCLOUD_PATH, kgs_by_topic_path=KGS_BY_TOPIC_PATH):
+        '''
+            Recompute which KGs are in the LOD Cloud and the topic bitset of every KG.
+
+            :param lodcloud_path: path to the LOD Cloud JSON dump.
+            :param kgs_by_topic_path: path to the JSON with the KGs split by topic.
+        '''
+        with open(kgs_by_topic_path, "r", encoding="utf-8") as file:
+            kgs_by_topic_dict = json.load(file)
+
+        # The identifiers come from the persisted index of the dump, that is parsed again only when the dump changes
+        lodc_codes = self.encode(lodcloud_index.get_index(lodcloud_path).identifiers())
+        self.in_lodc[:] = False
+        self.in_lodc[lodc_codes] = True
+
+        self.topics = list(kgs_by_topic_dict.keys())
+        self.topic_bits[:] = 0
+        for bit, topic in enumerate(self.topics):
+            topic_codes = self.encode([url.split("/")[-1] for url in kgs_by_topic_dict[topic]])
+            self.topic_bits[topic_codes] |= np.uint32(1 << bit)
+
+    def add_snapshot_ids(self, file_paths):
+        '''
+            Register every KG id found in the given snapshots.
+
+            :param file_paths: list of paths to KGHeartBeat snapshots.
+        '''
+        for file_path in file_paths:
+            self.encode(kghb_schema.read_snapshot(file_path, usecols=['KG id'], raw=True)['KG id'])
+
+    def lodc_mask(self, codes):
+        '''
+            Boolean mask of the codes that belong to a KG in the LOD Cloud.
+
+            :param codes: array of KG codes.
+        '''
+        return self.in_lodc[codes]
+
+    def topic_mask(self, codes, topic):
+        '''
+            Boolean mask of the codes that belong to a KG in the topic, 'all' selects the KGs in the LOD Cloud and 'no-domain' the KGs without a topic.
+
+            :param codes: array of KG codes.
+            :param topic: name of the topic as in kgs_by_topic.json.
+        '''
+        if topic == 'all':
+            return self.lodc_mask(codes)
+        bits = self.topic_bits[codes]
+        if topic == 'no-domain':
+            return bits == 0
+        return (bits & np.uint32(1 << self.topics.index(topic))) != 0
+
+    def topic_size(self, topic):
+        '''
+            Number of KGs in the topic.
+
+            :param topic: name of the topic as in kgs_by_topic.json.
+        '''
+        return int(self.topic_mask(np.arange(len(self)), topic).sum())
+
+    def save(self):
+        '''
+            Persist the dictionary.
+        '''
+        data = {
+            'topics': self.topics,
+            'ids': self.index.tolist(),
+            'in_lodc': self.in_lodc.astype(int).tolist(),
+            'topic_bits': self.topic_bits.tolist(),
+        }
+        with open(self.dictionary_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+
+_dictionary = None
+
+def get_dictionary():
+    '''
+        Return the dictionary shared by all the modules of the process.
+    '''
+    global _dictionary
+    if _dictionary is None:
+        _dictionary = KGIdDictionary()
+    return _dictionary
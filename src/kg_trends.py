@@ -0,0 +1,163 @@
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import kghb_schema
+import kg_id_dictionary
+import results_store
+import snapshot_archive
+
+class KGTrends:
+    def __init__(self, analysis_results_path='../data/quality_data/only_from_LODC/all', output_file='./evaluation_results/all/over_time'):
+        '''
+            Per KG trends of the quality metrics: for every KG, metric and analysis, the rolling median, the least squares slope and the volatility
+            over the last snapshots. The values are laid out as a (KG, date) matrix for each metric, so that every window is computed at once.
+
+            :param analysis_results_path: path to the folder (or archive) that contains the analysis csv files.
+            :param output_file: name of the folder under data in which to write the trends.
+        '''
+        self.analysis_results_files = snapshot_archive.list_snapshots(analysis_results_path)
+        self.output_file = output_file
+
+    def load(self, metrics, only_sparql_up=False):
+        '''
+            Read every analysis once and return the KG codes (sorted), the analysis dates and a dict with a (KGs x dates) matrix for every metric.
+            The KGs missing from an analysis, and the analyses in which a metric is not comparable with the most recent ones, are NaN.
+
+            :param metrics: list of the column names of the metrics.
+            :param only_sparql_up: boolean that if True, the values of the KGs with the SPARQL endpoint not available are NaN.
+        '''
+        kg_ids = kg_id_dictionary.get_dictionary()
+        snapshots = []
+        for file_path in self.analysis_results_files:
+            df = kghb_schema.read_snapshot(file_path, usecols=['KG id', 'Sparql endpoint'] + metrics)
+            codes = kg_ids.encode(df['KG id'])
+            # A KG analyzed twice in the same snapshot keeps its first row
+            codes, first = np.unique(codes, return_index=True)
+            df = df.iloc[first]
+            if only_sparql_up:
+                df = df.copy()
+                df.loc[df['Sparql endpoint'] != 'Available', metrics] = np.nan
+            snapshots.append((file_path, codes, df))
+
+        all_codes = np.unique(np.concatenate([codes for file_path, codes, df in snapshots])) if snapshots else np.zeros(0, dtype=np.int32)
+        dates = [kghb_schema.snapshot_date(file_path) for file_path, codes, df in snapshots]
+        values = {metric: np.full((len(all_codes), len(snapshots)), np.nan) for metric in metrics}
+        for column, (file_path, codes, df) in enumerate(snapshots):
+            rows = np.searchsorted(all_codes, codes)
+            for metric in metrics:
+                if kghb_schema.is_comparable(metric, file_path):
+                    values[metric][rows, column] = df[metric].to_numpy(dtype=float, na_value=np.nan)
+
+        return all_codes, dates, values
+
+    def compute(self, metrics, window=8, min_periods=3, only_sparql_up=False):
+        '''
+            Compute the trends of every KG and metric over the last window snapshots of every analysis.
+            A trend is computed only if the KG is in the analysis and has at least min_periods values in the window.
+
+            :param metrics: list of the column names of the metrics.
+            :param window: number of snapshots in the window, the last one included.
+            :param min_periods: minimum number of values in the window.
+            :param only_sparql_up: boolean that if True, only the values measured with the SPARQL endpoint available are considered.
+        '''
+        codes, dates, values = self.load(metrics, only_sparql_up)
+        kg_index = kg_id_dictionary.get_dictionary().index
+        # Time in weeks, the windows at the start are padded with missing snapshots
+        weeks = np.array([date.toordinal() for date in dates], dtype=float) / 7
+        padded_weeks = np.concatenate([np.full(window - 1, np.nan), weeks])
+        week_windows = sliding_window_view(padded_weeks, window)
+        week_windows = week_windows - week_windows[:, -1:]
+
+        trends = []
+        for metric in metrics:
+            matrix = values[metric]
+            padded = np.concatenate([np.full((len(codes), window - 1), np.nan), matrix], axis=1)
+            windows = sliding_window_view(padded, window, axis=1)
+            counts = (~np.isnan(windows)).sum(axis=2)
+            kg_rows, date_columns = np.nonzero(~np.isnan(matrix) & (counts >= min_periods))
+            if len(kg_rows) == 0:
+                continue
+
+            # Only the windows with a trend are copied, as a (trends x window) matrix
+            y = windows[kg_rows, date_columns]
+            present = ~np.isnan(y)
+            x = np.where(present, week_windows[date_columns], 0)
+            y_filled = np.where(present, y, 0)
+            n = present.sum(axis=1)
+            sum_x = x.sum(axis=1)
+            sum_y = y_filled.sum(axis=1)
+            denominator = n * (x * x).sum(axis=1) - sum_x ** 2
+            with np.errstate(invalid='ignore', divide='ignore'):
+                slope = (n * (x * y_filled).sum(axis=1) - sum_x * sum_y) / denominator
+                # Changes between consecutive snapshots of the window, a change next to a missing snapshot is not counted
+                changes = np.diff(y, axis=1)
+                valid_changes = ~np.isnan(changes)
+                n_changes = valid_changes.sum(axis=1)
+                changes = np.where(valid_changes, changes, 0)
+                mean_change = changes.sum(axis=1) / n_changes
+                volatility = np.sqrt(((changes - mean_change[:, None]) ** 2 * valid_changes).sum(axis=1) / (n_changes - 1))
+            volatility[n_changes < 2] = np.nan
+
+            trends.append(pd.DataFrame({
+                'KG id': kg_index[codes[kg_rows]],
+                'Analysis date': [dates[column].isoformat() for column in date_columns],
+                'Metric': metric,
+                'Observations': n,
+                'Rolling median': np.nanmedian(y, axis=1),
+                'Slope (per week)': slope,
+                'Volatility': volatility,
+            }))
+
+        if not trends:
+            return pd.DataFrame(columns=['KG id', 'Analysis date', 'Metric', 'Observations', 'Rolling median', 'Slope (per week)', 'Volatility'])
+        trends = pd.concat(trends, ignore_index=True)
+        trends['Metric'] = trends['Metric'].astype('category')
+        return trends
+
+    def save(self, trends, filename='kg_trends.parquet'):
+        '''
+            Write the trends table as parquet in the output folder.
+
+            :param trends: DataFrame returned by compute.
+            :param filename: name of the file.
+        '''
+        here = os.path.dirname(os.path.abspath(__file__))
+        save_path = os.path.join(here, f'../data/{self.output_file}/{filename}')
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        trends.to_parquet(save_path, index=False)
+        return save_path
+
+    def by_topic(self, trends, topics, threshold=0.0, output_filename='kg_trends_by_topic'):
+        '''
+            Aggregate the trends per topic, analysis date and metric: number of KGs, median slope, share of KGs improving and decaying, median volatility.
+            The table is written in the results store (see results_store.py).
+
+            :param trends: DataFrame returned by compute.
+            :param topics: list of the topics, 'all' is the entire LOD Cloud.
+            :param threshold: a KG is improving if its slope is greater than threshold, decaying if it is lower than -threshold.
+            :param output_filename: name of the table in the output folder.
+        '''
+        kg_ids = kg_id_dictionary.get_dictionary()
+        codes = kg_ids.encode(trends['KG id'])
+        slope = trends['Slope (per week)']
+        by_topic = []
+        for topic in topics:
+            in_topic = trends[kg_ids.topic_mask(codes, topic)]
+            topic_slope = slope[in_topic.index]
+            grouped = in_topic.assign(Improving=topic_slope > threshold, Decaying=topic_slope < -threshold).groupby(['Analysis date', 'Metric'], observed=True)
+            aggregated = grouped.agg(**{
+                'Number of KGs': ('KG id', 'size'),
+                'Median slope (per week)': ('Slope (per week)', 'median'),
+                'Improving': ('Improving', 'mean'),
+                'Decaying': ('Decaying', 'mean'),
+                'Median volatility': ('Volatility', 'median'),
+            }).reset_index()
+            aggregated.insert(0, 'Topic', topic)
+            by_topic.append(aggregated)
+
+        by_topic = pd.concat(by_topic, ignore_index=True)
+        here = os.path.dirname(os.path.abspath(__file__))
+        save_path = os.path.join(here, f'../data/{self.output_file}/{output_filename}.csv')
+        results_store.get_store().put_frame(save_path, by_topic, index=False, metric_column=2, date_column=1)
+        return by_topic
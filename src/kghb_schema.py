@@ -0,0 +1,325 @@
+import csv
+import io
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import snapshot_archive
+
+# Tokens that pandas.read_csv treats as missing by default, kept so that typed loads behave like the old inferred ones.
+PANDAS_NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+NA_VALUE_SET = pa.array(PANDAS_NA_VALUES)
+
+# Placeholders written by KGHeartBeat when a measurement could not be computed.
+NUMERIC_SENTINELS = ('-', 'absent', 'Absent', 'False', 'True')
+
+ColumnSpec = namedtuple('ColumnSpec', ['rule', 'dtype', 'sentinels', 'comparable'])
+
+ARROW_TYPES = {
+    'id': pa.string(),
+    'text': pa.string(),
+    'status': pa.dictionary(pa.int32(), pa.string()),
+    'score': pa.float64(),
+    'count': pa.int64(),
+    'flag': pa.string(),
+}
+
+# KG ids are loaded as text without the surrounding spaces, the modules that need the global codes encode them with kg_id_dictionary
+def _id():
+    return ColumnSpec('id', 'object', (), True)
+
+def _status():
+    return ColumnSpec('status', 'category', (), True)
+
+# Scores stay in double precision: the statistics computed on them are published as they are, float32 rounding would show up in them.
+def _score(comparable=True):
+    return ColumnSpec('score', 'float64', NUMERIC_SENTINELS, comparable)
+
+def _count():
+    return ColumnSpec('count', 'Int64', NUMERIC_SENTINELS, True)
+
+def _flag():
+    return ColumnSpec('flag', 'Int8', ('-', 'absent'), True)
+
+TEXT = ColumnSpec('text', 'object', (), True)
+
+DIMENSION_SCORES = ['Availability score','Licensing score','Interlinking score','Performance score','Accuracy score','Consistency score','Conciseness score',
+                    'Verifiability score','Reputation score','Believability score','Currency score','Volatility score','Completeness score','Amount of data score',
+                    'Representational-Consistency score','Representational-Conciseness score','Understandability score','Interpretability score','Versatility score','Security score']
+
+CATEGORY_SCORES = ['Accessibility score','Contextual score','Dataset dynamicity score','Intrinsic score','Representational score','Trust score']
+
+# Dimensions averaged in every category score, in the order in which the category columns are added to the snapshots
+CATEGORY_DIMENSIONS = {
+    'Intrinsic score': ['Accuracy score','Interlinking score','Consistency score','Conciseness score'],
+    'Dataset dynamicity score': ['Currency score','Volatility score'],
+    'Trust score': ['Verifiability score','Reputation score','Believability score'],
+    'Contextual score': ['Completeness score','Amount of data score'],
+    'Representational score': ['Representational-Consistency score','Representational-Conciseness score','Interpretability score','Versatility score'],
+    'Accessibility score': ['Availability score','Licensing score','Security score','Performance score'],
+}
+
+# Single copy of the snapshots returned by KGHeartBeat, the topics are read from it as views (see read_snapshot)
+CANONICAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data/quality_data/all_kgs_analyzed')
+
+COLUMNS = {
+    'KG id': _id(),
+    'Sparql endpoint': _status(),
+    'Availability VoID file': _status(),
+    'Availability of a common accepted Media Type': _status(),
+    'Availability of RDF dump (metadata)': _flag(),
+    'Use HTTPS': _status(),
+    'Requires authentication': _status(),
+    'Signed': _status(),
+    'Inactive links': _status(),
+    'Score': _score(),
+    'Number of triples (query)': _count(),
+    ' Number of triples (metadata)': _count(),
+    'Number of entities': _count(),
+    'Number of entities counted with regex': _count(),
+    'Number of property': _count(),
+    'Number of samAs chains': _count(),
+    'U1-value': _score(),
+    'CS2-value': _score(),
+    'IN3-value': _score(),
+    'RC1-value': _score(),
+    'RC2-value': _score(),
+    'IN4-value': _score(),
+    'Entities as member of disjoint class': _score(),
+    'Invalid usage of inverse-functional properties': _score(),
+    'Deprecated classes/properties used': _score(),
+}
+COLUMNS.update({score: _score() for score in DIMENSION_SCORES + CATEGORY_SCORES})
+
+# Every entry overrides COLUMNS for the snapshots analyzed from its start date (inclusive) onwards.
+SCHEMA_VERSIONS = [
+    (date.min, 'v1', {
+        'Understandability score': _score(comparable=False),
+    }),
+    # The Understandability score calculation changed after May 5, 2024.
+    (date(2024, 5, 6), 'v2', {}),
+]
+
+def snapshot_date(file_path):
+    '''
+        Return the analysis date encoded in a KGHeartBeat snapshot filename (e.g. 2024-11-24.csv), None if the name is not a date.
+
+        :param file_path: path to the snapshot.
+    '''
+    try:
+        return datetime.strptime(os.path.basename(file_path).split('.')[0], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+def _version_for(analysis_date):
+    if analysis_date is None:
+        return SCHEMA_VERSIONS[-1]
+    selected = SCHEMA_VERSIONS[0]
+    for version in SCHEMA_VERSIONS:
+        if version[0] <= analysis_date:
+            selected = version
+    return selected
+
+def schema_version(analysis_date):
+    '''
+        Return the name of the schema version in force for a snapshot date.
+
+        :param analysis_date: date of the snapshot, None selects the most recent version.
+    '''
+    return _version_for(analysis_date)[1]
+
+def get_schema(analysis_date=None):
+    '''
+        Return the column specifications in force for a snapshot date.
+
+        :param analysis_date: date of the snapshot, None selects the most recent version.
+    '''
+    schema = dict(COLUMNS)
+    schema.update(_version_for(analysis_date)[2])
+    return schema
+
+def get_column(column, analysis_date=None):
+    '''
+        Return the specification of a column, columns not declared in the registry are free text.
+
+        :param column: exact column name as written by KGHeartBeat.
+        :param analysis_date: date of the snapshot, None selects the most recent version.
+    '''
+    return get_schema(analysis_date).get(column, TEXT)
+
+def is_comparable(column, file_path):
+    '''
+        Check if the values of a column in a snapshot can be compared with the most recent analyses.
+
+        :param column: exact column name as written by KGHeartBeat.
+        :param file_path: path to the snapshot.
+    '''
+    return get_column(column, snapshot_date(file_path)).comparable
+
+def read_header(file_path, separator=','):
+    '''
+        Return the column names of a CSV file without reading its content.
+
+        :param file_path: path to the CSV file, it can be a member of an archive (see snapshot_archive.py).
+        :param separator: separator used in the file.
+    '''
+    with io.TextIOWrapper(snapshot_archive.open_snapshot(file_path), encoding='utf-8', newline='') as file:
+        return next(csv.reader(file, delimiter=separator), [])
+
+def _read_csv(file_path, read_options, parse_options, convert_options):
+    '''
+        Parse a snapshot with pyarrow, the members of an archive are decompressed while they are streamed into the parser.
+    '''
+    if not snapshot_archive.is_member(file_path):
+        return pacsv.read_csv(file_path, read_options, parse_options, convert_options)
+    with snapshot_archive.open_snapshot(file_path) as stream:
+        return pacsv.read_csv(stream, read_options, parse_options, convert_options)
+
+def _parse_text(array, spec):
+    '''
+        Apply the registry parsing rule to a text column while it is still an arrow array.
+    '''
+    return pc.if_else(pc.is_in(array, value_set=NA_VALUE_SET), pa.scalar(None, pa.string()), array)
+
+def _parse_rule(series, spec):
+    '''
+        Apply the registry parsing rule to a non-text column loaded by pyarrow.
+    '''
+    if spec.rule == 'id':
+        return series.str.strip()
+    if spec.rule == 'status':
+        na_categories = [cat for cat in series.cat.categories if cat in PANDAS_NA_VALUES]
+        return series.cat.remove_categories(na_categories) if na_categories else series
+    if spec.rule == 'flag':
+        series = series.replace({'True': '1', 'False': '0'})
+        return _to_integer(pd.to_numeric(series, errors='coerce'), spec.dtype)
+    if series.dtype == object:
+        # Fallback path: values that pyarrow could not convert are coerced like pd.to_numeric did.
+        # A comma is a decimal separator in a score (0,5) and a thousands separator in a count (1,234).
+        separator = '' if spec.rule == 'count' else '.'
+        series = pd.to_numeric(series.str.replace(',', separator, regex=False), errors='coerce')
+    if series.dtype == spec.dtype:
+        return series
+    return _to_integer(series, spec.dtype) if spec.rule == 'count' else series.astype(spec.dtype)
+
+def _to_integer(series, dtype):
+    '''
+        Cast numbers to a nullable integer type, the values that are not integers become null instead of failing the whole load.
+    '''
+    numbers = series.astype('float64')
+    return numbers.where(numbers.abs().lt(float('inf')) & (numbers == numbers.round())).astype(dtype)
+
+def read_snapshot(file_path, usecols=None, separator=',', raw=False, topic=None):
+    '''
+        Load a KGHeartBeat CSV with the multithreaded pyarrow parser, typing every column as declared in the schema registry.
+
+        :param file_path: path to the snapshot, it can be a member of an archive (e.g. ../data/quality_data/all_kgs_analyzed/history.zip/2024-11-24.csv).
+        :param usecols: columns to load, None loads all of them. Columns missing from older snapshots are filled with nulls.
+        :param separator: separator used in the file.
+        :param raw: if True, every column is loaded as text exactly as written in the file (used to rewrite snapshots losslessly).
+        :param topic: if given, only the rows of the KGs in the topic are returned ('all' is the LOD Cloud, 'no-domain' the KGs without a topic), see read_topic_view.
+    '''
+    if topic is not None:
+        return read_topic_view(file_path, topic, usecols, separator, raw)
+
+    read_options = pacsv.ReadOptions(use_threads=True)
+    parse_options = pacsv.ParseOptions(delimiter=separator, newlines_in_values=True)
+
+    if raw:
+        convert_options = pacsv.ConvertOptions(include_columns=usecols or [], include_missing_columns=True,
+                                               default_column_type=pa.string(), null_values=PANDAS_NA_VALUES, strings_can_be_null=True)
+        return _read_csv(file_path, read_options, parse_options, convert_options).to_pandas()
+
+    header = read_header(file_path, separator)
+    if usecols is None:
+        columns = header
+    else:
+        columns = [column for column in header if column in usecols] + [column for column in usecols if column not in header]
+    schema = get_schema(snapshot_date(file_path))
+    specs = {column: schema.get(column, TEXT) for column in columns}
+
+    null_values = set(PANDAS_NA_VALUES)
+    for spec in specs.values():
+        null_values.update(spec.sentinels)
+
+    def convert(column_types):
+        convert_options = pacsv.ConvertOptions(include_columns=columns, include_missing_columns=True, column_types=column_types,
+                                               null_values=sorted(null_values), strings_can_be_null=False)
+        return _read_csv(file_path, read_options, parse_options, convert_options)
+
+    column_types = {column: ARROW_TYPES[spec.rule] for column, spec in specs.items()}
+    try:
+        table = convert(column_types)
+    except pa.ArrowInvalid:
+        column_types = {column: (pa.string() if spec.rule in ('score', 'count') else column_types[column]) for column, spec in specs.items()}
+        table = convert(column_types)
+
+    for index, (column, spec) in enumerate(specs.items()):
+        if spec.rule == 'text':
+            table = table.set_column(index, column, _parse_text(table.column(index), spec))
+
+    df = table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    for column, spec in specs.items():
+        if spec.rule != 'text':
+            df[column] = _parse_rule(df[column], spec)
+
+    return df
+
+def read_topic_view(file_path, topic, usecols=None, separator=',', raw=False):
+    '''
+        Read the rows of a topic from a canonical snapshot, as they would be read from its copy split by topic.
+        The membership of every KG is the topic bitset of the dictionary (see kg_id_dictionary.py), applied as a row mask.
+        The category scores missing from the snapshot are computed from the dimensions, as add_category_score writes them in the copies.
+
+        :param file_path: path to the canonical snapshot.
+        :param topic: name of the topic, 'all' is the LOD Cloud and 'no-domain' the KGs without a topic.
+        See read_snapshot for the other parameters.
+    '''
+    header = read_header(file_path, separator)
+    categories = [] if raw else [category for category in CATEGORY_DIMENSIONS if category not in header]
+    view_header = header + categories
+    if usecols is None:
+        columns = view_header
+    else:
+        categories = [category for category in categories if category in usecols]
+        columns = [column for column in view_header if column in usecols] + [column for column in usecols if column not in view_header]
+    dimensions = [dimension for category in categories for dimension in CATEGORY_DIMENSIONS[category]]
+    to_read = list(dict.fromkeys(['KG id'] + [column for column in columns if column not in categories] + dimensions))
+
+    df = select_topic(read_snapshot(file_path, usecols=to_read, separator=separator, raw=raw), topic)
+    return add_category_scores(df, categories)[columns]
+
+def select_topic(df, topic):
+    '''
+        Return the rows of the KGs in a topic from a snapshot already loaded, as they would be read from its copy split by topic.
+
+        :param df: DataFrame with the snapshot, it must have the KG id column.
+        :param topic: name of the topic, 'all' is the LOD Cloud and 'no-domain' the KGs without a topic.
+    '''
+    # Imported here: the dictionary reads the snapshots with this module, and only the topic views need the membership of the KGs
+    import kg_id_dictionary
+    kg_ids = kg_id_dictionary.get_dictionary()
+    df = df[kg_ids.topic_mask(kg_ids.encode(df['KG id']), topic)].reset_index(drop=True)
+    # The categories of a status column are the values in order of first appearance, as pyarrow reads them from a copy with only these rows
+    for column in df.columns:
+        if column != 'KG id' and isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].cat.set_categories(df[column].dropna().astype(object).unique())
+    return df
+
+def add_category_scores(df, categories=None):
+    '''
+        Add the category scores to a snapshot already loaded, computed from the dimensions as add_category_score writes them in the csv files.
+
+        :param df: DataFrame with the snapshot, it must have the dimensions of the categories.
+        :param categories: names of the categories to add, None adds the ones missing from the snapshot.
+    '''
+    if categories is None:
+        categories = [category for category in CATEGORY_DIMENSIONS if category not in df.columns]
+    for category in categories:
+        df[category] = df[CATEGORY_DIMENSIONS[category]].sum(axis=1) / len(CATEGORY_DIMENSIONS[category])
+    return df
@@ -0,0 +1,150 @@
+import ast
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import kghb_schema
+import summary_stats
+
+# A list of quoted strings without escapes (the common case), that the regex splits exactly as ast.literal_eval parses it
+SIMPLE_STRING = r"'[^'\\\n]*'" + r'|"[^"\\\n]*"'
+SIMPLE_LIST = rf"""\[\s*(?:(?:{SIMPLE_STRING})\s*(?:,\s*(?:{SIMPLE_STRING})\s*)*,?\s*)?\]"""
+
+def _literal_list(value):
+    '''
+        Parse a list with ast.literal_eval, None if the value is malformed or is not a list.
+    '''
+    try:
+        # Invalid escape sequences in the values only warn, they are read as they are
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', (DeprecationWarning, SyntaxWarning))
+            parsed = ast.literal_eval(value)
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return None
+    return parsed if isinstance(parsed, list) else None
+
+def explode_list_column(series):
+    '''
+        Split a column whose values are lists written as text (e.g. "['text/turtle', 'application/rdf+xml']") into one entry per element, without parsing the values one by one.
+        Returns the elements, indexed by the row they come from, and the length of the list in every row (NaN if the value is not a list).
+        The lists with escaped characters, bare values or a malformed syntax are parsed with ast.literal_eval, so the result is always the same as parsing every value with it.
+
+        :param series: pandas Series with the list values.
+    '''
+    values = series.astype(str).str.strip()
+    is_list = values.str.startswith('[') & values.str.endswith(']')
+    simple = is_list & values.str.fullmatch(SIMPLE_LIST)
+    # The quotes are captured with the element, so that an empty string is not read as a missing match
+    elements = values[simple].str[1:-1].str.extractall(f'({SIMPLE_STRING})')[0].str[1:-1]
+    elements.index = elements.index.get_level_values(0)
+
+    lengths = pd.Series(np.nan, index=series.index)
+    lengths[simple] = 0
+    counts = elements.groupby(level=0).size()
+    lengths[counts.index] = counts
+
+    # The other lists are parsed one by one, their elements are written as text like the ones split by the regex
+    parsed = values[is_list & ~simple].map(_literal_list).dropna()
+    if len(parsed):
+        lengths[parsed.index] = parsed.map(len)
+        fallback = pd.Series([str(element) for parsed_list in parsed for element in parsed_list],
+                             index=np.repeat(parsed.index, parsed.map(len)), dtype=object)
+        elements = pd.concat([elements.astype(object), fallback]).sort_index(kind='stable') if len(elements) else fallback
+
+    return elements, lengths
+
+class ListMetricsOverTime:
+    def __init__(self, topics, quality_data_path='../data/quality_data/only_from_LODC', output_path='../data/evaluation_results/list_metrics'):
+        '''
+            Turns the metrics that have lists as value (vocabularies, serialization formats, languages, ...) of all the analyses into a long table
+            (analysis date, topic, KG id, metric, element), from which frequencies and list lengths over time are grouped aggregations.
+
+            :param topics: list of the topics to include, 'all' is the entire LOD Cloud.
+            :param quality_data_path: path to the folder with the quality data split by topic.
+            :param output_path: path to the folder in which to write the tables.
+        '''
+        self.topics = topics
+        self.quality_data_path = quality_data_path
+        self.output_path = output_path
+
+    def explode(self, metrics):
+        '''
+            Read every analysis of every topic once and explode all the given list metrics. The tables are stored as parquet files.
+
+            :param metrics: list of the column names of the metrics that have lists as value.
+        '''
+        elements_list = []
+        lengths_list = []
+        for topic in self.topics:
+            topic_path = os.path.join(self.quality_data_path, topic)
+            for filename in sorted(os.listdir(topic_path)):
+                if '.csv' not in filename:
+                    continue
+                df = kghb_schema.read_snapshot(os.path.join(topic_path, filename), usecols=['KG id'] + metrics)
+                analysis_date = filename.split('.')[0]
+                for metric in metrics:
+                    elements, lengths = explode_list_column(df[metric])
+                    elements_list.append(pd.DataFrame({
+                        'Analysis date': analysis_date,
+                        'Topic': topic,
+                        'KG id': df['KG id'].to_numpy()[elements.index],
+                        'Metric': metric,
+                        'Element': elements.to_numpy(),
+                    }))
+                    lengths_list.append(pd.DataFrame({
+                        'Analysis date': analysis_date,
+                        'Topic': topic,
+                        'KG id': df['KG id'].to_numpy(),
+                        'Metric': metric,
+                        'Length': lengths.to_numpy(),
+                    }))
+
+        elements = pd.concat(elements_list, ignore_index=True)
+        lengths = pd.concat(lengths_list, ignore_index=True)
+        for table in (elements, lengths):
+            for column in ['Analysis date', 'Topic', 'KG id', 'Metric']:
+                table[column] = table[column].astype(str).astype('category')
+
+        os.makedirs(self.output_path, exist_ok=True)
+        elements.to_parquet(os.path.join(self.output_path, 'elements.parquet'), index=False)
+        lengths.to_parquet(os.path.join(self.output_path, 'lengths.parquet'), index=False)
+
+        return elements, lengths
+
+    def load(self):
+        '''
+            Load the tables written by explode.
+        '''
+        elements = pd.read_parquet(os.path.join(self.output_path, 'elements.parquet'))
+        lengths = pd.read_parquet(os.path.join(self.output_path, 'lengths.parquet'))
+        return elements, lengths
+
+    def element_frequencies(self, elements, metric):
+        '''
+            Count the occurrences of every element of a metric for every topic and analysis date, and write them in a csv file.
+
+            :param elements: table returned by explode.
+            :param metric: column name of the metric.
+        '''
+        df = elements[elements['Metric'] == metric]
+        frequencies = df.groupby(['Topic', 'Analysis date', 'Element'], observed=True).size().reset_index(name='Count')
+        frequencies.to_csv(os.path.join(self.output_path, f'{metric}_frequencies.csv'), index=False)
+
+        return frequencies
+
+    def length_stats(self, lengths, metric):
+        '''
+            Calculate the min, max, median, mean, q1, q3 of the list length of a metric for every topic and analysis date, and write them in a csv file.
+
+            :param lengths: table returned by explode.
+            :param metric: column name of the metric.
+        '''
+        df = lengths[lengths['Metric'] == metric]
+        grouped = df.groupby(['Topic', 'Analysis date'], observed=True)
+        groups = grouped.size().index
+        # The lengths of all the groups are computed at once
+        stats = pd.DataFrame(summary_stats.compute_grouped(df['Length'].to_numpy(dtype=float, na_value=np.nan), grouped.ngroup().to_numpy(), len(groups)),
+                             index=groups, columns=summary_stats.STATS).reset_index()
+        stats.to_csv(os.path.join(self.output_path, f'{metric}_length_stats.csv'), index=False)
+
+        return stats
@@ -0,0 +1,252 @@
+import bisect
+import codecs
+import hashlib
+import json
+import os
+import re
+
+here = os.path.dirname(os.path.abspath(__file__))
+LODCLOUD_PATH = os.path.join(here, '../data/lodcloud.json')
+INDEX_PATH = os.path.join(here, '../data/lodcloud_index.json')
+
+WHITESPACE = re.compile(r'\s*')
+
+def _urls(resources, url_key):
+    return [resource.get(url_key) for resource in resources or [] if isinstance(resource, dict)]
+
+# Fields kept in the index for every KG, extracted from its entry in the dump.
+FIELDS = {
+    'title': lambda kg: kg.get('title'),
+    'sparql': lambda kg: _urls(kg.get('sparql'), 'access_url'),
+    'full_download': lambda kg: _urls(kg.get('full_download'), 'download_url'),
+    'links': lambda kg: [link.get('target') for link in kg.get('links') or [] if isinstance(link, dict)],
+}
+
+class _DumpReader:
+    '''
+        Reads the dump in chunks, keeping only the text not parsed yet and the byte offset of the parsing position.
+    '''
+    def __init__(self, file, digest, chunk_size):
+        self.file = file
+        self.digest = digest
+        self.chunk_size = chunk_size
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.text = ''
+        self.pos = 0
+        # Byte offset in the file of self.text[self.mark]
+        self.mark = 0
+        self.mark_bytes = 0
+
+    def read(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.digest.update(chunk)
+        self.text = self.text[self.mark:] + self.utf8.decode(chunk)
+        self.pos -= self.mark
+        self.mark = 0
+        return True
+
+    def byte_offset(self, pos):
+        self.mark_bytes += len(self.text[self.mark:pos].encode('utf-8'))
+        self.mark = pos
+        return self.mark_bytes
+
+    def peek(self):
+        '''
+            Skip the whitespaces and return the next character, None at the end of the file.
+        '''
+        while True:
+            self.pos = WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.read():
+                return None
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError(f"Malformed LOD Cloud dump: expected '{character}' at byte {self.byte_offset(self.pos)}")
+        self.pos += 1
+
+    def value(self):
+        '''
+            Parse the next JSON value, reading more chunks until it is complete.
+        '''
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+                return value, self.pos, end
+            except json.JSONDecodeError:
+                if not self.read():
+                    raise
+
+def iter_dump(dump_path, digest=None, chunk_size=1 << 20):
+    '''
+        Parse the LOD Cloud dump one KG at a time, without loading the whole file.
+        Yields (key, entry, offset, length), where offset and length are the position in bytes of the entry in the file.
+
+        :param dump_path: path to the LOD Cloud JSON dump.
+        :param digest: hashlib object updated with the content of the file.
+        :param chunk_size: number of bytes read at a time.
+    '''
+    digest = digest if digest is not None else hashlib.sha256()
+    with open(dump_path, 'rb') as file:
+        reader = _DumpReader(file, digest, chunk_size)
+        reader.expect('{')
+        while True:
+            character = reader.peek()
+            if character == '}':
+                break
+            if character == ',':
+                reader.pos += 1
+                continue
+            key, start, end = reader.value()
+            reader.pos = end
+            reader.expect(':')
+            entry, start, end = reader.value()
+            offset = reader.byte_offset(start)
+            length = reader.byte_offset(end) - offset
+            reader.pos = end
+            yield key, entry, offset, length
+        # The rest of the file is only hashed
+        while reader.read():
+            reader.mark = len(reader.text)
+
+def file_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class LODCloudIndex:
+    def __init__(self, dump_path=LODCLOUD_PATH, index_path=INDEX_PATH):
+        '''
+            Compact index of the LOD Cloud dump: for every KG identifier, the position of its entry in the file and a few selected fields
+            (see FIELDS), plus the sorted array of the identifiers for membership tests.
+            The index is persisted and rebuilt only when the content of the dump changes.
+
+            :param dump_path: path to the LOD Cloud JSON dump.
+            :param index_path: path to the JSON file in which the index is persisted.
+        '''
+        self.dump_path = dump_path
+        self.index_path = index_path
+        if not self._load():
+            self.build()
+
+    def _load(self):
+        '''
+            Load the persisted index, returns False if it is missing or out of date.
+        '''
+        if not os.path.isfile(self.index_path):
+            return False
+        with open(self.index_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if data.get('fields') != list(FIELDS):
+            return False
+
+        stat = os.stat(self.dump_path)
+        # The hash is computed again only if the file was touched
+        if data['size'] != stat.st_size or data['mtime_ns'] != stat.st_mtime_ns:
+            if data['hash'] != file_hash(self.dump_path):
+                return False
+            data['size'], data['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            self._set(data)
+            self.save()
+            return True
+
+        self._set(data)
+        return True
+
+    def _set(self, data):
+        self.hash = data['hash']
+        self.size = data['size']
+        self.mtime_ns = data['mtime_ns']
+        self.entries = data['entries']
+        self.ids = data['ids']
+
+    def build(self):
+        '''
+            Build the index with a streaming parse of the dump and persist it.
+        '''
+        digest = hashlib.sha256()
+        entries = {}
+        for key, kg, offset, length in iter_dump(self.dump_path, digest):
+            identifier = kg.get('identifier', key) if isinstance(kg, dict) else key
+            record = {'key': key, 'offset': offset, 'length': length}
+            if isinstance(kg, dict):
+                record.update({field: extract(kg) for field, extract in FIELDS.items()})
+            entries[identifier] = record
+
+        stat = os.stat(self.dump_path)
+        self._set({
+            'hash': digest.hexdigest(),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'entries': entries,
+            'ids': sorted(entries),
+        })
+        self.save()
+
+    def save(self):
+        '''
+            Persist the index.
+        '''
+        data = {
+            'hash': self.hash,
+            'size': self.size,
+            'mtime_ns': self.mtime_ns,
+            'fields': list(FIELDS),
+            'entries': self.entries,
+            'ids': self.ids,
+        }
+        with open(self.index_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, identifier):
+        position = bisect.bisect_left(self.ids, identifier)
+        return position < len(self.ids) and self.ids[position] == identifier
+
+    def identifiers(self):
+        '''
+            Return the identifiers of the KGs in the dump, in the order of the dump.
+        '''
+        return list(self.entries)
+
+    def get(self, identifier):
+        '''
+            Return the indexed fields of a KG, None if it is not in the LOD Cloud.
+
+            :param identifier: identifier of the KG.
+        '''
+        return self.entries.get(identifier)
+
+    def read_entry(self, identifier):
+        '''
+            Read the complete entry of a KG from the dump, seeking directly to its position.
+
+            :param identifier: identifier of the KG.
+        '''
+        record = self.entries[identifier]
+        with open(self.dump_path, 'rb') as file:
+            file.seek(record['offset'])
+            return json.loads(file.read(record['length']).decode('utf-8'))
+
+_indexes = {}
+
+def get_index(dump_path=LODCLOUD_PATH):
+    '''
+        Return the index of a dump shared by all the modules of the process.
+
+        :param dump_path: path to the LOD Cloud JSON dump.
+    '''
+    dump_path = os.path.abspath(dump_path)
+    if dump_path not in _indexes:
+        index_path = INDEX_PATH if dump_path == os.path.abspath(LODCLOUD_PATH) else os.path.splitext(dump_path)[0] + '_index.json'
+        _indexes[dump_path] = LODCloudIndex(dump_path, index_path)
+    return _indexes[dump_path]
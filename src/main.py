@@ -2,11 +2,21 @@ from quality_evaluation_over_time import QualityEvaluationOT
 from punctual_quality_evaluation import PunctualQualityEvaluation
 from generate_charts import GenerateCharts
 import argparse
+import signal
 from split_lodc_kgs_by_topic import SplitLODCKGsByTopic
+from incremental_ingest import SnapshotIngest
+from snapshot_watcher import SnapshotWatcher
+import results_store
+import kghb_schema
+import kg_id_dictionary
+import http_client
 
 TOPICS = ['cross-domain','geography','government','life-sciences','linguistic','media','publications','social-networking','user-generated','no-domain']
 
-def generate_charts(topic):
+def generate_charts(topic, results=None):
+    '''
+        :param results: results store from which the tables are read, when the CSV files are not exported (None reads the CSV files).
+    '''
     #chart_generator_over_time_dimensions = GenerateCharts(f'../data/evaluation_results/{topic}/over_time/by_dimension',f'../charts/{topic}/over_time/by_dimension')
     #chart_generator_over_time_dimensions.generate_boxplots_over_time('M')
 
@@ -20,20 +30,33 @@ def generate_charts(topic):
     #chart_generator_over_time_category.generate_combined_boxplot_over_time('M','Quality by category','category_score_over_time_quarterly')
 
     #Generates a boxplot with data statistics of all quality dimensions, with point data from the last analysis available
-    chart_generator_punctual_dimensions = GenerateCharts(f'../data/evaluation_results/2024/{topic}/punctual',f'../charts/{topic}/punctual')
-    chart_generator_punctual_dimensions.generate_boxplots_punctual(f'../data/evaluation_results/2024/{topic}/punctual/dimensions_stats.csv','quality_dimensions')
+    chart_generator_punctual_dimensions = GenerateCharts(charts_output=f'../charts/{topic}/punctual')
+    dimensions_stats = f'../data/evaluation_results/2024/{topic}/punctual/dimensions_stats.csv'
+    chart_generator_punctual_dimensions.generate_boxplots_punctual(results.frame(dimensions_stats) if results is not None else dimensions_stats,'quality_dimensions')
 
     #Generates a boxplot with data statistics of all quality categories, with point data from the last analysis available
-    chart_generator_punctual_dimensions = GenerateCharts(f'../data/evaluation_results/2024/{topic}/punctual',f'../charts/{topic}/punctual')
-    chart_generator_punctual_dimensions.generate_boxplots_punctual(f'../data/evaluation_results/2024/{topic}/punctual/categories_stats.csv','quality_categories','Category')
+    chart_generator_punctual_dimensions = GenerateCharts(charts_output=f'../charts/{topic}/punctual')
+    categories_stats = f'../data/evaluation_results/2024/{topic}/punctual/categories_stats.csv'
+    chart_generator_punctual_dimensions.generate_boxplots_punctual(results.frame(categories_stats) if results is not None else categories_stats,'quality_categories','Category')
 
     #Generates boxplot with a focus on the same dimensions/categories as the topic changes
     boxplot_by_topic = GenerateCharts()
-    boxplot_by_topic.generate_boxplot_by_topic('cat')
-    boxplot_by_topic.generate_boxplot_by_topic('dim')
+    boxplot_by_topic.generate_boxplot_by_topic('cat', results=results)
+    boxplot_by_topic.generate_boxplot_by_topic('dim', results=results)
+    #Same charts drawn as panels of one grid figure (faster, each panel is also exported as {dimension}_panel.png)
+    #boxplot_by_topic.generate_boxplot_by_topic('cat',grid=True)
+    #boxplot_by_topic.generate_boxplot_by_topic('dim',grid=True)
     
 
-def filtering():
+def filtering(views=False):
+    if views:
+        #The topics are read as views of ../data/quality_data/all_kgs_analyzed, only the KGs membership has to be updated (no copies are written)
+        SplitLODCKGsByTopic().recover_lodc_kgs_by_topic()
+        kg_ids = kg_id_dictionary.get_dictionary()
+        kg_ids.refresh_membership()
+        kg_ids.save()
+        return
+
     #Extract only KGs in the LOD Cloud from the the quality analysis results.
     analysis_over_time = QualityEvaluationOT(f'../data/quality_data/only_from_LODC/all',f'./evaluation_results/all/over_time')
     analysis_over_time.extract_only_lodc('../data/quality_data/all_kgs_analyzed')
@@ -43,16 +66,55 @@ def filtering():
     #by_topic.recover_lodc_kgs_by_topic()
     by_topic.split_kgs_csv_by_topic('../data/quality_data/all_kgs_analyzed')
 
-
-def evaluation(topics):
+    #Store the whole history as keyframes plus the cells changed every week (in ../data/quality_data/delta_store), any date can be rebuilt
+    #with delta_store.reconstruct('2024-11-24') and the changes scanned with delta_store.scan_deltas(['Sparql endpoint'])
+    #from delta_store import DeltaStore
+    #delta_store = DeltaStore()
+    #delta_store.build('../data/quality_data/all_kgs_analyzed')
+    #print(delta_store.compression_report())
+
+    #Build the state of the detector of sudden quality regressions from the history (the incremental ingest then updates it with every new snapshot).
+    #The regressions are appended to ../data/evaluation_results/anomaly_alerts.csv
+    #from anomaly_detector import AnomalyDetector
+    #AnomalyDetector().replay(analysis_over_time.analysis_results_files)
+
+    #Probe again all the SPARQL endpoints of the LOD Cloud (ASK/LIMIT 1 queries, availability, latency and throughput), results in ../data/quality_data/sparql_probes
+    #import sparql_prober
+    #probes = sparql_prober.SparqlProber().run(sparql_prober.endpoint_urls(analysis_over_time.analysis_results_files[-1]))
+    #sparql_prober.save(probes)
+
+    #Describe every snapshot once in the catalog (../data/quality_data/snapshot_catalog.json), the snapshots are then selected by date and by column statistics
+    #without opening them, e.g. the ones with some SPARQL endpoint available: analysis_over_time.select_snapshots(where=[('Sparql endpoint','==','Available')])
+    #import snapshot_catalog
+    #snapshot_catalog.get_catalog().refresh(analysis_over_time.analysis_results_files)
+
+    #Pearson and Spearman correlation matrices of the dimensions for every topic and snapshot (only the snapshots not seen before are read),
+    #exported as (topics x snapshots x dimensions x dimensions) tensors in ../data/evaluation_results/dimension_correlations.npz
+    #import snapshot_archive
+    #from dimension_correlations import DimensionCorrelations
+    #correlations = DimensionCorrelations()
+    #correlations.replay(snapshot_archive.list_snapshots('../data/quality_data/all_kgs_analyzed'))
+    #correlations.export()
+
+
+def punctual_evaluation(topic, views=False):
+    if views:
+        return PunctualQualityEvaluation('../data/quality_data/all_kgs_analyzed/2024-11-24.csv',topic,topic=topic)
+    return PunctualQualityEvaluation(f'../data/quality_data/only_from_LODC/{topic}/2024-11-24.csv',topic)
+
+def evaluation(topics, export_csv=True, views=False):
     for topic in topics:
         print(f'Running evaluation for topic: {topic} ...')
 
-        #Load all csv with quality data into pandas df. Results are stored as CSV in the ./evaluation_results/over_time
-        analysis_over_time = QualityEvaluationOT(f'../data/quality_data/only_from_LODC/{topic}',f'./evaluation_results/{topic}/over_time')
+        #Load all csv with quality data into pandas df. Results are stored in ../data/evaluation_results/results.sqlite (tables of ./evaluation_results/over_time)
+        #With views, the rows of the topic are selected from ../data/quality_data/all_kgs_analyzed when they are read, instead of reading the copies split by topic
+        if views:
+            analysis_over_time = QualityEvaluationOT(output_file=f'./evaluation_results/{topic}/over_time',topic=topic)
+        else:
+            analysis_over_time = QualityEvaluationOT(f'../data/quality_data/only_from_LODC/{topic}',f'./evaluation_results/{topic}/over_time')
 
-        #Load csv with the most recent quality analysis avilable. Results are stored as CSV in the ./evaluation_results/punctual
-        punctual_analysis = PunctualQualityEvaluation(f'../data/quality_data/only_from_LODC/{topic}/2024-11-24.csv',topic)
+        #Load csv with the most recent quality analysis avilable. Results are stored in the same database (tables of ./evaluation_results/punctual)
+        punctual_analysis = punctual_evaluation(topic, views)
 
         #Evaluate the Availability of the SPARQL endpoint / VoID file / RDF dump
         #punctual_analysis.accessibility_stats()
@@ -103,6 +165,13 @@ def evaluation(topics):
         #analysis_over_time.stats_over_time(['Entities as member of disjoint class','Invalid usage of inverse-functional properties','Deprecated classes/properties used'],'by_metric')
         #analysis_over_time.evaluate_conciseness()
 
+        #Evaluate all the derived metrics registered in derived_metrics.py (P1, CN2, number of vocabularies, ...) with a single scan of the analyses
+        #analysis_over_time.evaluate_derived_metrics()
+
+        #Track which KGs changed which scores or status between two consecutive analyses (e.g. SPARQL endpoint gone down, license disappeared)
+        #from snapshot_diff import SnapshotDiff
+        #SnapshotDiff().change_log(analysis_over_time.analysis_results_files,f'../data/evaluation_results/{topic}/over_time/change_log.csv')
+
         #Analyze the SPARQL endpoint status over time
         #Classify the KG SPARQL endpoint availability over time i.e., whether for a given KG, it was always online, offline, not indicated, or fluctuated in behavior between the 3 states.
         #status_df, status_counts, combined_df  = analysis_over_time.classify_sparql_endpoint_availability()
@@ -121,7 +190,7 @@ def evaluation(topics):
         #                                    'Representational score','Trust score'],'by_category')
 
         #Evaluate the quality of each category in the punctual analysis, by calculating the q1, min, median, q3, max.
-        punctual_analysis = PunctualQualityEvaluation(f'../data/quality_data/only_from_LODC/{topic}/2024-11-24.csv',topic)
+        punctual_analysis = punctual_evaluation(topic, views)
         punctual_analysis.generate_stats(['Accessibility score','Contextual score','Dataset dynamicity score','Intrinsic score',
                                             'Representational score','Trust score'],'categories_stats',only_sparql_up=True)
 
@@ -133,7 +202,42 @@ def evaluation(topics):
         #    'Representational-Consistency score','Representational-Conciseness score','Understandability score','Interpretability score','Versatility score','Security score'
         #],'by_dimension')
 
-        generate_charts(topic)
+        #Export the results of the topic in the legacy layout of one CSV for every table, read by the charts
+        if export_csv:
+            results_store.get_store().export_csv(topic)
+
+        #Without the CSV files the charts are drawn from the tables in the results store
+        generate_charts(topic, None if export_csv else results_store.get_store())
+
+    #Explode the metrics that have a list as value, from all the analyses and topics, into a single long table, then calculate
+    #the frequency of every element and the stats of the list length over time (results in ../data/evaluation_results/list_metrics)
+    #from list_metrics_over_time import ListMetricsOverTime
+    #list_metrics = ListMetricsOverTime(topics)
+    #elements, lengths = list_metrics.explode(['metadata-media-type','Vocabularies','Serialization formats','Languages (query)'])
+    #list_metrics.element_frequencies(elements,'metadata-media-type')
+    #list_metrics.length_stats(lengths,'Vocabularies')
+
+    #Per KG trends of the dimensions (rolling median, slope and volatility over the last 8 snapshots), aggregated by topic
+    #from kg_trends import KGTrends
+    #kg_trends = KGTrends()
+    #trends = kg_trends.compute(['Availability score','Licensing score','Interlinking score','Performance score','Accuracy score','Consistency score'],window=8)
+    #kg_trends.save(trends)
+    #kg_trends.by_topic(trends, TOPICS + ['all'])
+
+    #Test whether the quality dimensions differ between topics (Kruskal-Wallis across the topics and pairwise Mann-Whitney tests, with permutation
+    #p-values corrected for multiple comparisons). Results in ../data/evaluation_results/2024/significance
+    #from significance import SignificanceTests
+    #SignificanceTests(TOPICS).run([
+    #    'Availability score','Licensing score','Interlinking score','Performance score','Accuracy score','Consistency score','Conciseness score',
+    #    'Verifiability score','Reputation score','Believability score','Currency score','Volatility score','Completeness score','Amount of data score',
+    #    'Representational-Consistency score','Representational-Conciseness score','Understandability score','Interpretability score','Versatility score','Security score'
+    #],'dimensions')
+
+    #The same evaluation as a library call: every snapshot is read once and the frames and stats are handed over in memory (see quality_api.py).
+    #The results are written in the store (and exported as csv) only because a sink is given
+    #from quality_api import evaluate
+    #results = evaluate('../data/quality_data/all_kgs_analyzed', topics, sink=results_store.get_store(), export_csv=True)
+    #GenerateCharts().generate_boxplot_by_topic('dim', results=results)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Script with parameter -j o --jump_filtering")
@@ -143,34 +247,56 @@ if __name__ == '__main__':
     group.add_argument("-c", "--charts_only", action="store_true", help="If specified, the script will only generate charts and skip other processing steps.")
     group.add_argument("-t", "--topics_only", action="store_true", help="If specified, the evaluation will be done by dividing KGs by topic, no overall analysis of the LOD Cloud will be done ")
     group.add_argument("-l", "--all_lodc", action="store_true", help="If specified, the evaluation will be made of the quality of the entire LOD Cloud, without the breakdown of KGs by topic.")
+    group.add_argument("-w", "--watch", metavar="DIR", nargs='?', const='../data/quality_data/all_kgs_analyzed', help="Keep running and ingest every new dated CSV dropped by KGHeartBeat in the directory (by default ../data/quality_data/all_kgs_analyzed).")
+    group.add_argument("-i", "--ingest", metavar="SNAPSHOT", help="Path to a new CSV returned by KGHeartBeat. Only this snapshot is filtered, split by topic and scored, and one row is added to the statistics over time (re-ingesting a date replaces its row).")
+    parser.add_argument("--no_csv_export", action="store_true", help="If specified, the results are only written in ../data/evaluation_results/results.sqlite, without exporting one CSV for every table.")
+    parser.add_argument("-v", "--views", action="store_true", help="If specified, the topics are read as views of ../data/quality_data/all_kgs_analyzed, without writing a copy of every snapshot for every topic.")
+    parser.add_argument("--http", choices=http_client.MODES, default='cache', help="How the downloads (LOD Cloud SVGs and metadata) use the cache in ../data/http_cache: 'cache' reuses the unchanged resources, 'record' stores every response and 'replay' never goes on the network.")
     args = parser.parse_args()
+    http_client.set_mode(args.http)
+    #Without the CSV files the charts are drawn from the tables in the results store
+    charts_results = results_store.get_store() if args.no_csv_export else None
+
+    if(args.ingest):
+        SnapshotIngest(args.ingest, TOPICS + ['all']).run()
+    if(args.watch):
+        # The snapshots without a record in the ingest log were ingested before it existed if their date is in the statistics over time of the LOD Cloud
+        evaluated = results_store.get_store().read('evaluation_results/all/over_time/by_dimension/Availability score.csv')
+        evaluated_dates = {row[0] for row in evaluated[1]} if evaluated else set()
+        watcher = SnapshotWatcher(args.watch, lambda snapshot: SnapshotIngest(snapshot, TOPICS + ['all']).run(should_stop=watcher.stop_event.is_set),
+                                  log_path='../data/evaluation_results/ingest_log.jsonl',
+                                  ingested=lambda snapshot: str(kghb_schema.snapshot_date(snapshot)) in evaluated_dates)
+        # The stage running when the signal arrives is completed, the following ones are cancelled
+        signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+        watcher.run()
 
     if(args.jump_filtering == True):
         if(args.topics_only == True):
-            evaluation(TOPICS)
+            evaluation(TOPICS, not args.no_csv_export, args.views)
         elif(args.all_lodc):
-            evaluation('all')
+            evaluation('all', not args.no_csv_export, args.views)
         else:
             TOPICS.append('all')
-            evaluation(TOPICS)
+            evaluation(TOPICS, not args.no_csv_export, args.views)
     if(args.charts_only == True):
         if(args.topics_only == True):
-            generate_charts(TOPICS)
+            generate_charts(TOPICS, charts_results)
         elif(args.all_lodc):
-            generate_charts('all')
+            generate_charts('all', charts_results)
         else:
             TOPICS.append('all')
-            generate_charts(TOPICS)
-    if(args.jump_filtering == False and args.charts_only == False):
+            generate_charts(TOPICS, charts_results)
+    if(args.jump_filtering == False and args.charts_only == False and not args.ingest and not args.watch):
         if(args.topics_only == True):
-            filtering()
-            evaluation(TOPICS)
-            generate_charts(TOPICS)
+            filtering(args.views)
+            evaluation(TOPICS, not args.no_csv_export, args.views)
+            generate_charts(TOPICS, charts_results)
         elif(args.all_lodc):
-            filtering()
-            evaluation('all')
-            generate_charts(TOPICS)
+            filtering(args.views)
+            evaluation('all', not args.no_csv_export, args.views)
+            generate_charts(TOPICS, charts_results)
         else:
-            filtering()
+            filtering(args.views)
             TOPICS.append('all')
-            evaluation(TOPICS)
+            evaluation(TOPICS, not args.no_csv_export, args.views)
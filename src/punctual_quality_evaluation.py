@@ -4,18 +4,34 @@ import csv
 import ast
 import requests
 from xml.etree import ElementTree
+import numpy as np
+import kghb_schema
+import bootstrap
+import summary_stats
+import list_metrics_over_time
+import results_store
+import http_client
 
 class PunctualQualityEvaluation:
-    def __init__(self, analysis_file_path,output_dir,separator = ','):
+    def __init__(self, analysis_file_path,output_dir,separator = ',',topic=None,analysis_data=None,results=None):
         '''
             Loads the contents of the csv file containing the analysis data into memory.
 
             :param analysis_file_path: Path to the file that contains the quality data to be evaluated
             :param output_dir: name of the folder under “evaluation_results” in which to include the evaluation results
             :param separator: separator used in the analysis file (by default is ',')
+            :param topic: if given, analysis_file_path is a canonical snapshot (e.g. ../data/quality_data/all_kgs_analyzed/2024-11-24.csv) and only the KGs of the topic are loaded ('all' is the LOD Cloud)
+            :param analysis_data: DataFrame with the analysis already loaded in memory (only the KGs to evaluate), used instead of reading the file; analysis_file_path still gives the analysis date
+            :param results: where the results are written, by default the results store (see results_store.py), or the in-memory results of quality_api.evaluate
         '''
-        self.analysis_data = pd.read_csv(analysis_file_path,sep=separator)
+        if analysis_data is not None:
+            self.analysis_data = analysis_data
+        else:
+            self.analysis_data = kghb_schema.read_snapshot(analysis_file_path,separator=separator,topic=topic)
         self.output_dir = output_dir
+        analysis_date = kghb_schema.snapshot_date(analysis_file_path)
+        self.analysis_date = analysis_date.isoformat() if analysis_date else None
+        self.results = results if results is not None else results_store.get_store()
 
     def group_by_value(self,metric):
         '''
@@ -34,19 +50,8 @@ class PunctualQualityEvaluation:
 
             :param metric: The metric for which you want to count the different types of value
         '''
-        values = {}
-        for list_string in self.analysis_data[metric]:
-            try:
-                list_elements = ast.literal_eval(list_string)
-                if isinstance(list_elements, list):
-                    for el in list_elements:
-                        if el in values:
-                            values[el] += 1
-                        else:
-                            values[el] = 1
-            except Exception:
-                continue
-        df = pd.DataFrame(values.items())
+        elements, lengths = list_metrics_over_time.explode_list_column(self.analysis_data[metric])
+        df = pd.DataFrame(list(elements.value_counts(sort=False).items()))
         self.write_data_on_csv('serial',df,False)
     
     def accessibility_stats(self):
@@ -78,14 +83,10 @@ class PunctualQualityEvaluation:
             "SPARQL or Dump online" : sparql_or_dump_UP
         }
 
-        with open(f'../data/evaluation_results/2024/{self.output_dir}/punctual/availability_stats.csv', mode='w', newline='') as file:
-            writer = csv.writer(file)
-            
-            # Write key as column
-            writer.writerow(result.keys())
-            
-            # Write value as row
-            writer.writerow(result.values())
+        # Keys as columns, values as the only row
+        here = os.path.dirname(os.path.abspath(__file__))
+        save_path = os.path.join(here,f'../data/evaluation_results/2024/{self.output_dir}/punctual/availability_stats.csv')
+        self.results.put(save_path,list(result.keys()),[list(result.values())],topic=self.output_dir,metric='availability_stats',date=self.analysis_date)
 
     def write_data_on_csv(self, metric, pandas_df,index=True):
         '''
@@ -93,10 +94,11 @@ class PunctualQualityEvaluation:
 
             :param metric: The name of the metric evaluated, used as filename.
             :param pandas_df: pandas df to write in the csv file.
+            :param index: boolean that if True, the index of the df is written as the first column.
         '''
         here = os.path.dirname(os.path.abspath(__file__))
         save_path = os.path.join(here,f'../data/evaluation_results/2024/{self.output_dir}/punctual/{metric}_evaluation.csv')
-        pandas_df.to_csv(save_path,index=index)
+        self.results.put_frame(save_path,pandas_df,index=index,topic=self.output_dir,metric=metric,date=self.analysis_date)
 
     def compare_column(self,column_to_compare,sparql_av=False):
         '''
@@ -150,7 +152,7 @@ class PunctualQualityEvaluation:
         for link in links:
             for headers in headers_list:
                 try:
-                    response = requests.get(link, headers=headers)
+                    response = http_client.get(link, headers=headers)
                     if response.status_code == 200:
                     
                         content_type = response.headers.get('Content-Type', '').lower()
@@ -183,32 +185,35 @@ class PunctualQualityEvaluation:
                 except requests.RequestException as e:
                     print(f"Errore durante la richiesta con header {headers}: {e}")
     
-    def generate_stats(self,metrics,output_filename,only_sparql_up=True):
+    def generate_stats(self,metrics,output_filename,only_sparql_up=True,n_resamples=10000,confidence=0.95,seed=42,n_jobs=1):
         '''
-            Calculate the minimum, maximum, q1, median, q3 and mean for the given metrics.
+            Calculate the minimum, maximum, q1, median, q3 and mean for the given metrics, with the bootstrap confidence intervals of the median and of the mean.
 
             :param metrics: array of string with the column name of the metrics to evaluate.
             :param output_filename: name of the csv file in which write the output.
             :param only_sparql_up: boolean that if True, evalute the metrics given only on KGs with SPARQL endpoint online.
+            :param n_resamples: number of bootstrap resamples, if 0 the confidence intervals are not calculated.
+            :param confidence: confidence level of the intervals.
+            :param seed: seed of the resampling, fixed so that the intervals are reproducible.
+            :param n_jobs: number of threads used for the resampling.
         
         '''
-        data = []
-        data.append(['Dimension', 'Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'])  
-        for metric in metrics:
-            #Exclude KG with SPARQL endpoint offline or not indicated
-            if only_sparql_up:
-                df = self.analysis_data[(self.analysis_data["Sparql endpoint"] == "Available")] 
-            else:
-                df = self.analysis_data
-
-            df.loc[:,metric] = pd.to_numeric(df[metric], errors='coerce')
-            min_value = df[metric].min()
-            q1_value = df[metric].quantile(0.25)
-            median_value = df[metric].median()
-            q3_value = df[metric].quantile(0.75)
-            max_value = df[metric].max()
-            mean_value = df[metric].mean()
+        # A single (KGs x metrics) matrix, used both for the stats and for the resampling
+        values = self.analysis_data[metrics].to_numpy(dtype=float, na_value=np.nan)
+        #Exclude KG with SPARQL endpoint offline or not indicated
+        if only_sparql_up:
+            values = values[(self.analysis_data["Sparql endpoint"] == "Available").to_numpy()]
+
+        header = ['Dimension'] + summary_stats.STATS
+        if n_resamples > 0:
+            header += ['Median CI low', 'Median CI high', 'Mean CI low', 'Mean CI high']
+            # The same resamples of the KGs of the topic are used for all the metrics
+            intervals = bootstrap.bootstrap_ci(values, n_resamples, confidence, seed, n_jobs)
 
+        stats = summary_stats.compute(values)
+        data = []
+        data.append(header)  
+        for index, metric in enumerate(metrics):
             if metric == 'Representational-Consistency score':
                 metric = 'Interoperability'
             if metric == 'Representational-Conciseness score':
@@ -219,14 +224,14 @@ class PunctualQualityEvaluation:
                 metric = 'Timeliness score'
             if metric == 'Dataset dynamicity score':
                 metric = 'Dataset-dynamicity score'
-            evaluation = [metric.split(' ')[0],min_value, q1_value, median_value, q3_value, max_value, mean_value]
+            evaluation = [metric.split(' ')[0]] + summary_stats.to_row(stats[index])
+            if n_resamples > 0:
+                evaluation += [intervals['Median'][0][index], intervals['Median'][1][index], intervals['Mean'][0][index], intervals['Mean'][1][index]]
             data.append(evaluation)
             
         here = os.path.dirname(os.path.abspath(__file__))
         save_path = os.path.join(here,f'../data/evaluation_results/2024/{self.output_dir}/punctual/{output_filename}.csv')
-        with open(save_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(data)
+        self.results.put(save_path,data[0],data[1:],topic=self.output_dir,metric_column=0,date=self.analysis_date)
 
     def calculate_min_max_mean(self):
         '''
@@ -0,0 +1,165 @@
+import csv
+import io
+import os
+
+import pandas as pd
+import kghb_schema
+import results_store
+import snapshot_archive
+from quality_evaluation_over_time import QualityEvaluationOT
+from punctual_quality_evaluation import PunctualQualityEvaluation
+
+TOPICS = ['cross-domain','geography','government','life-sciences','linguistic','media','publications','social-networking','user-generated','no-domain','all']
+
+# Dimensions of the punctual stats, as evaluated in main.py (the Currency score is only evaluated over time)
+PUNCTUAL_DIMENSIONS = ['Availability score','Licensing score','Interlinking score','Performance score','Accuracy score','Consistency score','Conciseness score',
+                       'Verifiability score','Reputation score','Believability score','Volatility score','Completeness score','Amount of data score',
+                       'Representational-Consistency score','Representational-Conciseness score','Understandability score','Interpretability score',
+                       'Versatility score','Security score','Score']
+
+GROUPED_COLUMNS = ['License machine redeable (metadata)','Sparql endpoint','Availability of RDF dump (metadata)','Availability VoID file']
+
+class Results:
+    def __init__(self):
+        '''
+            Results of an evaluation kept in memory, with the same interface of the results store (put, put_frame, read), so that the evaluation classes write into it.
+            Every table is identified by the path of its legacy csv (e.g. evaluation_results/2024/media/punctual/dimensions_stats.csv), nothing is written on disk until save is called.
+        '''
+        self.tables = {}
+
+    def put(self, path, header, rows, topic=None, metric=None, date=None, metric_column=None, date_column=None, line_terminator='\r\n'):
+        '''
+            Add a table, replacing the table with the same path. See results_store.ResultsStore.put for the parameters.
+        '''
+        self.tables[results_store.output_name(path)] = {'path': path, 'header': list(header), 'rows': rows, 'frame': None,
+                                                        'keys': {'topic': topic, 'metric': metric, 'date': date, 'metric_column': metric_column, 'date_column': date_column},
+                                                        'line_terminator': line_terminator}
+
+    def put_frame(self, path, df, index=True, topic=None, metric=None, date=None, metric_column=None, date_column=None):
+        '''
+            Add a pandas DataFrame (or Series), kept as it is. See results_store.ResultsStore.put_frame for the parameters.
+        '''
+        self.tables[results_store.output_name(path)] = {'path': path, 'header': None, 'rows': None, 'frame': df, 'index': index,
+                                                        'keys': {'topic': topic, 'metric': metric, 'date': date, 'metric_column': metric_column, 'date_column': date_column}}
+
+    def read(self, path):
+        '''
+            Return the header and the rows of a table, None if it was not computed.
+
+            :param path: path of the legacy csv of the table.
+        '''
+        table = self.tables.get(results_store.output_name(path))
+        if table is None:
+            return None
+        if table['frame'] is not None:
+            rows = list(csv.reader(io.StringIO(table['frame'].to_csv(index=table['index']))))
+            return rows[0], rows[1:]
+        return list(table['header']), [list(row) for row in table['rows']]
+
+    def names(self, topic=None):
+        '''
+            Return the names of the tables (paths relative to the data folder), only the ones of a topic if given.
+        '''
+        return [name for name, table in self.tables.items() if topic is None or table['keys']['topic'] == topic]
+
+    def frame(self, path):
+        '''
+            Return a table as a DataFrame, with the columns of its legacy csv.
+
+            :param path: path of the legacy csv of the table, absolute or relative to the data folder (e.g. evaluation_results/2024/media/punctual/dimensions_stats.csv).
+        '''
+        table = self.tables[results_store.output_name(path)]
+        if table['frame'] is not None:
+            df = table['frame']
+            if table['index']:
+                return df.reset_index()
+            return df.to_frame() if isinstance(df, pd.Series) else df
+        return pd.DataFrame(table['rows'], columns=table['header'])
+
+    def punctual(self, topic, name):
+        '''
+            Return a table of the punctual evaluation of a topic (e.g. dimensions_stats, categories_stats, Sparql endpoint_evaluation).
+        '''
+        return self.frame(f'evaluation_results/2024/{topic}/punctual/{name}.csv')
+
+    def over_time(self, topic, output_dir, metric):
+        '''
+            Return the statistics over time of a metric of a topic.
+
+            :param output_dir: name of the directory that groups the metric (e.g. by_dimension, by_category).
+        '''
+        return self.frame(f'evaluation_results/{topic}/over_time/{output_dir}/{metric.replace("/", "-")}.csv')
+
+    def save(self, store=None, export_csv=False):
+        '''
+            Write all the tables in the results store, and return it.
+
+            :param store: the results store, by default the one shared by the process.
+            :param export_csv: boolean that if True, the tables are also exported as csv files in the legacy layout.
+        '''
+        store = store or results_store.get_store()
+        for table in self.tables.values():
+            keys = table['keys']
+            if table['frame'] is not None:
+                store.put_frame(table['path'], table['frame'], table['index'], **keys)
+            else:
+                store.put(table['path'], table['header'], table['rows'], line_terminator=table['line_terminator'], **keys)
+        store.commit()
+        if export_csv:
+            for topic in dict.fromkeys(table['keys']['topic'] for table in self.tables.values()):
+                store.export_csv(topic)
+        return store
+
+def load_snapshots(snapshot_source=kghb_schema.CANONICAL_PATH):
+    '''
+        Read every snapshot of a source once, with the category scores, and return a dict path -> DataFrame.
+
+        :param snapshot_source: path to the folder (or to the archive) with the snapshots returned by KGHeartBeat.
+    '''
+    paths = snapshot_archive.list_snapshots(snapshot_source)
+    frames = snapshot_archive.map_snapshots(lambda path: kghb_schema.add_category_scores(kghb_schema.read_snapshot(path)), paths)
+    return dict(zip(paths, frames))
+
+def evaluate(snapshot_source=kghb_schema.CANONICAL_PATH, topics=TOPICS, punctual_date=None, over_time=True, only_sparql_up=True, n_resamples=10000, sink=None, export_csv=False):
+    '''
+        Evaluate the quality of the LOD Cloud and of its topics in memory, and return the Results.
+        Every snapshot is read once; the topics are selected from it as views and the stages hand the frames and the stats over in memory.
+        Nothing is written on disk unless a sink is given.
+
+        :param snapshot_source: path to the folder (or to the archive) with the snapshots returned by KGHeartBeat, or the dict returned by load_snapshots.
+        :param topics: list of the topics to evaluate, 'all' is the entire LOD Cloud and 'no-domain' the KGs without a topic.
+        :param punctual_date: date (YYYY-MM-DD) of the analysis used for the punctual evaluation, by default the most recent one. A ValueError is raised if no snapshot has this date.
+        :param over_time: boolean that if True, the statistics over time of the dimensions and of the categories are calculated.
+        :param only_sparql_up: boolean that if True, the statistics consider only the KGs with the SPARQL endpoint online.
+        :param n_resamples: number of bootstrap resamples of the punctual stats, if 0 the confidence intervals are not calculated.
+        :param sink: results store in which to write the results (e.g. results_store.get_store()), None keeps them only in memory.
+        :param export_csv: boolean that if True (and a sink is given), the results are also exported as csv files in the legacy layout.
+    '''
+    snapshots = snapshot_source if isinstance(snapshot_source, dict) else load_snapshots(snapshot_source)
+    paths = sorted(snapshots, key=lambda path: (os.path.basename(path), path))
+    if punctual_date is None:
+        punctual_path = paths[-1]
+    else:
+        punctual_path = next((path for path in paths if os.path.basename(path).startswith(punctual_date)), None)
+        if punctual_path is None:
+            raise ValueError(f'No snapshot analyzed on {punctual_date} in {snapshot_source if isinstance(snapshot_source, str) else "the given snapshots"}')
+
+    results = Results()
+    for topic in topics:
+        print(f'Running evaluation for topic: {topic} ...')
+        views = {path: kghb_schema.select_topic(df, topic) for path, df in snapshots.items()}
+
+        punctual_analysis = PunctualQualityEvaluation(punctual_path, topic, analysis_data=views[punctual_path], results=results)
+        for column in GROUPED_COLUMNS:
+            punctual_analysis.group_by_value(column)
+        punctual_analysis.generate_stats(PUNCTUAL_DIMENSIONS, 'dimensions_stats', only_sparql_up=only_sparql_up, n_resamples=n_resamples)
+        punctual_analysis.generate_stats(kghb_schema.CATEGORY_SCORES, 'categories_stats', only_sparql_up=only_sparql_up, n_resamples=n_resamples)
+
+        if over_time:
+            analysis_over_time = QualityEvaluationOT(output_file=f'./evaluation_results/{topic}/over_time', topic=topic, results=results, snapshots=views)
+            analysis_over_time.stats_over_time(kghb_schema.DIMENSION_SCORES, 'by_dimension', only_sparql_up)
+            analysis_over_time.stats_over_time(kghb_schema.CATEGORY_SCORES, 'by_category', only_sparql_up)
+
+    if sink is not None:
+        results.save(sink, export_csv)
+    return results
@@ -1,29 +1,94 @@
 import pandas as pd
+import numpy as np
 import os
-import requests
 import csv
 import ast
 from collections import Counter
 from datetime import datetime
 import json
+import kghb_schema
+import kg_id_dictionary
+import derived_metrics
+import results_store
+import snapshot_archive
+import snapshot_catalog
+import summary_stats
+
+CATEGORIES = kghb_schema.CATEGORY_DIMENSIONS
 
 class QualityEvaluationOT:
-    def __init__(self,analysis_results_path,output_file='/evaluation_results/over_time'):
+    def __init__(self,analysis_results_path=None,output_file='/evaluation_results/over_time',topic=None,results=None,snapshots=None):
         '''
             Creates a list of CSV files that are to be parsed
 
-            :param analysis_results_path: path to the folder that contains the analysis csv files
+            :param analysis_results_path: path to the folder (or to the zip, tar, gzip or zstd archive) that contains the analysis csv files
             :param output_file: Name of the file in which to save the result of the quality assessment
+            :param topic: if given, the analyses are the canonical snapshots in analysis_results_path (by default ../data/quality_data/all_kgs_analyzed)
+                read as a view of the topic, instead of the copies split by topic ('all' is the LOD Cloud)
+            :param results: where the results are written, by default the results store (see results_store.py), or the in-memory results of quality_api.evaluate
+            :param snapshots: dict with the analyses already loaded in memory (path -> DataFrame with only the KGs to evaluate), used instead of reading the files
         '''
-        self.analysis_results_files = []
         self.output_file = output_file
-        # Get all csv filename from the dir
-        for filename in os.listdir(analysis_results_path):
-            if '.csv' in filename:
-                file_path = os.path.join(analysis_results_path, filename)
-                self.analysis_results_files.append(file_path)
+        self.view = topic
+        self.snapshots = snapshots
+        if topic is not None:
+            analysis_results_path = analysis_results_path or kghb_schema.CANONICAL_PATH
+        self.topic = topic or snapshot_archive.source_name(analysis_results_path)
+        self.results = results if results is not None else results_store.get_store()
+        if snapshots is not None:
+            self.analysis_results_files = sorted(snapshots, key=lambda path: (os.path.basename(path), path))
+        else:
+            # Get all csv filename from the dir or the archive, sorted by date
+            self.analysis_results_files = snapshot_archive.list_snapshots(analysis_results_path)
+        # Dates, schema versions and column statistics of the analyses files (see snapshot_catalog.py), not used for the analyses already in memory
+        self.catalog = snapshot_catalog.get_catalog() if snapshots is None else None
+
+    def read_snapshot(self,file_path,usecols=None,raw=False):
+        '''
+            Read one of the analyses, only the rows of the topic if the analyses are read as a view.
+            The analyses already in memory are returned without reading the file (the columns missing from them are filled with nulls).
+
+            :param file_path: path to the analysis.
+            :param usecols: columns to load, None loads all of them.
+            :param raw: if True, every column is loaded as text exactly as written in the file.
+        '''
+        if self.snapshots is not None and not raw:
+            df = self.snapshots[file_path]
+            return df if usecols is None else df.reindex(columns=list(usecols))
+        return kghb_schema.read_snapshot(file_path, usecols=usecols, raw=raw, topic=self.view)
 
-        self.analysis_results_files = sorted(self.analysis_results_files)
+    def snapshot_date(self,file_path):
+        '''
+            Return the analysis date of one of the analyses, from the snapshot catalog.
+
+            :param file_path: path to the analysis.
+        '''
+        if self.catalog is None:
+            return kghb_schema.snapshot_date(file_path)
+        return self.catalog.snapshot_date(file_path)
+
+    def is_comparable(self,metric,file_path):
+        '''
+            Check if the values of a metric in one of the analyses can be compared with the most recent analyses.
+
+            :param metric: exact column name of the metric.
+            :param file_path: path to the analysis.
+        '''
+        return kghb_schema.get_column(metric, self.snapshot_date(file_path)).comparable
+
+    def select_snapshots(self,start=None,end=None,where=()):
+        '''
+            Return the analyses in a date range whose rows may satisfy the predicates, resolved from the snapshot catalog without opening the files.
+            The analyses already in memory are only filtered by date.
+
+            :param start: first analysis date (inclusive), None for no lower bound.
+            :param end: last analysis date (inclusive), None for no upper bound.
+            :param where: list of predicates (column, operator, value), see snapshot_catalog.may_match.
+        '''
+        if self.catalog is not None:
+            return self.catalog.select(self.analysis_results_files, start, end, where)
+        return [file_path for file_path in self.analysis_results_files
+                if (start is None or start <= kghb_schema.snapshot_date(file_path)) and (end is None or kghb_schema.snapshot_date(file_path) <= end)]
 
     def load_all_csv_as_one(self,metrics_to_select):
         '''
@@ -31,7 +96,7 @@ class QualityEvaluationOT:
 
             :param metrics_to_select: Array of columns to select from the csv fiels.
         '''
-        df_list = [pd.read_csv(file, usecols=metrics_to_select) for file in self.analysis_results_files]
+        df_list = snapshot_archive.map_snapshots(lambda file: self.read_snapshot(file, usecols=metrics_to_select), self.analysis_results_files)
         csv_data = pd.concat(df_list, ignore_index=True)
         
         return csv_data
@@ -40,161 +105,196 @@ class QualityEvaluationOT:
         '''
             Extract only KGs from LODCloud from the csv output from KGs Quality Analyzer.
 
-            :param analysis_results_path: path to csv where to discard the KGs.
+            :param analysis_results_path: path to the folder (or archive) with the csv where to discard the KGs.
         '''
         #try:
-        #    response = requests.get("https://lod-cloud.net/versions/latest/lod-data.json")
+        #    import http_client
+        #    response = http_client.get("https://lod-cloud.net/versions/latest/lod-data.json")
         #    kgs = response.json()
         #    print(f"{len(kgs)} KGs recovered from the LOD Cloud")
         #except:
-        with open('../data/lodcloud.json', "r", encoding="utf-8") as file:
-            kgs = json.load(file)
-            print(f"{len(kgs)} KGs recovered from the LOD Cloud")
-       
-        identifiers = [data['identifier'] for key, data in kgs.items()]
-        # Iterate throught all the csv and create a new csv with only the KGs from LODCloud
-        for filename in os.listdir(analysis_results_path):
-            if '.csv' in filename:
-                file_path = os.path.join(analysis_results_path, filename)
-                df = pd.read_csv(file_path)
+        kg_ids = kg_id_dictionary.get_dictionary()
+        kg_ids.refresh_membership()
+        print(f"{kg_ids.in_lodc.sum()} KGs recovered from the LOD Cloud")
+
+        # Iterate throught all the csv and create a new csv with only the KGs from LODCloud, the next snapshots are read while the current one is filtered
+        read_raw = lambda file_path: kghb_schema.read_snapshot(file_path, raw=True)
+        for file_path, df in snapshot_archive.prefetch_snapshots(read_raw, snapshot_archive.list_snapshots(analysis_results_path)):
+            self.filter_snapshot_lodc(file_path, df=df)
+
+        kg_ids.save()
 
-                identifiers_in_csv = set(df['KG id'].unique())
-                missing_identifiers = set(identifiers) - identifiers_in_csv
+    def filter_snapshot_lodc(self,file_path,output_dir='../data/quality_data/only_from_LODC/all',df=None):
+        '''
+            Create a copy of a single csv output from KGs Quality Analyzer with only the KGs from LODCloud.
+
+            :param file_path: path to the csv to filter.
+            :param output_dir: path to the directory in which to write the filtered csv.
+            :param df: content of the csv already loaded with kghb_schema.read_snapshot(file_path, raw=True), if None it is read here.
+        '''
+        kg_ids = kg_id_dictionary.get_dictionary()
+        if df is None:
+            df = kghb_schema.read_snapshot(file_path, raw=True)
 
-                print(f"File: {file_path} filtered")
-                print(f"{len(missing_identifiers)} KGs not analyzed by KGHeartBeat")
+        codes = kg_ids.encode(df['KG id'])
+        in_lodc = kg_ids.lodc_mask(codes)
+        missing_identifiers = kg_ids.in_lodc.sum() - np.unique(codes[in_lodc]).size
 
-                df['KG id'] = df['KG id'].astype(str).str.strip()
-                df_filtered = df[df['KG id'].isin(identifiers)]
+        print(f"File: {file_path} filtered")
+        print(f"{missing_identifiers} KGs not analyzed by KGHeartBeat")
 
-                #df.drop(df[df['Understandability score'] > 1.0].index, inplace=True)
+        df['KG id'] = kg_ids.index[codes]
+        df_filtered = df[in_lodc]
 
-                df_filtered.to_csv(f"../data/quality_data/only_from_LODC/all/{filename}",index=False)
+        #df.drop(df[df['Understandability score'] > 1.0].index, inplace=True)
+
+        df_filtered.to_csv(os.path.join(output_dir, os.path.basename(file_path)),index=False)
 
     def stats_over_time(self, metrics, output_dir,only_sparql_up=True):   
         '''
             For every analysis, calculate the min, max, median, mean, q1, q3 for the specified metrics by considering all KGs in the file.
-            Then the data are stored in a csv file.
+            Then the data are stored in the results store (see results_store.py).
 
             :param metrics: string array that contains the exact column name of the csv file for which you want to enter statistics
             :param sparql_availability: boolean if true, consider in statistics, only KGs with an active SPARQL endpoint, if false, all will be considered.
             :param output_dir: path to the directory in which to place the csv files resulting from the evaluation.
         '''
-        # loop through every file and calculate data for a boxplot
+        # loop through every file once and calculate data for a boxplot of every metric
+        data = {metric: [] for metric in metrics}
+        if self.catalog is not None:
+            self.catalog.refresh(self.analysis_results_files)
+        for file_path in self.analysis_results_files:
+            # Skip the snapshots in which the metric was calculated differently (e.g. the Understandability score before May 5, 2024).
+            comparable = [metric for metric in metrics if self.is_comparable(metric, file_path)]
+            for metric, evaluation in zip(comparable, self.snapshot_stats(file_path, comparable, only_sparql_up)):
+                data[metric].append(evaluation)
+
         for metric in metrics:
-            data = []
             print(f"Evaluating the {metric} metric\n")
-            data.append(['Analysis date', 'Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'])
-
-            # This is necessary for this metric since there was a change to the score calculation after May 5.
-            if metric == 'Understandability score':
-                start_date = datetime(2024, 5, 5)
-                filtered_files = [
-                    file for file in self.analysis_results_files
-                    if datetime.strptime(file.split("/")[-1].split('.')[0], '%Y-%m-%d') > start_date
-                ]
-            else:
-                filtered_files = self.analysis_results_files
-
-            for file_path in filtered_files:
-                df = pd.read_csv(file_path,usecols=[metric,'Sparql endpoint'])
-
-                #Exclude KG with SPARQL endpoint offline or not indicated
-                if(only_sparql_up == True):
-                    df = df[(df["Sparql endpoint"] == "Available")]
-
-                df[metric] = pd.to_numeric(df[metric], errors='coerce')
-                min_value = df[metric].min()
-                q1_value = df[metric].quantile(0.25)
-                median_value = df[metric].median()
-                q3_value = df[metric].quantile(0.75)
-                max_value = df[metric].max()
-                mean_value = df[metric].mean()
-
-                evaluation = [os.path.basename(file_path).split('.')[0],min_value, q1_value, median_value, q3_value, max_value, mean_value]
-                data.append(evaluation)
-
-            here = os.path.dirname(os.path.abspath(__file__))
-            if '/' in metric:
-                metric = metric.replace('/','-')
-            save_path = os.path.join(here,f'../data/{self.output_file}/{output_dir}/{metric}.csv')
-            with open(save_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerows(data)
+            self.results.put(self.stats_over_time_path(metric, output_dir), ['Analysis date'] + summary_stats.STATS, data[metric], topic=self.topic, metric=metric, date_column=0)
+
+    def snapshot_stats(self, file_path, metrics, only_sparql_up=True):
+        '''
+            Calculate the min, max, median, mean, q1, q3 of the metrics in a single analysis, returns one row for every metric.
+
+            :param file_path: path to the csv of the analysis.
+            :param metrics: list with the exact column names of the metrics.
+            :param only_sparql_up: boolean if true, consider in statistics, only KGs with an active SPARQL endpoint, if false, all will be considered.
+        '''
+        if not metrics:
+            return []
+        if only_sparql_up and self.catalog is not None and not self.catalog.select([file_path], where=[('Sparql endpoint', '==', 'Available')]):
+            # No KG with the SPARQL endpoint online, the snapshot is not read
+            values = np.empty((0, len(metrics)))
+        else:
+            df = self.read_snapshot(file_path,usecols=list(metrics) + ['Sparql endpoint'])
+            values = df[metrics].to_numpy(dtype=float, na_value=np.nan)
+
+            #Exclude KG with SPARQL endpoint offline or not indicated
+            if(only_sparql_up == True):
+                values = values[(df["Sparql endpoint"] == "Available").to_numpy()]
+
+        analysis_date = self.snapshot_date(file_path)
+        analysis_date = analysis_date.isoformat() if analysis_date else os.path.basename(file_path).split('.')[0]
+        return [[analysis_date] + summary_stats.to_row(stats) for stats in summary_stats.compute(values)]
+
+    def stats_over_time_path(self, metric, output_dir):
+        '''
+            Return the path of the csv in which the statistics over time of a metric are stored.
+
+            :param metric: exact column name of the metric.
+            :param output_dir: name of the directory that groups the metric (e.g. by_dimension).
+        '''
+        here = os.path.dirname(os.path.abspath(__file__))
+        if '/' in metric:
+            metric = metric.replace('/','-')
+        return os.path.join(here,f'../data/{self.output_file}/{output_dir}/{metric}.csv')
+
+    def update_stats_over_time(self, file_path, metrics, output_dir, only_sparql_up=True):
+        '''
+            Add the statistics of a single analysis to the tables written by stats_over_time, without recalculating the previous analyses.
+            If the table already has a row for the same analysis date, the row is replaced.
+
+            :param file_path: path to the csv of the new analysis.
+            :param metrics: string array that contains the exact column name of the csv file for which you want to enter statistics.
+            :param output_dir: name of the directory that groups the metrics (e.g. by_dimension).
+            :param only_sparql_up: boolean if true, consider in statistics, only KGs with an active SPARQL endpoint, if false, all will be considered.
+        '''
+        comparable = [metric for metric in metrics if self.is_comparable(metric, file_path)]
+        for metric, evaluation in zip(comparable, self.snapshot_stats(file_path, comparable, only_sparql_up)):
+            save_path = self.stats_over_time_path(metric, output_dir)
+
+            # The previous rows come from the current version of the table in the store (or from the legacy csv)
+            table = self.results.read(save_path)
+            rows = table[1] if table else []
+
+            # A new analysis is added, an analysis already present is replaced
+            rows = [row for row in rows if row[0] != evaluation[0]] + [evaluation]
+            rows.sort(key=lambda row: row[0])
+            self.results.put(save_path, ['Analysis date'] + summary_stats.STATS, rows, topic=self.topic, metric=metric, date_column=0)
     
     def add_category_score(self):
         """
             Add a the category score in the original CSV returned by KGs Quality Analyzer, the value is calculated as the sum of the dimensions score for that category, divided by the number of dimensions for that category.
+            The views of a topic, and the analyses already in memory, have the category scores computed when they are read, so no file is rewritten.
         """
-        categories = {
-            "Intrinsic score" : {
-                "Accuracy score" : 0,
-                "Interlinking score" : 0,
-                "Consistency score" : 0,
-                "Conciseness score" : 0,
-            },
-            "Dataset dynamicity score" : {
-                "Currency score" : 0,
-                "Volatility score" : 0,
-            },
-            "Trust score" : {
-                "Verifiability score" : 0,
-                "Reputation score" : 0,
-                "Believability score" : 0,
-            },
-            "Contextual score" : {
-                "Completeness score" : 0,
-                "Amount of data score" : 0,
-            },
-            "Representational score" : {
-                "Representational-Consistency score": 0,
-                "Representational-Conciseness score" : 0,
-                "Interpretability score" : 0,
-                "Versatility score" : 0
-            },
-            "Accessibility score": {
-                "Availability score" : 0,
-                "Licensing score" : 0,
-                "Security score" : 0,
-                "Performance score" : 0,
-            }
-        }
-
+        if self.view is not None or self.snapshots is not None:
+            return
         for file_path in self.analysis_results_files:
-            df = pd.read_csv(file_path)
-            for key in categories:
-                category = categories[key]
-                dimensions_in_cat = category.keys()
-                df[key] = df[dimensions_in_cat].sum(axis=1) / len(dimensions_in_cat)
-            
-            df.to_csv(file_path,index=False)
+            self.add_category_score_to_file(file_path)
+
+    def add_category_score_to_file(self, file_path):
+        """
+            Add the category score to a single CSV returned by KGs Quality Analyzer.
+
+            :param file_path: path to the csv to update.
+        """
+        dimensions = [dimension for category in CATEGORIES.values() for dimension in category]
+        scores = kghb_schema.read_snapshot(file_path, usecols=dimensions)
+        # The other columns are rewritten as they are in the file
+        df = kghb_schema.read_snapshot(file_path, raw=True)
+        for key in CATEGORIES:
+            category = CATEGORIES[key]
+            dimensions_in_cat = list(category)
+            df[key] = scores[dimensions_in_cat].sum(axis=1) / len(dimensions_in_cat)
+        
+        df.to_csv(file_path,index=False)
     
-    def evaluate_provenance_info(self):
+    def derived_metrics_stats(self, metrics):
         '''
-            Evaluate the provenance metrics by checking if an author or a publisher is indicated in the KG.
+            Compute every derived metric on every analysis with a single scan, and return for each one its min, max, median, mean, q1, q3 over time.
+
+            :param metrics: dict with the name and the DerivedMetric to compute (see derived_metrics.DERIVED_METRICS).
         '''
-        data = []
-        data.append(['Analysis date', 'Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'])
+        data = {name: [['Analysis date'] + summary_stats.STATS] for name in metrics}
+        inputs = list(dict.fromkeys(column for metric in metrics.values() for column in metric.inputs))
         for file_path in self.analysis_results_files:
-            df = pd.read_csv(file_path)
-            df['P1'] = df.apply(lambda row: 1 if (row['Author (metadata)'] != 'False' or (row['Publisher'] != '-' and row['Publisher'] != '[]' and row['Publisher'] != 'absent')) else 0, axis=1)
-        
-            df['P1'] = pd.to_numeric(df['P1'], errors='coerce')
-            min_value = df['P1'].min()
-            q1_value = df['P1'].quantile(0.25)
-            median_value = df['P1'].median()
-            q3_value = df['P1'].quantile(0.75)
-            max_value = df['P1'].max()
-            mean_value = df['P1'].mean()
+            df = self.read_snapshot(file_path, usecols=inputs)
+            analysis_date = os.path.basename(file_path).split('.')[0]
+            columns = [pd.to_numeric(pd.Series(metric.compute(df)), errors='coerce') for metric in metrics.values()]
+            # The values of all the metrics of the analysis as a single (KGs x metrics) matrix
+            values = np.column_stack([column.to_numpy(dtype=float, na_value=np.nan) for column in columns]) if columns else np.zeros((len(df), 0))
+            for name, column, stats in zip(metrics, columns, summary_stats.compute(values)):
+                data[name].append([analysis_date] + summary_stats.to_row(stats, pd.api.types.is_integer_dtype(column)))
 
-            evaluation = [os.path.basename(file_path).split('.')[0],min_value, q1_value, median_value, q3_value, max_value, mean_value]
-            data.append(evaluation)
+        return data
 
+    def evaluate_derived_metrics(self, names=None):
+        '''
+            Evaluate the registered derived metrics over time and write their stats in the by_metric folder.
+
+            :param names: list of the names of the metrics to evaluate, None evaluates all the registered ones.
+        '''
         here = os.path.dirname(os.path.abspath(__file__))
-        save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/P1-Provenance_information.csv')
-        with open(save_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(data)
+        for name, data in self.derived_metrics_stats(derived_metrics.get_metrics(names)).items():
+            save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/{name}.csv')
+            self.results.put(save_path, data[0], data[1:], topic=self.topic, metric=name, date_column=0)
+
+    def evaluate_provenance_info(self):
+        '''
+            Evaluate the provenance metrics by checking if an author or a publisher is indicated in the KG.
+        '''
+        self.evaluate_derived_metrics(['P1-Provenance_information'])
     
     def evaluate_integer_metrics(self,metric,new_column_name):
         '''
@@ -203,63 +303,17 @@ class QualityEvaluationOT:
             :param metric the metric name to evaluate.
             :param new_column_name the column name in which insert the number of elements in the measured meatric.
         '''
-        data = []
-        data.append(['Analysis date', 'Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'])
-        for file_path in self.analysis_results_files:
-            df = pd.read_csv(file_path)
-            for idx, list_string in enumerate(df[metric]):
-                try:
-                    list_elements = ast.literal_eval(list_string)
-                    if isinstance(list_elements, list):
-                        df.at[idx, new_column_name] = len(list_elements)
-                except Exception as error:
-                   continue
-            
-            df[new_column_name] = pd.to_numeric(df[new_column_name], errors='coerce')
-            min_value = df[new_column_name].min()
-            q1_value = df[new_column_name].quantile(0.25)
-            median_value = df[new_column_name].median()
-            q3_value = df[new_column_name].quantile(0.75)
-            max_value = df[new_column_name].max()
-            mean_value = df[new_column_name].mean()
-
-            evaluation = [os.path.basename(file_path).split('.')[0],min_value, q1_value, median_value, q3_value, max_value, mean_value]
-            data.append(evaluation)
+        data = self.derived_metrics_stats({new_column_name: derived_metrics.list_length(metric)})[new_column_name]
         
         here = os.path.dirname(os.path.abspath(__file__))
-        save_path = os.path.join(here,f'{self.output_file}/{metric}.csv')
-        with open(save_path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(data)
+        save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/{metric}.csv')
+        self.results.put(save_path, data[0], data[1:], topic=self.topic, metric=new_column_name, date_column=0)
     
     def evaluate_conciseness(self):
         '''
             Evaluate the extensional conciseness metric.
         '''
-        data = []
-        data.append(['Analysis date', 'Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean'])
-        for file_path in self.analysis_results_files:
-            df = pd.read_csv(file_path)
-            for idx, value in enumerate(df['Extensional conciseness']):
-                conc_value = value.split(' ')[0]
-                df.at[idx, 'CN2'] = conc_value
-            
-            df['CN2'] = pd.to_numeric(df['CN2'], errors='coerce')
-            min_value = df['CN2'].min()
-            q1_value = df['CN2'].quantile(0.25)
-            median_value = df['CN2'].median()
-            q3_value = df['CN2'].quantile(0.75)
-            max_value = df['CN2'].max()
-            mean_value = df['CN2'].mean()
-
-            evaluation = [os.path.basename(file_path).split('.')[0],min_value, q1_value, median_value, q3_value, max_value, mean_value]
-            data.append(evaluation)
-        
-        here = os.path.dirname(os.path.abspath(__file__))
-        save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/extensional_conciseness.csv')
-        with open(save_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerows(data)
+        self.evaluate_derived_metrics(['extensional_conciseness'])
     
     def classify_sparql_endpoint_availability(self,column_name='Sparql endpoint'):
         '''
@@ -275,34 +329,29 @@ class QualityEvaluationOT:
         
         # We restrict the observation period to this interval, as there were no new KGs analyzed that could alter the data 
         # (if a KG is monitored only once (in the last analysis for example) and found UP, it would go into those ALWAYS UP and with a HIGH percentage of availability.
-        start_date = datetime(2024, 3, 17)
-        end_date = datetime(2024, 9, 1)
-        filtered_files = [
-            file for file in self.analysis_results_files
-            if start_date <= datetime.strptime(file.split("/")[-1].split('.')[0], '%Y-%m-%d') <= end_date
-        ]
-
-        df_list = [pd.read_csv(file, usecols=['KG id', 'Sparql endpoint','SPARQL endpoint URL']) for file in filtered_files]
+        start_date = datetime(2024, 3, 17).date()
+        end_date = datetime(2024, 9, 1).date()
+        filtered_files = self.select_snapshots(start_date, end_date)
+
+        df_list = snapshot_archive.map_snapshots(lambda file: self.read_snapshot(file, usecols=['KG id', 'Sparql endpoint','SPARQL endpoint URL']), filtered_files)
         df = pd.concat(df_list, ignore_index=True)
 
         df[column_name] = df[column_name].str.strip()
 
-        # Classify the status of every KG kg_id
-        def classify_kg_status(sub_df):
-            unique_statuses = sub_df[column_name].unique()
-            if len(unique_statuses) == 1:
-                return unique_statuses[0]
-            else:
-                return 'Alternating'
-
-        # group by kg_id and use the classification function
-        status_df = df.groupby('KG id').apply(classify_kg_status).reset_index(name='Status')
+        # Classify the status of every KG: a KG with more than one status over time is alternating
+        by_kg = df.groupby('KG id', observed=True, dropna=False)[column_name]
+        status_df = by_kg.first().reset_index(name='Status')
+        status_df.loc[by_kg.nunique(dropna=False).to_numpy() > 1, 'Status'] = 'Alternating'
+        status_df['KG id'] = status_df['KG id'].astype(str)
+        status_df = status_df.sort_values('KG id', ignore_index=True)
 
         # Count how many available, offline and laternating
         status_counts = status_df['Status'].value_counts().reset_index()
         status_counts.columns = ['Status', 'Count']
 
-        status_counts.to_csv(f'../data/{self.output_file}/by_metric/sparql_over_time.csv',index=False)
+        here = os.path.dirname(os.path.abspath(__file__))
+        save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/sparql_over_time.csv')
+        self.results.put_frame(save_path, status_counts, index=False, topic=self.topic, metric=column_name)
 
         return status_df, status_counts, df
     
@@ -315,32 +364,37 @@ class QualityEvaluationOT:
         '''
         # Filter for alternating KG ids
         alternating_kg_ids = status_df[status_df['Status'] == 'Alternating']['KG id']
-        
+
+        # Count the analyses and the analyses with the endpoint available of every KG with a bincount on the KG codes
+        kg_ids = kg_id_dictionary.get_dictionary()
+        codes = kg_ids.encode(df['KG id'])
+        alternating_codes = kg_ids.encode(alternating_kg_ids)
+        is_alternating = np.zeros(len(kg_ids), dtype=bool)
+        is_alternating[alternating_codes] = True
+        rows = is_alternating[codes]
+        available = rows & (df[column_name] == 'Available').to_numpy()
+        total_counts = np.bincount(codes[rows], minlength=len(kg_ids))
+        available_counts = np.bincount(codes[available], minlength=len(kg_ids))
+
         # Calculate the availability percentage for each alternating KG id
-        availability_percentages = []
-        availability_percentage_by_kgid = {}
-        for kg_id in alternating_kg_ids:
-            kg_df = df[df['KG id'] == kg_id]
-            total_count = len(kg_df)
-            available_count = len(kg_df[kg_df[column_name] == 'Available'])
-            availability_percentage = (available_count / total_count) * 100
-            availability_percentages.append(availability_percentage)
-            availability_percentage_by_kgid[kg_id] = availability_percentage
+        availability_percentages = (available_counts[alternating_codes] / total_counts[alternating_codes] * 100).tolist()
+        availability_percentage_by_kgid = dict(zip(alternating_kg_ids, availability_percentages))
 
         # Calculate the overall average availability percentage for all alternating KG ids
-        if(df[df['KG id'].isin(alternating_kg_ids)].shape[0] > 0):
-            overall_average_availability_percentage = df[df['KG id'].isin(alternating_kg_ids) & (df[column_name] == 'Available')].shape[0] / df[df['KG id'].isin(alternating_kg_ids)].shape[0] * 100
+        if(rows.sum() > 0):
+            overall_average_availability_percentage = available.sum() / rows.sum() * 100
         else:
             overall_average_availability_percentage = '-'
-            
+
+        percentage_stats = summary_stats.compute(np.array(availability_percentages, dtype=float))[0]
         stats = {
             'min': min(availability_percentages) if availability_percentages else 0,
             'max': max(availability_percentages) if availability_percentages else 0,
-            'median': pd.Series(availability_percentages).median() if availability_percentages else 0,
-            'q1': pd.Series(availability_percentages).quantile(0.25) if availability_percentages else 0,
-            'q3': pd.Series(availability_percentages).quantile(0.75) if availability_percentages else 0,
+            'median': percentage_stats[2] if availability_percentages else 0,
+            'q1': percentage_stats[1] if availability_percentages else 0,
+            'q3': percentage_stats[3] if availability_percentages else 0,
             'std': pd.Series(availability_percentages).std() if availability_percentages else 0,
-            'mean': pd.Series(availability_percentages).mean() if availability_percentages else 0,
+            'mean': percentage_stats[5] if availability_percentages else 0,
             'overall_average': overall_average_availability_percentage
         }
 
@@ -356,4 +410,6 @@ class QualityEvaluationOT:
 
         df = pd.DataFrame(grouped_counts.items(), columns=['Percentage of availability', 'Number of KGs'])
 
-        df.to_csv(f'../data/{self.output_file}/by_metric/percentage_of_availability_sparql.csv', index=False)
\ No newline at end of file
+        here = os.path.dirname(os.path.abspath(__file__))
+        save_path = os.path.join(here,f'../data/{self.output_file}/by_metric/percentage_of_availability_sparql.csv')
+        self.results.put_frame(save_path, df, index=False, topic=self.topic, metric='percentage_of_availability_sparql')
\ No newline at end of file
@@ -3,6 +3,8 @@ import time
 import pandas as pd
 import ast
 import re
+import kghb_schema
+import sparql_prober
 
 AVAILABILITY_METRICS = 4
 LICENSING_METRICS = 2
@@ -30,7 +32,8 @@ DIMENSION_NUMER = 20
 class RecalculateScore:
     def __init__(self, csv_file_path, dimensions_number):
         self.csv_file_path = csv_file_path
-        self.kgs_quality_data = pd.read_csv(csv_file_path)
+        # The scores are recalculated from the values as written by KGHeartBeat, so the file is loaded without type conversion
+        self.kgs_quality_data = kghb_schema.read_snapshot(csv_file_path, raw=True)
         self.dimensionNumber = dimensions_number
         self.availabilityScoreValue = 0
         self.licensingScoreValue = 0
@@ -64,9 +67,19 @@ class RecalculateScore:
         self.tpValue = 0
         self.latencyValue = 0
 
-    def availabilityScore(self,weight):
+    def availabilityScore(self,weight,probes=None):
+        '''
+            Availability score from the SPARQL endpoint, the RDF dump, the inactive links and the URIs dereferenceability.
+
+            :param probes: DataFrame returned by sparql_prober.SparqlProber.sweep, if given the status of the probed SPARQL endpoints replaces the one recorded by KGHeartBeat.
+        '''
+        measured = sparql_prober.by_url(probes) if probes is not None else {}
         for index, row in self.kgs_quality_data.iterrows():
-            if row['Sparql endpoint'] == 'Available':
+            probe = measured.get(str(row['SPARQL endpoint URL']).strip())
+            if probe is not None:
+                self.kgs_quality_data.loc[index,'Sparql endpoint'] = 'Available' if probe['Available'] else 'offline'
+                url = 1 if probe['Available'] else 0
+            elif row['Sparql endpoint'] == 'Available':
                 url = 1
             else:
                 url = 0
@@ -164,47 +177,23 @@ class RecalculateScore:
             
             security_score = ((secure + authV) * weigth) / SECURITY_METRICS
             self.kgs_quality_data.loc[index,'Security score'] = security_score
-    '''
-    def performanceScore(self,weight):
+    def performanceScore(self,weight,probes):
+        '''
+            Performance score from the latency and the throughput of the SPARQL endpoint, 0 if the endpoint is not available.
+
+            :param probes: DataFrame returned by sparql_prober.SparqlProber.sweep, with the latency and the throughput measured on every endpoint.
+        '''
+        measured = sparql_prober.by_url(probes)
         for index, row in self.kgs_quality_data.iterrows():
-            count = 0
-            start_time = time.time()
-            if row['Sparql endpoint'] == 'Available':
-                while (time.time() - start_time) < 1:
-                    try:
-                        query.TPQuery(row['SPARQL endpoint URL'],count)
-                        count = count +1
-                    except:
-                        tp = 0.0
-                if count >= 5:
-                    tp = 1.0
-                else:
-                    tp = count / 200
-                
-                latency = []
-                try:
-                    for i in range(10):
-                        query.checkEndPoint(row['SPARQL endpoint URL'])
-                        start = time.time()  
-                        latencyValue = (time.time() - start)
-                        latency.append(latencyValue)
-                    if latency[0] < 1:
-                        latencyV = 1.0
-                    else:
-                        sumLatency = sum(latencyValue)
-                        meanLatency = sumLatency/len(latencyValue)
-                        latencyV = 1000 / meanLatency
-                except:
-                    latencyV = 0.0
-                self.tpValue = tp
-                self.latencyValue = latencyV
-                performance_score = ((tp + latencyV) * weight) / PERFORMANCE_METRICS
+            probe = measured.get(str(row['SPARQL endpoint URL']).strip())
+            if probe is not None and probe['Available']:
+                self.tpValue = probe['Throughput score']
+                self.latencyValue = probe['Latency score']
+                performance_score = ((self.tpValue + self.latencyValue) * weight) / PERFORMANCE_METRICS
             else:
                 performance_score = 0
 
-            performance_score = ((tp + latencyV) * weight) / PERFORMANCE_METRICS
             self.kgs_quality_data.loc[index,'Performance score'] = performance_score
-    '''
 
     def accuracyScore(self,weight):
         for index, row in self.kgs_quality_data.iterrows():
@@ -492,13 +481,15 @@ files = [
     '../data/quality_data/all_kgs_analyzed/2023-11-27.csv','../data/quality_data/all_kgs_analyzed/2023-12-03.csv','../data/quality_data/all_kgs_analyzed/2023-12-10.csv', '../data/quality_data/all_kgs_analyzed/2023-12-17.csv', '../data/quality_data/all_kgs_analyzed/2023-12-24.csv', '../data/quality_data/all_kgs_analyzed/2023-12-31.csv'
 ]
 
+#The SPARQL endpoints can be probed again, instead of using the status recorded by KGHeartBeat, with:
+#probes = sparql_prober.SparqlProber().run(sparql_prober.endpoint_urls(file)) and then d.availabilityScore(1,probes), d.performanceScore(1,probes)
 for file in files:
     d = RecalculateScore(file,20)
     d.availabilityScore(1)
     d.licensingScore(1)
     d.interlinkingScore(1)
     d.securityScore(1)
-    #d.performanceScore(1)
+    #d.performanceScore(1,probes)
     d.accuracyScore(1)
     d.concisenessScore(1)
     d.verifiabilityScore(1)
@@ -0,0 +1,275 @@
+import atexit
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+here = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.normpath(os.path.join(here, '../data'))
+STORE_PATH = os.path.join(DATA_PATH, 'evaluation_results/results.sqlite')
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        started TEXT NOT NULL,
+        finished TEXT
+    );
+    CREATE TABLE IF NOT EXISTS outputs (
+        run_id TEXT NOT NULL,
+        output TEXT NOT NULL,
+        topic TEXT,
+        header TEXT NOT NULL,
+        line_terminator TEXT NOT NULL,
+        PRIMARY KEY (run_id, output)
+    );
+    CREATE TABLE IF NOT EXISTS results (
+        run_id TEXT NOT NULL,
+        output TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        topic TEXT,
+        metric TEXT,
+        date TEXT,
+        row TEXT NOT NULL,
+        PRIMARY KEY (run_id, output, position)
+    );
+    CREATE INDEX IF NOT EXISTS results_by_key ON results (run_id, topic, metric, date);
+    CREATE INDEX IF NOT EXISTS results_by_output ON results (output);
+'''
+
+# Only the current version of every output is kept: the versions written by the previous runs, by a store that kept all of them, are removed
+PRUNE = '''
+    DELETE FROM outputs WHERE EXISTS (
+        SELECT 1 FROM outputs AS newer JOIN runs AS newer_run ON newer_run.run_id = newer.run_id JOIN runs ON runs.run_id = outputs.run_id
+        WHERE newer.output = outputs.output AND newer_run.started > runs.started
+    );
+    DELETE FROM results WHERE NOT EXISTS (SELECT 1 FROM outputs WHERE outputs.run_id = results.run_id AND outputs.output = results.output);
+'''
+
+def _to_python(value):
+    '''
+        Convert the numpy scalars to the python ones, so that they can be stored as JSON and written back as they were.
+    '''
+    return value.item() if hasattr(value, 'item') else value
+
+def output_name(path):
+    '''
+        Return the name of an output from the path of its legacy csv.
+
+        :param path: path to the csv, absolute or relative to the data folder.
+    '''
+    return os.path.relpath(os.path.normpath(os.path.join(DATA_PATH, path)), DATA_PATH).replace(os.sep, '/')
+
+class ResultsStore:
+    def __init__(self, store_path=STORE_PATH, run_id=None, batch_size=5000):
+        '''
+            Single SQLite database with the results of the evaluations, instead of one small csv for every table.
+            Every table is an output, identified by the path of its legacy csv (relative to the data folder), whose rows are keyed by run, topic, metric and date.
+            Only the current version of every output is kept, with the run that wrote it: writing an output replaces the one written by a previous run.
+            The writes are buffered and committed in batches, each batch in a single transaction.
+
+            :param store_path: path to the SQLite database.
+            :param run_id: identifier of the run, by default the time at which the store is opened (in microseconds) and the process id.
+            :param batch_size: number of buffered rows after which the writes are committed.
+        '''
+        self.store_path = store_path
+        self.run_id = run_id or f"{datetime.now().strftime('%Y-%m-%dT%H-%M-%S.%f')}-{os.getpid()}"
+        self.batch_size = batch_size
+        self.pending = {}
+        self.pending_rows = 0
+        self.lock = threading.RLock()
+
+        os.makedirs(os.path.dirname(store_path), exist_ok=True)
+        self.connection = sqlite3.connect(store_path, check_same_thread=False)
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.executescript(PRUNE)
+            self.connection.execute('INSERT OR IGNORE INTO runs (run_id, started) VALUES (?, ?)', (self.run_id, datetime.now().isoformat()))
+
+    def output_name(self, path):
+        return output_name(path)
+
+    def put(self, path, header, rows, topic=None, metric=None, date=None, metric_column=None, date_column=None, line_terminator='\r\n'):
+        '''
+            Add a table to the store, replacing the table with the same path written before, in this run or in a previous one.
+
+            :param path: path of the legacy csv of the table.
+            :param header: list with the column names.
+            :param rows: list of rows, every row is a list of values.
+            :param topic: topic of the KGs evaluated.
+            :param metric: metric of all the rows (e.g. for the stats over time of a metric).
+            :param date: analysis date of all the rows (e.g. for the punctual stats).
+            :param metric_column: index of the column with the metric of each row, instead of metric.
+            :param date_column: index of the column with the analysis date of each row, instead of date.
+            :param line_terminator: line terminator of the legacy csv.
+        '''
+        rows = [[_to_python(value) for value in row] for row in rows]
+        keys = [(row[metric_column] if metric_column is not None else metric, row[date_column] if date_column is not None else date) for row in rows]
+        output = self.output_name(path)
+        with self.lock:
+            if output in self.pending:
+                self.pending_rows -= len(self.pending[output]['rows'])
+            self.pending[output] = {'topic': topic, 'header': list(header), 'rows': rows, 'keys': keys, 'line_terminator': line_terminator}
+            self.pending_rows += len(rows)
+            if self.pending_rows >= self.batch_size:
+                self.commit()
+
+    def put_frame(self, path, df, index=True, topic=None, metric=None, date=None, metric_column=None, date_column=None):
+        '''
+            Add a pandas DataFrame (or Series) to the store, the rows are kept as to_csv would write them.
+
+            :param path: path of the legacy csv of the table.
+            :param df: DataFrame or Series to store.
+            :param index: boolean that if True, the index is stored as the first column.
+            See put for the other parameters.
+        '''
+        rows = list(csv.reader(io.StringIO(df.to_csv(index=index))))
+        self.put(path, rows[0], rows[1:], topic, metric, date, metric_column, date_column, line_terminator='\n')
+
+    def commit(self):
+        '''
+            Write all the buffered tables in a single transaction, each one replacing the previous version of its output.
+        '''
+        with self.lock:
+            if not self.pending:
+                return
+            with self.connection:
+                for output, table in self.pending.items():
+                    self.connection.execute('DELETE FROM results WHERE output = ?', (output,))
+                    self.connection.execute('DELETE FROM outputs WHERE output = ?', (output,))
+                    self.connection.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?)',
+                                            (self.run_id, output, table['topic'], json.dumps(table['header']), table['line_terminator']))
+                    self.connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?)', [
+                        (self.run_id, output, position, table['topic'], None if metric is None else str(metric), None if date is None else str(date), json.dumps(row))
+                        for position, (row, (metric, date)) in enumerate(zip(table['rows'], table['keys']))
+                    ])
+            self.pending = {}
+            self.pending_rows = 0
+
+    def finish(self):
+        '''
+            Commit the buffered tables and mark the run as finished.
+        '''
+        with self.lock:
+            self.commit()
+            with self.connection:
+                self.connection.execute('UPDATE runs SET finished = ? WHERE run_id = ?', (datetime.now().isoformat(), self.run_id))
+
+    def read(self, path):
+        '''
+            Return the header and the rows of a table, None if it was never written.
+            The table is searched in the buffered writes, then in the store and finally in the legacy csv.
+
+            :param path: path of the legacy csv of the table.
+        '''
+        output = self.output_name(path)
+        with self.lock:
+            if output in self.pending:
+                table = self.pending[output]
+                return list(table['header']), [list(row) for row in table['rows']]
+            found = self.connection.execute('SELECT run_id, header FROM outputs WHERE output = ?', (output,)).fetchone()
+            if found is not None:
+                rows = self.connection.execute('SELECT row FROM results WHERE run_id = ? AND output = ? ORDER BY position', (found[0], output)).fetchall()
+                return json.loads(found[1]), [json.loads(row) for row, in rows]
+
+        legacy_path = os.path.join(DATA_PATH, output)
+        if os.path.isfile(legacy_path):
+            with open(legacy_path, mode='r', newline='') as file:
+                rows = list(csv.reader(file))
+            if rows:
+                return rows[0], rows[1:]
+        return None
+
+    def frame(self, path):
+        '''
+            Return a table as a DataFrame, parsed as pandas.read_csv would parse its legacy csv (e.g. to draw the charts without exporting the csv files).
+
+            :param path: path of the legacy csv of the table, absolute or relative to the data folder.
+        '''
+        table = self.read(path)
+        if table is None:
+            raise KeyError(f'{self.output_name(path)} is not in the results store')
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(table[0])
+        writer.writerows(table[1])
+        buffer.seek(0)
+        return pd.read_csv(buffer)
+
+    def query(self, topic=None, metric=None, date=None, output=None, run_id=None):
+        '''
+            Return the rows written by a run that match the given keys as a DataFrame with the columns Output, Topic, Metric, Date and Row (the list of values).
+            Only the outputs whose current version was written by the run are found, an output written again by a later run belongs to that run.
+
+            :param topic: topic of the KGs evaluated.
+            :param metric: name of the metric.
+            :param date: analysis date.
+            :param output: path of the legacy csv of the table.
+            :param run_id: identifier of the run, by default the current one.
+        '''
+        self.commit()
+        conditions = ['run_id = ?']
+        values = [run_id or self.run_id]
+        for column, value in (('topic', topic), ('metric', metric), ('date', date), ('output', output and self.output_name(output))):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                values.append(value)
+        with self.lock:
+            rows = self.connection.execute(f"SELECT output, topic, metric, date, row FROM results WHERE {' AND '.join(conditions)} ORDER BY output, position", values).fetchall()
+        return pd.DataFrame([(output, topic, metric, date, json.loads(row)) for output, topic, metric, date, row in rows],
+                            columns=['Output', 'Topic', 'Metric', 'Date', 'Row'])
+
+    def runs(self):
+        '''
+            Return the runs in the store, the most recent first.
+        '''
+        with self.lock:
+            return pd.read_sql_query('SELECT * FROM runs ORDER BY started DESC', self.connection)
+
+    def export_csv(self, topic=None, run_id=None, data_path=DATA_PATH):
+        '''
+            Export the tables written by a run in the legacy layout of one csv for every table, and return the number of files written.
+            As in query, only the tables whose current version was written by the run are exported.
+
+            :param topic: if given, export only the tables of this topic.
+            :param run_id: identifier of the run, by default the current one.
+            :param data_path: folder under which the csv files are written.
+        '''
+        self.commit()
+        run_id = run_id or self.run_id
+        with self.lock:
+            if topic is None:
+                outputs = self.connection.execute('SELECT output, header, line_terminator FROM outputs WHERE run_id = ?', (run_id,)).fetchall()
+            else:
+                outputs = self.connection.execute('SELECT output, header, line_terminator FROM outputs WHERE run_id = ? AND topic = ?', (run_id, topic)).fetchall()
+            tables = [(output, json.loads(header), line_terminator,
+                       self.connection.execute('SELECT row FROM results WHERE run_id = ? AND output = ? ORDER BY position', (run_id, output)).fetchall())
+                      for output, header, line_terminator in outputs]
+
+        for output, header, line_terminator, rows in tables:
+            save_path = os.path.join(data_path, output)
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            with open(save_path, mode='w', newline='') as file:
+                writer = csv.writer(file, lineterminator=line_terminator)
+                writer.writerow(header)
+                writer.writerows(json.loads(row) for row, in rows)
+        return len(tables)
+
+_stores = {}
+
+def get_store(store_path=STORE_PATH):
+    '''
+        Return the store shared by all the modules of the process, all the results of the process belong to the same run.
+        The buffered writes still pending when the process exits are committed.
+
+        :param store_path: path to the SQLite database.
+    '''
+    store_path = os.path.abspath(store_path)
+    if store_path not in _stores:
+        _stores[store_path] = ResultsStore(store_path)
+        atexit.register(_stores[store_path].finish)
+    return _stores[store_path]
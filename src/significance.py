@@ -0,0 +1,193 @@
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import kghb_schema
+
+TOPICS = ['cross-domain','geography','government','life-sciences','linguistic','media','publications','social-networking','user-generated','no-domain']
+
+def rank_columns(values):
+    '''
+        Rank every column of a matrix, ties get the average of their ranks (ranks start from 1).
+        Returns the ranks and, for every column, the tie correction term sum(t^3 - t) over the groups of tied values.
+
+        :param values: 2-D array without missing values.
+    '''
+    ranks = np.empty(values.shape)
+    ties = np.empty(values.shape[1])
+    for column in range(values.shape[1]):
+        sorted_values = np.sort(values[:, column])
+        left = np.searchsorted(sorted_values, values[:, column], side='left')
+        right = np.searchsorted(sorted_values, values[:, column], side='right')
+        ranks[:, column] = (left + 1 + right) / 2
+        tie_sizes = np.diff(np.flatnonzero(np.concatenate([[True], sorted_values[1:] != sorted_values[:-1], [True]])))
+        ties[column] = (tie_sizes ** 3 - tie_sizes).sum()
+    return ranks, ties
+
+def correct_p_values(p_values, method='holm'):
+    '''
+        Correct a family of p-values for multiple comparisons.
+
+        :param p_values: 1-D array of p-values, NaN are ignored.
+        :param method: 'holm' (Holm-Bonferroni, controls the family-wise error rate) or 'bh' (Benjamini-Hochberg, controls the false discovery rate).
+    '''
+    p_values = np.asarray(p_values, dtype=float)
+    corrected = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return corrected
+    order = valid[np.argsort(p_values[valid], kind='stable')]
+    ranked = p_values[order]
+    if method == 'holm':
+        adjusted = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    elif method == 'bh':
+        adjusted = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown correction method: {method}")
+    corrected[order] = np.minimum(adjusted, 1)
+    return corrected
+
+def _permutation_p_values(ranks, group_sizes, statistic, observed, n_permutations, rng, batch_size):
+    '''
+        Two-sided permutation p-values of a rank statistic, for every column at once.
+        Each batch of permutations is a (permutations x observations) matrix of group labels; the rank sums of every group
+        are obtained with one matrix product per group and passed to statistic.
+    '''
+    labels = np.repeat(np.arange(len(group_sizes)), group_sizes)
+    exceed = np.zeros(ranks.shape[1])
+    for start in range(0, n_permutations, batch_size):
+        size = min(batch_size, n_permutations - start)
+        permuted = rng.permuted(np.broadcast_to(labels, (size, len(labels))), axis=1)
+        rank_sums = np.stack([(permuted == group).astype(float) @ ranks for group in range(len(group_sizes))])
+        exceed += (statistic(rank_sums) >= observed - 1e-9).sum(axis=0)
+    return (exceed + 1) / (n_permutations + 1)
+
+class SignificanceTests:
+    def __init__(self, topics=TOPICS, filename='2024-11-24.csv', quality_data_path='../data/quality_data/only_from_LODC', only_sparql_up=True):
+        '''
+            Tests whether the quality of the KGs differs between topics: Kruskal-Wallis across all the topics, and pairwise Mann-Whitney tests,
+            both with permutation p-values computed in batches for all the metrics at once.
+
+            :param topics: list of the topics to compare ('all' should not be included, it contains the other topics).
+            :param filename: name of the analysis to use in the folder of every topic.
+            :param quality_data_path: path to the folder with the quality data split by topic.
+            :param only_sparql_up: boolean that if True, consider only the KGs with the SPARQL endpoint online, as in the punctual stats.
+        '''
+        self.topics = topics
+        self.data = {}
+        for topic in topics:
+            df = kghb_schema.read_snapshot(os.path.join(quality_data_path, topic, filename))
+            if only_sparql_up:
+                df = df[df['Sparql endpoint'] == 'Available']
+            self.data[topic] = df
+
+    def _samples(self, metric, topics):
+        '''
+            Values of a metric in every topic, without the missing ones.
+        '''
+        return [self.data[topic][metric].dropna().to_numpy(dtype=float) for topic in topics]
+
+    def _groups_by_sizes(self, metrics, topics):
+        '''
+            Group the metrics with the same number of KGs with a value in every topic, so that they can share the same permutations.
+        '''
+        groups = {}
+        for metric in metrics:
+            samples = self._samples(metric, topics)
+            sizes = tuple(len(sample) for sample in samples)
+            groups.setdefault(sizes, []).append((metric, samples))
+        return groups
+
+    def kruskal_wallis(self, metrics, n_permutations=10000, seed=42, batch_size=1000):
+        '''
+            Kruskal-Wallis H test across all the topics for every metric, with permutation p-values corrected with Holm across the metrics.
+            H and the p-value are NaN for the metrics with values in fewer than two topics or with all the values tied.
+
+            :param metrics: list of the column names of the metrics to test.
+            :param n_permutations: number of permutations.
+            :param seed: seed of the permutations, fixed so that the p-values are reproducible.
+            :param batch_size: number of permutations evaluated at once.
+        '''
+        rng = np.random.default_rng(seed)
+        rows = []
+        for sizes, group in self._groups_by_sizes(metrics, self.topics).items():
+            sizes = np.array(sizes)
+            n = sizes.sum()
+            if n < 2 or (sizes > 0).sum() < 2:
+                rows += [[metric, n, np.nan, np.nan] for metric, samples in group]
+                continue
+            # Empty topics do not take part in the test
+            nonempty = sizes > 0
+            ranks, ties = rank_columns(np.column_stack([np.concatenate(samples) for metric, samples in group]))
+            correction = 1 - ties / (n ** 3 - n)
+            # With all the values tied H is not defined and no permutation differs from the observed one, the metric is not tested
+            tested = correction > 1e-12
+            ranks, correction = ranks[:, tested], correction[tested]
+
+            def statistic(rank_sums):
+                return (12 / (n * (n + 1)) * (rank_sums ** 2 / sizes[nonempty][:, None, None]).sum(axis=0) - 3 * (n + 1)) / correction
+
+            h_statistic = np.full(len(group), np.nan)
+            p_values = np.full(len(group), np.nan)
+            if tested.any():
+                observed = statistic(np.stack([ranks[labels].sum(axis=0) for labels in np.split(np.arange(n), np.cumsum(sizes[nonempty])[:-1])])[:, None, :])[0]
+                h_statistic[tested] = observed
+                p_values[tested] = _permutation_p_values(ranks, sizes[nonempty], statistic, observed, n_permutations, rng, batch_size)
+            rows += [[metric, n, h_statistic[index], p_values[index]] for index, (metric, samples) in enumerate(group)]
+
+        results = pd.DataFrame(rows, columns=['Dimension', 'Number of KGs', 'H', 'p-value'])
+        results = results.set_index('Dimension').loc[list(metrics)].reset_index()
+        results['p-value (Holm)'] = correct_p_values(results['p-value'], 'holm')
+        return results
+
+    def pairwise(self, metrics, n_permutations=10000, seed=42, batch_size=1000, correction='holm'):
+        '''
+            Mann-Whitney U test for every pair of topics and every metric, with two-sided permutation p-values.
+            The p-values are corrected across the pairs of topics of each metric.
+
+            :param metrics: list of the column names of the metrics to test.
+            :param n_permutations: number of permutations.
+            :param seed: seed of the permutations, fixed so that the p-values are reproducible.
+            :param batch_size: number of permutations evaluated at once.
+            :param correction: 'holm' or 'bh', see correct_p_values.
+        '''
+        rng = np.random.default_rng(seed)
+        rows = []
+        for topic_a, topic_b in combinations(self.topics, 2):
+            for sizes, group in self._groups_by_sizes(metrics, [topic_a, topic_b]).items():
+                n_a, n_b = sizes
+                if n_a == 0 or n_b == 0:
+                    rows += [[metric, topic_a, topic_b, n_a, n_b, np.nan, np.nan, np.nan] for metric, samples in group]
+                    continue
+                ranks, _ = rank_columns(np.column_stack([np.concatenate(samples) for metric, samples in group]))
+                center = n_a * n_b / 2
+
+                def statistic(rank_sums):
+                    return np.abs(rank_sums[0] - n_a * (n_a + 1) / 2 - center)
+
+                u_statistic = ranks[:n_a].sum(axis=0) - n_a * (n_a + 1) / 2
+                p_values = _permutation_p_values(ranks, sizes, statistic, np.abs(u_statistic - center), n_permutations, rng, batch_size)
+                # Rank-biserial correlation: positive if the values of topic A tend to be greater
+                effect_sizes = 2 * u_statistic / (n_a * n_b) - 1
+                rows += [[metric, topic_a, topic_b, n_a, n_b, u_statistic[index], effect_sizes[index], p_values[index]]
+                         for index, (metric, samples) in enumerate(group)]
+
+        results = pd.DataFrame(rows, columns=['Dimension', 'Topic A', 'Topic B', 'KGs in A', 'KGs in B', 'U', 'Rank-biserial correlation', 'p-value'])
+        results[f'p-value ({correction})'] = results.groupby('Dimension', sort=False)['p-value'].transform(lambda p_values: correct_p_values(p_values.to_numpy(), correction))
+        order = {metric: index for index, metric in enumerate(metrics)}
+        return results.sort_values('Dimension', key=lambda column: column.map(order), kind='stable').reset_index(drop=True)
+
+    def run(self, metrics, output_filename, n_permutations=10000, seed=42):
+        '''
+            Run both the tests and write the results in ../data/evaluation_results/2024/significance.
+
+            :param metrics: list of the column names of the metrics to test.
+            :param output_filename: prefix of the csv files (e.g. dimensions).
+        '''
+        here = os.path.dirname(os.path.abspath(__file__))
+        output_dir = os.path.join(here, '../data/evaluation_results/2024/significance')
+        os.makedirs(output_dir, exist_ok=True)
+        self.kruskal_wallis(metrics, n_permutations, seed).to_csv(os.path.join(output_dir, f'{output_filename}_kruskal_wallis.csv'), index=False)
+        self.pairwise(metrics, n_permutations, seed).to_csv(os.path.join(output_dir, f'{output_filename}_pairwise.csv'), index=False)
@@ -0,0 +1,279 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Longest extensions first, so that a .tar.gz is not taken for a single gzip file
+ARCHIVE_TYPES = [('.tar.gz', 'tar.gz'), ('.tgz', 'tar.gz'), ('.tar.zst', 'tar.zst'), ('.tar', 'tar'), ('.zip', 'zip'), ('.gz', 'gz'), ('.zst', 'zst')]
+
+def archive_type(path):
+    '''
+        Return the type of archive from the extension of a file (zip, tar, tar.gz, tar.zst, gz or zst), None if it is not an archive.
+
+        :param path: path to the file.
+    '''
+    name = path.lower()
+    for extension, kind in ARCHIVE_TYPES:
+        if name.endswith(extension):
+            return kind
+    return None
+
+def source_name(path):
+    '''
+        Return the name of a snapshot source without the archive extension (e.g. media.zip -> media).
+
+        :param path: path to a folder or to an archive.
+    '''
+    name = os.path.basename(os.path.normpath(path))
+    for extension, kind in ARCHIVE_TYPES:
+        if name.lower().endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+def split_path(path):
+    '''
+        Split the path of a snapshot stored in an archive (e.g. ../all_kgs_analyzed/history.zip/2024-11-24.csv) into the path to the archive and the member name.
+        Returns (None, None) if the path does not point into an archive.
+
+        :param path: path to the snapshot.
+    '''
+    head = os.path.normpath(path)
+    while True:
+        if archive_type(head) and os.path.isfile(head):
+            member = os.path.relpath(os.path.normpath(path), head)
+            return (head, member.replace(os.sep, '/')) if member != '.' else (head, None)
+        parent = os.path.dirname(head)
+        if parent == head or not parent:
+            return None, None
+        head = parent
+
+def is_member(path):
+    '''
+        Check if a path points to a snapshot stored in an archive.
+    '''
+    archive_path, member = split_path(path)
+    return member is not None
+
+def _zstd_reader(file):
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading .zst archives requires the zstandard package (pip install zstandard)")
+    return zstandard.ZstdDecompressor().stream_reader(file, closefd=True)
+
+def _decompressed(archive_path, kind):
+    '''
+        Open the decompressed stream of a gzip or zstd file (or of a plain tar).
+    '''
+    if kind in ('gz', 'tar.gz'):
+        return gzip.open(archive_path, 'rb')
+    if kind in ('zst', 'tar.zst'):
+        return _zstd_reader(open(archive_path, 'rb'))
+    return open(archive_path, 'rb')
+
+class _MemberReader(io.RawIOBase):
+    '''
+        Reads the bytes of a tar member, from its offset in the decompressed stream of the archive.
+    '''
+    def __init__(self, stream, offset, size, seekable):
+        self.stream = stream
+        self.remaining = size
+        if seekable:
+            stream.seek(offset)
+        else:
+            # The compressed tar archives can only be decompressed from the start, the bytes before the member are discarded
+            while offset > 0:
+                skipped = len(stream.read(min(offset, 1 << 20)))
+                if skipped == 0:
+                    raise EOFError("Unexpected end of the archive")
+                offset -= skipped
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        data = self.stream.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+class ArchiveIndex:
+    def __init__(self, archive_path):
+        '''
+            Listing of the members of an archive, used to open a single snapshot without scanning the archive.
+            The zip archives have their own listing (the central directory). For the tar archives the position of every member is recorded
+            with a single scan and persisted next to the archive ({archive}.index.json), it is rebuilt only when the archive changes.
+
+            :param archive_path: path to the archive.
+        '''
+        self.archive_path = archive_path
+        self.kind = archive_type(archive_path)
+        self.index_path = archive_path + '.index.json'
+        self.lock = threading.Lock()
+        self.zip_file = None
+        if self.kind == 'zip':
+            self.zip_file = zipfile.ZipFile(archive_path)
+            self.members = {info.filename: {'size': info.file_size} for info in self.zip_file.infolist() if not info.is_dir()}
+        elif self.kind in ('gz', 'zst'):
+            self.members = {source_name(archive_path): {'offset': 0, 'size': None}}
+        elif not self._load():
+            self.build()
+
+    def _load(self):
+        if not os.path.isfile(self.index_path):
+            return False
+        with open(self.index_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        stat = os.stat(self.archive_path)
+        if data['size'] != stat.st_size or data['mtime_ns'] != stat.st_mtime_ns:
+            return False
+        self.members = data['members']
+        return True
+
+    def build(self):
+        '''
+            Scan a tar archive once, recording the offset and the size of every member in the decompressed stream.
+        '''
+        self.members = {}
+        with _decompressed(self.archive_path, self.kind) as stream:
+            with tarfile.open(fileobj=stream, mode='r|') as tar:
+                for member in tar:
+                    if member.isfile():
+                        self.members[member.name] = {'offset': member.offset_data, 'size': member.size}
+
+        stat = os.stat(self.archive_path)
+        try:
+            with open(self.index_path, 'w', encoding='utf-8') as file:
+                json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'members': self.members}, file)
+        except OSError:
+            # Read-only location, the listing is kept only in memory
+            pass
+
+    def names(self):
+        return list(self.members)
+
+    def open(self, member):
+        '''
+            Open a member as a binary stream, decompressed while it is read.
+
+            :param member: name of the member in the archive.
+        '''
+        if member not in self.members:
+            raise FileNotFoundError(f"{member} not found in {self.archive_path}")
+        if self.kind == 'zip':
+            # ZipFile reads the compressed bytes under a lock and decompresses outside of it, so the members can be read in parallel
+            with self.lock:
+                return self.zip_file.open(member)
+        record = self.members[member]
+        stream = _decompressed(self.archive_path, self.kind)
+        if self.kind in ('gz', 'zst'):
+            return stream
+        return io.BufferedReader(_MemberReader(stream, record['offset'], record['size'], self.kind == 'tar'), buffer_size=1 << 20)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_index(archive_path):
+    '''
+        Return the index of an archive shared by all the modules of the process.
+
+        :param archive_path: path to the archive.
+    '''
+    archive_path = os.path.abspath(archive_path)
+    stat = os.stat(archive_path)
+    key = (archive_path, stat.st_size, stat.st_mtime_ns)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = ArchiveIndex(archive_path)
+        return _indexes[key]
+
+def open_snapshot(path):
+    '''
+        Open a snapshot as a binary stream, whether it is a plain file or a member of an archive.
+
+        :param path: path to the snapshot, for an archive member the path to the archive followed by the member name.
+    '''
+    archive_path, member = split_path(path)
+    if archive_path is None:
+        return open(path, 'rb')
+    if member is None:
+        index = get_index(archive_path)
+        if len(index.members) != 1:
+            raise IsADirectoryError(f"{path} contains more than one snapshot, open one of its members")
+        member = index.names()[0]
+    return get_index(archive_path).open(member)
+
+def list_snapshots(source, pattern='.csv'):
+    '''
+        Return the paths of the snapshots in a folder or in an archive, ordered by filename.
+        The archives found in a folder are listed too; a snapshot that is also extracted in the folder is taken from the folder.
+
+        :param source: path to a folder, to an archive or to a folder inside an archive.
+        :param pattern: only the files whose name contains it are returned.
+    '''
+    archive_path, prefix = split_path(source)
+    if archive_path is not None:
+        prefix = prefix + '/' if prefix else ''
+        paths = [os.path.join(archive_path, *name.split('/')) for name in get_index(archive_path).names()
+                 if name.startswith(prefix) and pattern in os.path.basename(name)]
+        return sorted(paths, key=lambda path: (os.path.basename(path), path))
+
+    paths = {}
+    archives = []
+    for filename in os.listdir(source):
+        file_path = os.path.join(source, filename)
+        if archive_type(filename) in ('gz', 'zst') and pattern in source_name(filename):
+            archives.append(os.path.join(file_path, source_name(filename)))
+        elif archive_type(filename):
+            archives += list_snapshots(file_path, pattern)
+        elif pattern in filename:
+            paths[filename] = file_path
+    for path in archives:
+        paths.setdefault(os.path.basename(path), path)
+    return [paths[filename] for filename in sorted(paths)]
+
+def map_snapshots(function, paths, n_jobs=None):
+    '''
+        Apply a function to every snapshot in parallel threads (the decompression and the CSV parsing release the GIL), keeping the order of the paths.
+
+        :param function: function called with the path of a snapshot.
+        :param paths: list of the paths of the snapshots.
+        :param n_jobs: number of threads, by default the number of CPUs.
+    '''
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1 or len(paths) <= 1:
+        return [function(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(function, paths))
+
+def prefetch_snapshots(function, paths, n_jobs=None):
+    '''
+        Like map_snapshots, but yields (path, result) one at a time, reading at most n_jobs snapshots ahead of the one being processed.
+        Used when the results must be processed in order and do not fit in memory all together.
+    '''
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if n_jobs == 1:
+        for path in paths:
+            yield path, function(path)
+        return
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        for path in paths:
+            pending.append((path, executor.submit(function, path)))
+            if len(pending) > n_jobs:
+                path, future = pending.popleft()
+                yield path, future.result()
+        while pending:
+            path, future = pending.popleft()
+            yield path, future.result()
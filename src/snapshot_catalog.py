@@ -0,0 +1,233 @@
+import json
+import os
+from datetime import date
+import kghb_schema
+import snapshot_archive
+
+here = os.path.dirname(os.path.abspath(__file__))
+CATALOG_PATH = os.path.join(here, '../data/quality_data/snapshot_catalog.json')
+
+# Version of the statistics kept for every snapshot, the entries written by another version are computed again
+CATALOG_VERSION = 1
+
+# Operators of the predicates accepted by SnapshotCatalog.select, e.g. ('Sparql endpoint', '==', 'Available') or ('Understandability score', '<=', 1.0)
+OPERATORS = ('==', '!=', '<', '<=', '>', '>=', 'notnull')
+
+def _source_stat(path):
+    '''
+        Return the size and the modification time of a snapshot, of its archive if it is stored in one.
+    '''
+    archive_path, member = snapshot_archive.split_path(path)
+    stat = os.stat(archive_path if archive_path is not None else path)
+    return stat.st_size, stat.st_mtime_ns
+
+def describe(path):
+    '''
+        Read a snapshot once and return its catalog entry: analysis date, schema version, number of rows and, for every column (category scores included), the number of nulls,
+        the minimum and the maximum of the numeric columns, the number of rows of every value of the status columns and the number of distinct KG ids.
+
+        :param path: path to the snapshot, it can be a member of an archive.
+    '''
+    size, mtime_ns = _source_stat(path)
+    analysis_date = kghb_schema.snapshot_date(path)
+    df = kghb_schema.read_snapshot(path)
+    # The category scores missing from the file are described as the views compute them when the file is read
+    categories = [category for category, dimensions in kghb_schema.CATEGORY_DIMENSIONS.items()
+                  if category not in df.columns and all(dimension in df.columns for dimension in dimensions)]
+    df = kghb_schema.add_category_scores(df, categories)
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        stats = {'nulls': int(series.isna().sum())}
+        rule = kghb_schema.get_column(column, analysis_date).rule
+        if rule in ('score', 'count', 'flag'):
+            values = series.dropna()
+            cast = float if rule == 'score' else int
+            stats['min'] = cast(values.min()) if len(values) else None
+            stats['max'] = cast(values.max()) if len(values) else None
+        elif rule == 'status':
+            # Values counted without the surrounding spaces, as the evaluations compare them
+            stats['values'] = {str(value): int(count) for value, count in series.dropna().astype(str).str.strip().value_counts().items()}
+        elif rule == 'id':
+            stats['distinct'] = int(series.nunique())
+        columns[column] = stats
+
+    return {
+        'date': analysis_date.isoformat() if analysis_date else None,
+        'schema_version': kghb_schema.schema_version(analysis_date),
+        'rows': len(df),
+        'size': size,
+        'mtime_ns': mtime_ns,
+        'columns': columns,
+    }
+
+def may_match(entry, column, operator, value=None):
+    '''
+        Check, from the statistics of a snapshot only, if some of its rows may satisfy a predicate.
+        False means that no row satisfies it, so the snapshot can be skipped without opening it; True means that the snapshot has to be read.
+
+        :param entry: catalog entry of the snapshot (see describe).
+        :param column: exact column name.
+        :param operator: one of OPERATORS.
+        :param value: value compared with the column (not used by 'notnull').
+    '''
+    if operator not in OPERATORS:
+        raise ValueError(f'Unknown operator {operator}, expected one of {OPERATORS}')
+    stats = entry['columns'].get(column)
+    # Missing or null values never satisfy a predicate
+    if stats is None or stats['nulls'] >= entry['rows']:
+        return False
+    if operator == 'notnull':
+        return True
+    if 'values' in stats:
+        if operator == '==':
+            return value in stats['values']
+        if operator == '!=':
+            return any(status != value for status in stats['values'])
+        return True
+    if 'min' in stats:
+        low, high = stats['min'], stats['max']
+        return {
+            '==': low <= value <= high,
+            '!=': not (low == high == value),
+            '<': low < value,
+            '<=': low <= value,
+            '>': high > value,
+            '>=': high >= value,
+        }[operator]
+    return True
+
+class SnapshotCatalog:
+    def __init__(self, catalog_path=CATALOG_PATH):
+        '''
+            Catalog of the KGHeartBeat snapshots: for every snapshot its analysis date, schema version, number of rows and column statistics (see describe).
+            The snapshots are selected by date range and by predicate on the statistics, without opening the files.
+            The catalog is persisted and refreshed incrementally: a snapshot is read again only if it is new or its file changed.
+
+            :param catalog_path: path to the JSON file in which the catalog is persisted, the snapshots are recorded relative to its folder.
+        '''
+        self.catalog_path = catalog_path
+        self.entries = {}
+        self.changed = False
+        if os.path.isfile(catalog_path):
+            # An unreadable catalog (e.g. truncated by a crash of a previous version) is rebuilt, the snapshots are described again
+            try:
+                with open(catalog_path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Snapshot catalog: {catalog_path} is not readable ({e}), the snapshots are described again")
+                data = {}
+            if isinstance(data, dict) and data.get('version') == CATALOG_VERSION and isinstance(data.get('entries'), dict):
+                self.entries = data['entries']
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), os.path.dirname(os.path.abspath(self.catalog_path))).replace(os.sep, '/')
+
+    def _is_current(self, path):
+        entry = self.entries.get(self._key(path))
+        if entry is None:
+            return False
+        try:
+            size, mtime_ns = _source_stat(path)
+        except OSError:
+            return False
+        analysis_date = date.fromisoformat(entry['date']) if entry['date'] else None
+        return entry['size'] == size and entry['mtime_ns'] == mtime_ns and entry['schema_version'] == kghb_schema.schema_version(analysis_date)
+
+    def refresh(self, paths, save=True):
+        '''
+            Describe the snapshots that are new or changed since the last refresh, and return their paths.
+
+            :param paths: list of the paths of the snapshots (e.g. returned by snapshot_archive.list_snapshots).
+            :param save: if True and some snapshot was described, the catalog is persisted.
+        '''
+        stale = [path for path in paths if not self._is_current(path)]
+        for path, entry in zip(stale, snapshot_archive.map_snapshots(describe, stale)):
+            self.entries[self._key(path)] = entry
+        if stale:
+            self.changed = True
+            print(f"Snapshot catalog: {len(stale)} snapshots described")
+        if save and self.changed:
+            self.save()
+        return stale
+
+    def prune(self):
+        '''
+            Remove the snapshots whose file no longer exists, and return how many were removed.
+        '''
+        folder = os.path.dirname(os.path.abspath(self.catalog_path))
+        missing = [key for key in self.entries if not os.path.exists(snapshot_archive.split_path(os.path.join(folder, key))[0] or os.path.join(folder, key))]
+        for key in missing:
+            del self.entries[key]
+        self.changed = self.changed or bool(missing)
+        return len(missing)
+
+    def save(self):
+        '''
+            Persist the catalog.
+        '''
+        os.makedirs(os.path.dirname(self.catalog_path) or '.', exist_ok=True)
+        # The file is replaced at once, a run interrupted while writing never leaves a truncated catalog
+        temporary = f'{self.catalog_path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'version': CATALOG_VERSION, 'entries': self.entries}, file, ensure_ascii=False)
+        os.replace(temporary, self.catalog_path)
+        self.changed = False
+
+    def entry(self, path):
+        '''
+            Return the catalog entry of a snapshot, describing it first if it is new or changed.
+
+            :param path: path to the snapshot.
+        '''
+        if not self._is_current(path):
+            self.refresh([path])
+        return self.entries[self._key(path)]
+
+    def snapshot_date(self, path):
+        '''
+            Return the analysis date of a snapshot, None if its name is not a date.
+
+            :param path: path to the snapshot.
+        '''
+        analysis_date = self.entry(path)['date']
+        return date.fromisoformat(analysis_date) if analysis_date else None
+
+    def select(self, paths, start=None, end=None, where=(), comparable=()):
+        '''
+            Return the snapshots, among the given ones and in the same order, that satisfy all the filters, resolved from the catalog only.
+
+            :param paths: list of the paths of the snapshots.
+            :param start: first analysis date (datetime.date, inclusive), None for no lower bound.
+            :param end: last analysis date (datetime.date, inclusive), None for no upper bound.
+            :param where: list of predicates (column, operator, value), a snapshot is kept if each of them may be satisfied by some of its rows (see may_match).
+            :param comparable: list of metrics that must be comparable with the most recent analyses (e.g. the Understandability score only from May 6, 2024).
+        '''
+        self.refresh(paths)
+        selected = []
+        for path in paths:
+            entry = self.entries[self._key(path)]
+            analysis_date = date.fromisoformat(entry['date']) if entry['date'] else None
+            if (start is not None or end is not None) and analysis_date is None:
+                continue
+            if (start is not None and analysis_date < start) or (end is not None and analysis_date > end):
+                continue
+            if not all(kghb_schema.get_column(metric, analysis_date).comparable for metric in comparable):
+                continue
+            if not all(may_match(entry, *predicate) for predicate in where):
+                continue
+            selected.append(path)
+        return selected
+
+_catalogs = {}
+
+def get_catalog(catalog_path=CATALOG_PATH):
+    '''
+        Return the catalog shared by all the modules of the process.
+
+        :param catalog_path: path to the JSON file of the catalog.
+    '''
+    catalog_path = os.path.abspath(catalog_path)
+    if catalog_path not in _catalogs:
+        _catalogs[catalog_path] = SnapshotCatalog(catalog_path)
+    return _catalogs[catalog_path]
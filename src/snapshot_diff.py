@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import pandas as pd
+import kghb_schema
+import kg_id_dictionary
+
+STATUS_COLUMNS = ['Sparql endpoint', 'Availability VoID file', 'Availability of RDF dump (metadata)', 'License machine redeable (metadata)']
+
+class SnapshotDiff:
+    def __init__(self, columns=None):
+        '''
+            Compare two KGHeartBeat snapshots KG by KG and return what changed between them.
+
+            :param columns: list of the columns to compare, by default the status columns, the overall score and the dimension and category scores.
+        '''
+        self.columns = columns if columns is not None else STATUS_COLUMNS + ['Score'] + kghb_schema.DIMENSION_SCORES + kghb_schema.CATEGORY_SCORES
+
+    def load(self, file_path):
+        '''
+            Load a snapshot and sort it by the dictionary code of the KG id.
+
+            :param file_path: path to the snapshot.
+        '''
+        df = kghb_schema.read_snapshot(file_path, usecols=['KG id'] + self.columns)
+        codes = kg_id_dictionary.get_dictionary().encode(df['KG id'])
+        # Codes are unique after a stable sort that keeps the first row of a KG analyzed twice
+        order = np.argsort(codes, kind='stable')
+        codes = codes[order]
+        first = np.ones(len(codes), dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        return codes[first], df.iloc[order[first]].reset_index(drop=True)
+
+    def _merge(self, old_codes, new_codes):
+        '''
+            Sorted merge join of the codes of two snapshots, returns the positions of the common KGs in both of them.
+        '''
+        positions = np.searchsorted(old_codes, new_codes)
+        found = positions < len(old_codes)
+        found[found] = old_codes[positions[found]] == new_codes[found]
+        return positions[found], np.flatnonzero(found)
+
+    def diff(self, old_path, new_path):
+        '''
+            Return the change feed between two snapshots: one row (KG id, Column, Old, New, Delta) for every value that changed,
+            plus a 'Presence' row for every KG that appears or disappears.
+            The columns calculated differently in one of the two snapshots (e.g. the Understandability score before May 5, 2024) are not compared.
+
+            :param old_path: path to the older snapshot.
+            :param new_path: path to the newer snapshot.
+        '''
+        old_codes, old_df = self.load(old_path)
+        new_codes, new_df = self.load(new_path)
+        old_index, new_index = self._merge(old_codes, new_codes)
+        kg_index = kg_id_dictionary.get_dictionary().index
+
+        changes = []
+        for column in self.columns:
+            if not (kghb_schema.is_comparable(column, old_path) and kghb_schema.is_comparable(column, new_path)):
+                continue
+            old_values = old_df[column].iloc[old_index]
+            new_values = new_df[column].iloc[new_index]
+            if pd.api.types.is_numeric_dtype(old_values.dtype) and pd.api.types.is_numeric_dtype(new_values.dtype):
+                old_values = old_values.to_numpy(dtype=float, na_value=np.nan)
+                new_values = new_values.to_numpy(dtype=float, na_value=np.nan)
+                delta = new_values - old_values
+            else:
+                old_values = old_values.to_numpy(dtype=object)
+                new_values = new_values.to_numpy(dtype=object)
+                delta = np.full(len(old_values), np.nan)
+            old_na = pd.isna(old_values)
+            new_na = pd.isna(new_values)
+            changed = (old_na != new_na) | (~old_na & ~new_na & (old_values != new_values))
+            if changed.any():
+                changes.append(pd.DataFrame({
+                    'KG id': kg_index[new_codes[new_index[changed]]],
+                    'Column': column,
+                    'Old': old_values[changed],
+                    'New': new_values[changed],
+                    'Delta': delta[changed],
+                }))
+
+        removed = np.setdiff1d(np.arange(len(old_codes)), old_index, assume_unique=True)
+        added = np.setdiff1d(np.arange(len(new_codes)), new_index, assume_unique=True)
+        for codes, old_value, new_value in ((old_codes[removed], 'present', 'absent'), (new_codes[added], 'absent', 'present')):
+            if len(codes) > 0:
+                changes.append(pd.DataFrame({'KG id': kg_index[codes], 'Column': 'Presence', 'Old': old_value, 'New': new_value, 'Delta': np.nan}))
+
+        if not changes:
+            return pd.DataFrame(columns=['KG id', 'Column', 'Old', 'New', 'Delta'])
+        return pd.concat(changes, ignore_index=True)
+
+    def change_log(self, file_paths, output_path=None):
+        '''
+            Chain the diffs of every pair of consecutive snapshots into a per-KG change log, sorted by KG id and analysis date.
+
+            :param file_paths: list of paths to the snapshots, they are sorted by analysis date.
+            :param output_path: path to the csv in which to write the change log, if None it is only returned.
+        '''
+        file_paths = sorted(file_paths, key=lambda file_path: os.path.basename(file_path))
+        feeds = []
+        for old_path, new_path in zip(file_paths, file_paths[1:]):
+            feed = self.diff(old_path, new_path)
+            feed.insert(0, 'Analysis date', os.path.basename(new_path).split('.')[0])
+            feeds.append(feed)
+
+        change_log = pd.concat(feeds, ignore_index=True) if feeds else pd.DataFrame(columns=['Analysis date', 'KG id', 'Column', 'Old', 'New', 'Delta'])
+        change_log = change_log.sort_values(['KG id', 'Analysis date'], kind='stable').reset_index(drop=True)
+        if output_path is not None:
+            os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+            change_log.to_csv(output_path, index=False)
+
+        return change_log
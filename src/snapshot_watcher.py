@@ -0,0 +1,233 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import threading
+import time
+import kghb_schema
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class SnapshotWatcher:
+    def __init__(self, watch_dir, on_snapshot, debounce=5.0, poll_interval=10.0, use_inotify=True, log_path=None, ingested=None, retry_interval=600.0):
+        '''
+            Watch a directory for new dated KGHeartBeat snapshots (e.g. 2024-11-24.csv) and call on_snapshot for each of them once they are fully written.
+            inotify is used when available, otherwise the directory is polled.
+            A snapshot is done once on_snapshot completed on it: the snapshots done in a previous run (with a 'done' record in the log, or for which ingested returns True)
+            are skipped, all the others found in the directory, e.g. written while the watcher was down, are processed. A failed snapshot is retried after retry_interval seconds.
+
+            :param watch_dir: path to the directory in which KGHeartBeat drops the new snapshots.
+            :param on_snapshot: function called with the path of every new snapshot, it can return a dict that is added to the completion record.
+            :param debounce: seconds for which the size of a file must not change before it is considered complete.
+            :param poll_interval: seconds between two scans of the directory when inotify is not available.
+            :param use_inotify: if False, always poll the directory.
+            :param log_path: path to a JSON lines file in which to append the completion record of every snapshot.
+            :param ingested: function called with the path of every snapshot without a completion record, returns True if it was already processed (e.g. its date is in the statistics over time).
+            :param retry_interval: seconds after which a snapshot whose processing failed is processed again, if it is not overwritten before.
+        '''
+        self.watch_dir = watch_dir
+        self.on_snapshot = on_snapshot
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.log_path = log_path
+        self.retry_interval = retry_interval
+        self.stop_event = threading.Event()
+        # stop() writes in this pipe to wake up the watcher while it waits for inotify events
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        # Snapshots already done are not processed again, unless they are overwritten (the size and modification time of a snapshot when it was processed)
+        self.seen = self._done_snapshots(ingested)
+        # The other snapshots in the directory, e.g. written while the watcher was down, are processed once complete (inotify would not report them)
+        self.pending = {file_path: None for file_path in self._list_snapshots() if file_path not in self.seen}
+        # Snapshots whose processing failed: their signature and when it failed
+        self.failed = {}
+        self.inotify_fd = self._init_inotify() if use_inotify else None
+
+    def _done_snapshots(self, ingested):
+        '''
+            Return the snapshots of the directory already done, with the signature they had when they were processed.
+        '''
+        done = {}
+        if self.log_path and os.path.isfile(self.log_path):
+            with open(self.log_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    path = os.path.abspath(record.get('snapshot', ''))
+                    # The last record of a snapshot wins, a failed or cancelled run after a done one means that it has to be processed again
+                    if record.get('status') == 'done':
+                        done[path] = tuple(record['signature']) if record.get('signature') else None
+                    else:
+                        done.pop(path, None)
+        seen = {}
+        for file_path in self._list_snapshots():
+            path = os.path.abspath(file_path)
+            if path in done:
+                # The records written without the signature match the snapshot as it is now
+                seen[file_path] = done[path] or self._signature(file_path)
+            elif ingested is not None and ingested(file_path):
+                seen[file_path] = self._signature(file_path)
+        return seen
+
+    def _list_snapshots(self):
+        return [os.path.join(self.watch_dir, filename) for filename in os.listdir(self.watch_dir) if self._is_snapshot(filename)]
+
+    def _signature(self, file_path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _is_snapshot(self, filename):
+        return filename.endswith('.csv') and kghb_schema.snapshot_date(filename) is not None
+
+    def _init_inotify(self):
+        '''
+            Open an inotify descriptor on the watched directory, None if inotify is not available on this system.
+        '''
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, os.fsencode(self.watch_dir), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError, TypeError):
+            return None
+
+    def _read_inotify(self, timeout):
+        '''
+            Wait up to timeout seconds for inotify events and return the names of the files written or moved in the directory.
+        '''
+        ready, _, _ = select.select([self.inotify_fd, self.wakeup_read], [], [], timeout)
+        if self.inotify_fd not in ready:
+            return []
+        try:
+            buffer = os.read(self.inotify_fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            names.append(os.fsdecode(buffer[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    def _wait_for_changes(self):
+        '''
+            Add the new snapshots to the pending ones, waiting for inotify events or for the next polling round.
+        '''
+        timeout = self.debounce if self.pending else self.poll_interval
+        if self.inotify_fd is not None:
+            candidates = [os.path.join(self.watch_dir, name) for name in self._read_inotify(timeout) if self._is_snapshot(name)]
+        else:
+            self.stop_event.wait(min(timeout, self.poll_interval))
+            candidates = self._list_snapshots()
+
+        # The failed snapshots are retried after retry_interval, also when inotify does not report them again
+        now = time.monotonic()
+        candidates += [file_path for file_path, (signature, failed) in self.failed.items() if now - failed >= self.retry_interval and file_path not in candidates]
+        for file_path in candidates:
+            signature = self._signature(file_path)
+            # A snapshot overwritten after being processed is processed again: inotify reports only the written files,
+            # while polling lists all of them, so a listed snapshot is pending only if its size or modification time changed
+            if self.inotify_fd is None and file_path in self.seen and self.seen[file_path] == signature:
+                continue
+            if file_path in self.failed:
+                failed_signature, failed = self.failed[file_path]
+                if failed_signature == signature and now - failed < self.retry_interval:
+                    continue
+                del self.failed[file_path]
+            self.seen.pop(file_path, None)
+            self.pending.setdefault(file_path, None)
+
+    def check(self):
+        '''
+            Return the pending snapshots whose size and modification time did not change for the debounce interval.
+        '''
+        now = time.monotonic()
+        ready = []
+        for file_path, last in list(self.pending.items()):
+            signature = self._signature(file_path)
+            if signature is None:
+                del self.pending[file_path]
+                continue
+            if last is None or last[0] != signature:
+                self.pending[file_path] = (signature, now)
+            elif now - last[1] >= self.debounce:
+                ready.append(file_path)
+                del self.pending[file_path]
+        return sorted(ready)
+
+    def process(self, file_path):
+        '''
+            Call on_snapshot on a complete snapshot and write its completion record.
+            The snapshot is done only if on_snapshot completes (status 'done'), otherwise it is processed again later.
+
+            :param file_path: path to the snapshot.
+        '''
+        # The signature before processing, a snapshot overwritten while it is processed is processed again
+        signature = self._signature(file_path)
+        record = {'snapshot': file_path, 'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'status': 'done', 'signature': signature}
+        start = time.perf_counter()
+        try:
+            record.update(self.on_snapshot(file_path) or {})
+        except Exception as error:
+            record['status'] = 'failed'
+            record['error'] = repr(error)
+        record['elapsed'] = time.perf_counter() - start
+        if record['status'] == 'done':
+            self.seen[file_path] = signature
+        else:
+            # Failed or cancelled, retried later
+            self.failed[file_path] = (signature, time.monotonic())
+
+        print(json.dumps(record))
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(record) + '\n')
+        return record
+
+    def run(self, timeout=None):
+        '''
+            Watch the directory until stop() is called or timeout seconds are elapsed.
+
+            :param timeout: maximum number of seconds to watch, None watches forever.
+        '''
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not self.stop_event.is_set() and (deadline is None or time.monotonic() < deadline):
+                self._wait_for_changes()
+                for file_path in self.check():
+                    if self.stop_event.is_set():
+                        # Not done, the snapshot is found again by the next run
+                        break
+                    self.process(file_path)
+        finally:
+            if self.inotify_fd is not None:
+                os.close(self.inotify_fd)
+                self.inotify_fd = None
+            os.close(self.wakeup_read)
+            os.close(self.wakeup_write)
+
+    def stop(self):
+        '''
+            Ask the watcher, and the stages it is running, to stop.
+        '''
+        self.stop_event.set()
+        try:
+            os.write(self.wakeup_write, b'\0')
+        except OSError:
+            pass
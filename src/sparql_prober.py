@@ -0,0 +1,311 @@
+import asyncio
+import os
+import re
+import ssl
+import time
+from collections import defaultdict
+from datetime import date
+from urllib.parse import quote, urljoin, urlsplit
+
+import numpy as np
+import pandas as pd
+import kghb_schema
+import lodcloud_index
+
+here = os.path.dirname(os.path.abspath(__file__))
+PROBES_PATH = os.path.join(here, '../data/quality_data/sparql_probes')
+
+ASK_QUERY = 'ASK { ?s ?p ?o }'
+SELECT_QUERY = 'SELECT * WHERE { ?s ?p ?o } LIMIT 1'
+ACCEPT = 'application/sparql-results+json, application/sparql-results+xml;q=0.9, */*;q=0.1'
+USER_AGENT = 'LOD-Subclouds-prober/1.0'
+
+# A SPARQL result, not an HTML page or an error message returned with status 200
+ASK_RESULT = re.compile(rb'"boolean"\s*:\s*(true|false)|<boolean>\s*(true|false)\s*</boolean>', re.IGNORECASE)
+SELECT_RESULT = re.compile(rb'"(results|bindings)"\s*:|<results|<sparql', re.IGNORECASE)
+
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+MAX_BODY = 1 << 20
+
+# The Performance dimension is the mean of the latency and the throughput scores (as in KGHeartBeat)
+PERFORMANCE_METRICS = 2
+THROUGHPUT_TARGET = 5
+LATENCY_TARGET_MS = 1000
+
+PROBES_HEADER = ['SPARQL endpoint URL', 'Available', 'Query', 'HTTP status', 'Latency (ms)', 'Throughput (queries/s)',
+                 'Latency score', 'Throughput score', 'Performance score', 'Error']
+
+class HTTPError(Exception):
+    pass
+
+class _Connection:
+    '''
+        Minimal HTTP/1.1 client over asyncio streams, enough to send GET requests to a SPARQL endpoint on a kept-alive connection.
+    '''
+    def __init__(self, url, timeout, ssl_context):
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.reader = None
+        self.writer = None
+        self.origin = None
+        self.set_url(url)
+
+    def set_url(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise HTTPError(f"Not an HTTP URL: {url}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.host_header = parts.netloc.rsplit('@', 1)[-1]
+
+    async def _connect(self):
+        origin = (self.scheme, self.host, self.port)
+        if self.writer is not None and self.origin == origin and not self.reader.at_eof():
+            return
+        self.close()
+        ssl_context = self.ssl_context if self.scheme == 'https' else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=ssl_context, server_hostname=self.host if ssl_context else None, limit=MAX_BODY),
+            self.timeout)
+        self.origin = origin
+
+    async def _read_body(self, status, headers):
+        if status in (204, 304) or status < 200:
+            return b''
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            size = 0
+            while True:
+                chunk_size = int((await self.reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if chunk_size == 0:
+                    # Trailers, up to the empty line
+                    while (await self.reader.readline()).strip():
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await self.reader.readexactly(chunk_size))
+                await self.reader.readexactly(2)
+                size += chunk_size
+                if size > MAX_BODY:
+                    raise HTTPError("Response too large")
+        if 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > MAX_BODY:
+                raise HTTPError("Response too large")
+            return await self.reader.readexactly(length)
+        # Without a length the body ends when the server closes the connection
+        chunks = []
+        size = 0
+        while size <= MAX_BODY:
+            chunk = await self.reader.read(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        self.close()
+        return b''.join(chunks)
+
+    async def _request(self, target, retry=True):
+        reused = self.writer is not None
+        await self._connect()
+        request = (f'GET {target} HTTP/1.1\r\nHost: {self.host_header}\r\nAccept: {ACCEPT}\r\nUser-Agent: {USER_AGENT}\r\n'
+                   f'Connection: keep-alive\r\n\r\n')
+        self.writer.write(request.encode('latin-1'))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            self.close()
+            # A kept-alive connection can be closed by the server while idle, the request is sent again on a new one
+            if reused and retry:
+                return await self._request(target, retry=False)
+            raise HTTPError("Connection closed by the server")
+        parts = status_line.decode('latin-1').split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise HTTPError(f"Invalid status line: {status_line[:80]!r}")
+        status = int(parts[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await self._read_body(status, headers)
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, headers, body
+
+    async def get(self, query):
+        '''
+            Send a query and return the status and the body of the response, following the redirects (the new location is kept for the next queries).
+        '''
+        for redirect in range(MAX_REDIRECTS + 1):
+            target = f"{self.path}{'&' if '?' in self.path else '?'}query={quote(query)}"
+            status, headers, body = await asyncio.wait_for(self._request(target), self.timeout)
+            if status in REDIRECTS and 'location' in headers:
+                self.set_url(urljoin(self.url, headers['location']))
+                continue
+            return status, body
+        raise HTTPError("Too many redirects")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+def _is_result(query, status, body):
+    if not 200 <= status < 300:
+        return False
+    return (ASK_RESULT if query == ASK_QUERY else SELECT_RESULT).search(body) is not None
+
+def latency_score(latency_ms):
+    '''
+        Score of the Low latency metric: 1 up to LATENCY_TARGET_MS, then inversely proportional to the latency.
+    '''
+    if np.isnan(latency_ms):
+        return 0.0
+    return 1.0 if latency_ms <= LATENCY_TARGET_MS else LATENCY_TARGET_MS / latency_ms
+
+def throughput_score(queries_per_second):
+    '''
+        Score of the High throughput metric: the queries answered in a second, up to THROUGHPUT_TARGET.
+    '''
+    if np.isnan(queries_per_second):
+        return 0.0
+    return min(queries_per_second / THROUGHPUT_TARGET, 1.0)
+
+class SparqlProber:
+    def __init__(self, max_concurrency=100, per_host=2, timeout=10.0, deadline=30.0, latency_queries=5, throughput_window=1.0, verify_ssl=True):
+        '''
+            Probes the SPARQL endpoints concurrently with asyncio: an ASK query (or a SELECT with LIMIT 1 if ASK is not supported) checks that the endpoint answers,
+            then the latency is the median of latency_queries queries and the throughput the queries answered in throughput_window seconds on the same connection.
+            The endpoints are probed at most max_concurrency at a time, and at most per_host at a time on the same host, so that no server is hammered.
+
+            :param max_concurrency: maximum number of endpoints probed at the same time.
+            :param per_host: maximum number of endpoints of the same host probed at the same time.
+            :param timeout: seconds after which a connection or a query is failed.
+            :param deadline: maximum seconds spent on a single endpoint.
+            :param latency_queries: number of queries whose median time is the latency.
+            :param throughput_window: seconds in which the answered queries are counted.
+            :param verify_ssl: boolean that if False, the certificates of the https endpoints are not verified.
+        '''
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.deadline = deadline
+        self.latency_queries = latency_queries
+        self.throughput_window = throughput_window
+        self.ssl_context = ssl.create_default_context()
+        if not verify_ssl:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+    async def _measure(self, url, result):
+        connection = _Connection(url, self.timeout, self.ssl_context)
+        try:
+            for query in (ASK_QUERY, SELECT_QUERY):
+                status, body = await connection.get(query)
+                result['HTTP status'] = status
+                if _is_result(query, status, body):
+                    result['Available'] = True
+                    result['Query'] = 'ASK' if query == ASK_QUERY else 'SELECT'
+                    break
+            if not result['Available']:
+                result['Error'] = f'No SPARQL result (HTTP {status})'
+                return
+
+            # The endpoint is available, an error from here on only leaves the measure incomplete
+            try:
+                latencies = []
+                for repetition in range(self.latency_queries):
+                    start = time.perf_counter()
+                    status, body = await connection.get(query)
+                    if _is_result(query, status, body):
+                        latencies.append((time.perf_counter() - start) * 1000)
+                result['Latency (ms)'] = float(np.median(latencies)) if latencies else np.nan
+
+                answered = 0
+                start = time.perf_counter()
+                while time.perf_counter() - start < self.throughput_window:
+                    status, body = await connection.get(query)
+                    answered += _is_result(query, status, body)
+                result['Throughput (queries/s)'] = answered / (time.perf_counter() - start)
+            except (OSError, ValueError, HTTPError, asyncio.IncompleteReadError) as e:
+                result['Error'] = f'{type(e).__name__}: {e}'
+        finally:
+            connection.close()
+
+    async def probe(self, url, global_limit, host_limits):
+        '''
+            Probe a single endpoint, returns a dict with the columns of PROBES_HEADER.
+        '''
+        result = {column: np.nan for column in PROBES_HEADER}
+        result.update({'SPARQL endpoint URL': url, 'Available': False, 'Query': '', 'Error': ''})
+        try:
+            host = urlsplit(url).hostname
+            # The host slot is taken first, the probes waiting for a busy host do not hold the global slots needed by the other hosts
+            async with host_limits[host], global_limit:
+                await asyncio.wait_for(self._measure(url, result), self.deadline)
+        except asyncio.TimeoutError:
+            result['Error'] = 'Timeout'
+        except (OSError, ValueError, HTTPError, asyncio.IncompleteReadError, ssl.SSLError) as e:
+            result['Error'] = f'{type(e).__name__}: {e}'
+
+        result['Latency score'] = latency_score(result['Latency (ms)']) if result['Available'] else 0.0
+        result['Throughput score'] = throughput_score(result['Throughput (queries/s)']) if result['Available'] else 0.0
+        result['Performance score'] = (result['Latency score'] + result['Throughput score']) / PERFORMANCE_METRICS
+        return result
+
+    async def sweep(self, urls):
+        '''
+            Probe all the endpoints concurrently and return a DataFrame with one row for every endpoint, in the order of the urls.
+
+            :param urls: list of the SPARQL endpoint urls, the duplicates are probed once.
+        '''
+        global_limit = asyncio.Semaphore(self.max_concurrency)
+        host_limits = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        urls = list(dict.fromkeys(urls))
+        results = await asyncio.gather(*(self.probe(url, global_limit, host_limits) for url in urls))
+        return pd.DataFrame(results, columns=PROBES_HEADER)
+
+    def run(self, urls):
+        '''
+            Run sweep in a new event loop (use sweep directly from a running loop).
+        '''
+        return asyncio.run(self.sweep(urls))
+
+def endpoint_urls(snapshot_path=None, lodcloud_path=lodcloud_index.LODCLOUD_PATH):
+    '''
+        Return the SPARQL endpoints to probe: the SPARQL endpoint URL column of a snapshot and the sparql entries of the LOD Cloud dump, without duplicates.
+
+        :param snapshot_path: path to a KGHeartBeat snapshot, None uses only the LOD Cloud dump.
+        :param lodcloud_path: path to the LOD Cloud JSON dump, None uses only the snapshot.
+    '''
+    urls = []
+    if snapshot_path is not None:
+        urls += kghb_schema.read_snapshot(snapshot_path, usecols=['SPARQL endpoint URL'], raw=True)['SPARQL endpoint URL'].dropna().str.strip().tolist()
+    if lodcloud_path is not None:
+        index = lodcloud_index.get_index(lodcloud_path)
+        urls += [url.strip() for identifier in index.identifiers() for url in index.get(identifier)['sparql'] if isinstance(url, str)]
+    return list(dict.fromkeys(url for url in urls if url.startswith(('http://', 'https://'))))
+
+def by_url(probes):
+    '''
+        Return the probes as a dict url -> row, used to look up the endpoint of every KG.
+
+        :param probes: DataFrame returned by SparqlProber.sweep (or read from a saved csv).
+    '''
+    return {row['SPARQL endpoint URL']: row for row in probes.to_dict('records')}
+
+def save(probes, probe_date=None, probes_path=PROBES_PATH):
+    '''
+        Write the probes in a csv named after the date of the sweep, and return its path.
+    '''
+    os.makedirs(probes_path, exist_ok=True)
+    save_path = os.path.join(probes_path, f'{probe_date or date.today().isoformat()}.csv')
+    probes.to_csv(save_path, index=False)
+    return save_path
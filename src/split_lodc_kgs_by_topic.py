@@ -1,10 +1,17 @@
 from lxml import etree
-import requests
 from io import BytesIO
 from urllib.parse import urlparse
 import json
 import os
 import pandas as pd
+import numpy as np
+import kghb_schema
+import kg_id_dictionary
+import snapshot_archive
+import http_client
+
+here = os.path.dirname(os.path.abspath(__file__))
+QUALITY_DATA_PATH = os.path.join(here, '../data/quality_data/only_from_LODC')
 
 namespaces = {
     'svg': 'http://www.w3.org/2000/svg',
@@ -23,7 +30,7 @@ class SplitLODCKGsByTopic:
         '''
         kgs_by_topic = {}
         for link in self.svg_links:
-            response = requests.get(link)
+            response = http_client.get(link)
             svg_content = response.content
 
             svg_content = svg_content.decode("utf-8")
@@ -53,46 +60,49 @@ class SplitLODCKGsByTopic:
         '''
             Extract the KGs from LODCloud and split it by topic in different folder.
 
-            :param dir_path: path to csv where to get the KGs to split by topic.
+            :param dir_path: path to the folder (or to the zip, tar, gzip or zstd archive) with the csv where to get the KGs to split by topic.
         '''
         self.recover_lodc_kgs_by_topic()
-        with open('../data/kgs_by_topic.json', "r", encoding="utf-8") as file:
-            kgs_by_topic_dict = json.load(file)
+        kg_ids = kg_id_dictionary.get_dictionary()
+        kg_ids.refresh_membership()
+
+        # Every file is read and encoded once, the topic membership is a bitset lookup on the KG codes.
+        # The next snapshots are read (and decompressed) while the current one is split.
+        read_raw = lambda file_path: kghb_schema.read_snapshot(file_path, raw=True)
+        for file_path, df in snapshot_archive.prefetch_snapshots(read_raw, snapshot_archive.list_snapshots(dir_path)):
+            self.split_snapshot(file_path, df)
 
-        for topic in kgs_by_topic_dict:
-            kgs_in_the_topic = kgs_by_topic_dict[topic]
-            kgs_in_the_topic = [url.split("/")[-1] for url in kgs_in_the_topic]
+        kg_ids.save()
 
-            for filename in os.listdir(dir_path):
-                if '.csv' in filename:
-                    file_path = os.path.join(dir_path, filename)
-                    df = pd.read_csv(file_path)
+    def split_snapshot(self,file_path,df=None,quality_data_path=QUALITY_DATA_PATH):
+        '''
+            Split a single csv by topic, writing a copy of it in the folder of every topic.
+
+            :param file_path: path to the csv to split.
+            :param df: content of the csv already loaded with kghb_schema.read_snapshot(file_path, raw=True), if None it is read here.
+            :param quality_data_path: path to the folder with the quality data split by topic (one subfolder for every topic).
+        '''
+        kg_ids = kg_id_dictionary.get_dictionary()
+        filename = os.path.basename(file_path)
+        if df is None:
+            df = kghb_schema.read_snapshot(file_path, raw=True)
 
-                    identifiers_in_csv = set(df['KG id'].unique())
-                    missing_identifiers = set(kgs_in_the_topic) - identifiers_in_csv
+        codes = kg_ids.encode(df['KG id'])
+        df['KG id'] = kg_ids.index[codes]
 
-                    print(f"File: {file_path} filtered")
-                    print(f"For topic: {topic} {len(missing_identifiers)} KGs not analyzed by KGHB")
+        for topic in kg_ids.topics:
+            in_topic = kg_ids.topic_mask(codes, topic)
+            missing_identifiers = kg_ids.topic_size(topic) - np.unique(codes[in_topic]).size
 
-                    df['KG id'] = df['KG id'].astype(str).str.strip()
-                    df_filtered = df[df['KG id'].isin(kgs_in_the_topic)]
+            print(f"File: {file_path} filtered")
+            print(f"For topic: {topic} {missing_identifiers} KGs not analyzed by KGHB")
 
-                    df_filtered.to_csv(f"../data/quality_data/only_from_LODC/{topic}/{filename}",index=False)
+            os.makedirs(os.path.join(quality_data_path, topic), exist_ok=True)
+            df[in_topic].to_csv(os.path.join(quality_data_path, topic, filename),index=False)
 
         # Create a CSVs with only yhe KGs without a domain
-        all_kgs_without_domain = []
-        for urls in kgs_by_topic_dict.values():
-            all_kgs_without_domain.extend(urls)
-        all_kgs_without_domain = [url.split("/")[-1] for url in all_kgs_without_domain]
-        for filename in os.listdir(dir_path):
-                if '.csv' in filename:
-                    file_path = os.path.join(dir_path, filename)
-                    df = pd.read_csv(file_path)
-
-                    df['KG id'] = df['KG id'].astype(str).str.strip()
-                    df_filtered = df[~df['KG id'].isin(all_kgs_without_domain)]
-
-                    df_filtered.to_csv(f"../data/quality_data/only_from_LODC/no-domain/{filename}",index=False)
+        os.makedirs(os.path.join(quality_data_path, 'no-domain'), exist_ok=True)
+        df[kg_ids.topic_mask(codes, 'no-domain')].to_csv(os.path.join(quality_data_path, 'no-domain', filename),index=False)
 
 
 with open('../data/kgs_by_topic.json', "r", encoding="utf-8") as file:
@@ -0,0 +1,93 @@
+import numpy as np
+
+STATS = ['Min', 'Q1', 'Median', 'Q3', 'Max', 'Mean']
+
+def _take(sorted_values, rows):
+    return np.take_along_axis(sorted_values, rows[None, :], axis=0)[0]
+
+def _quantile(sorted_values, counts, last, q):
+    '''
+        Linear interpolation between the closest ranks, with the same operations of numpy.quantile (the one used by pandas), so that the values are the same to the last digit.
+    '''
+    position = counts * q + (1 - q) - 1
+    lower = np.floor(position)
+    gamma = position - lower
+    lower_rows = np.clip(lower.astype(np.intp), 0, last)
+    upper_rows = np.minimum(lower_rows + 1, last)
+    below = _take(sorted_values, lower_rows)
+    above = _take(sorted_values, upper_rows)
+    difference = above - below
+    return np.where(gamma >= 0.5, above - difference * (1 - gamma), below + difference * gamma)
+
+def compute(values):
+    '''
+        Calculate the min, q1, median, q3, max and mean of every column of a (rows x metrics) array, ignoring the NaN, with a single sort of the array.
+        The values are the ones returned by the pandas methods (min, quantile(0.25), median, quantile(0.75), max, mean) on every column.
+        Returns a (metrics x 6) array with the statistics in the order of STATS, NaN for the columns without values.
+
+        :param values: 2-D array (rows x metrics) or 1-D array with the values of a single metric.
+    '''
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    stats = np.full((values.shape[1], len(STATS)), np.nan)
+    if values.shape[0] == 0:
+        return stats
+
+    # The NaN are sorted after the values, the first counts rows of every column are its values in order
+    sorted_values = np.sort(values, axis=0)
+    counts = np.count_nonzero(~np.isnan(values), axis=0)
+    last = np.maximum(counts - 1, 0)
+    stats[:, 0] = sorted_values[0]
+    stats[:, 1] = _quantile(sorted_values, counts, last, 0.25)
+    # The median is the mean of the two middle values (as pandas calculates it), not the interpolation of numpy.quantile
+    stats[:, 2] = (_take(sorted_values, last // 2) + _take(sorted_values, np.minimum(counts // 2, last))) / 2
+    stats[:, 3] = _quantile(sorted_values, counts, last, 0.75)
+    stats[:, 4] = _take(sorted_values, last)
+    # Every column is summed on its own (pairwise summation), as pandas sums a Series
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats[:, 5] = np.nansum(np.asfortranarray(values), axis=0) / counts
+    stats[counts == 0] = np.nan
+    return stats
+
+def compute_grouped(values, codes, n_groups=None):
+    '''
+        Calculate the statistics of compute for every group of values (e.g. the values of a metric for every topic and analysis date).
+        The groups are laid out as the columns of a single array padded with NaN, so that all of them are computed at once.
+        Returns a (groups x 6) array.
+
+        :param values: 1-D array with the values.
+        :param codes: 1-D array with the group (from 0 to n_groups - 1) of every value.
+        :param n_groups: number of groups, by default the highest code + 1.
+    '''
+    values = np.asarray(values, dtype=float)
+    codes = np.asarray(codes, dtype=np.intp)
+    if n_groups is None:
+        n_groups = int(codes.max()) + 1 if len(codes) else 0
+    sizes = np.bincount(codes, minlength=n_groups)
+    order = np.argsort(codes, kind='stable')
+    starts = np.cumsum(sizes) - sizes
+    positions = np.arange(len(codes)) - np.repeat(starts, sizes)
+
+    matrix = np.full((int(sizes.max()) if n_groups else 0, n_groups), np.nan, order='F')
+    matrix[positions, codes[order]] = values[order]
+    stats = compute(matrix)
+    # The padding changes the order of the pairwise summation, so every group is summed on its own values, as pandas sums it
+    counts = np.bincount(codes, weights=~np.isnan(values), minlength=n_groups)
+    sums = np.array([np.nansum(group) for group in np.split(values[order], starts[1:])[:n_groups]])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stats[:, 5] = np.where(counts > 0, sums / counts, np.nan)
+    return stats
+
+def to_row(stats, integer=False):
+    '''
+        Return the statistics of a metric as a list of python numbers, ready to be written.
+
+        :param stats: row of the array returned by compute.
+        :param integer: boolean that if True, the min and the max are integers (as pandas returns them for a column of integers).
+    '''
+    row = stats.tolist()
+    if integer and not np.isnan(stats[0]):
+        row[0] = int(row[0])
+        row[4] = int(row[4])
+    return row
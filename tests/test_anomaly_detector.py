@@ -0,0 +1,107 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import kg_id_dictionary
+from anomaly_detector import ALERTS_HEADER, AnomalyDetector
+
+METRICS = ['Availability score', 'Licensing score']
+DATES = ['2024-06-02', '2024-06-09', '2024-06-16', '2024-06-23', '2024-06-30']
+# A steady KG that collapses, a constant KG that drops (the deviation is bounded below by min_std), and a KG with too short a history
+AVAILABILITY = {
+    'steady': [0.8, 0.84, 0.76, 0.8, 0.0],
+    'constant': [1.0, 1.0, 1.0, 1.0, 0.8],
+    'new': [None, None, None, 1.0, 0.0],
+}
+
+@pytest.fixture
+def dictionary(tmp_path, monkeypatch):
+    # An empty dictionary, so that the test does not build it from the LOD Cloud dump
+    dictionary_path = tmp_path / 'kg_id_dictionary.json'
+    with open(dictionary_path, 'w', encoding='utf-8') as file:
+        json.dump({'topics': [], 'ids': [], 'in_lodc': [], 'topic_bits': []}, file)
+    kg_ids = kg_id_dictionary.KGIdDictionary(str(dictionary_path))
+    monkeypatch.setattr(kg_id_dictionary, '_dictionary', kg_ids)
+    return kg_ids
+
+def write_snapshots(folder, availability):
+    # One snapshot a week with the given Availability score of every KG (None is a missing value), the Licensing score never changes
+    paths = []
+    for index, analysis_date in enumerate(DATES[:len(next(iter(availability.values())))]):
+        path = os.path.join(folder, f'{analysis_date}.csv')
+        pd.DataFrame({
+            'KG id': list(availability),
+            'Availability score': [values[index] if values[index] is not None else '-' for values in availability.values()],
+            'Licensing score': [1.0] * len(availability),
+        }).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def ewma(values, alpha):
+    # Exponentially weighted mean and variance, updated one value at a time
+    mean, var = values[0], 0.0
+    for value in values[1:]:
+        difference = value - mean
+        increment = alpha * difference
+        mean += increment
+        var = (1 - alpha) * (var + difference * increment)
+    return mean, var
+
+def make_detector(tmp_path):
+    return AnomalyDetector(METRICS, state_path=str(tmp_path / 'state.npz'), alerts_path=str(tmp_path / 'alerts.csv'),
+                           alpha=0.3, threshold=3.0, min_std=0.05, min_observations=3)
+
+def read_alerts(tmp_path):
+    with open(tmp_path / 'alerts.csv', newline='') as file:
+        return list(csv.reader(file))
+
+def test_collapse_is_flagged_once(tmp_path, dictionary):
+    paths = write_snapshots(str(tmp_path), AVAILABILITY)
+    detector = make_detector(tmp_path)
+    for path in paths[:-1]:
+        assert detector.update(path) == []
+
+    # EWMA state before the collapse
+    code = dictionary.index.get_loc('steady')
+    mean, var = ewma(AVAILABILITY['steady'][:-1], 0.3)
+    assert detector.mean[code, 0] == pytest.approx(mean) and detector.var[code, 0] == pytest.approx(var)
+    assert detector.count[code].tolist() == [4, 4] and detector.last[code, 0] == 0.8
+    new = dictionary.index.get_loc('new')
+    assert detector.count[new].tolist() == [1, 4] and detector.mean[new, 0] == 1.0
+
+    alerts = detector.update(paths[-1])
+    z_score = (0.0 - mean) / max(np.sqrt(var), 0.05)
+    assert z_score < -6
+    # The most severe first; the new KG has fewer than min_observations values and is not flagged
+    assert alerts == [
+        [DATES[-1], 'steady', 'Availability score', 0.8, 0.0, pytest.approx(mean), pytest.approx(z_score), 'critical'],
+        [DATES[-1], 'constant', 'Availability score', 1.0, 0.8, 1.0, pytest.approx(-4.0), 'warning'],
+    ]
+    assert read_alerts(tmp_path)[0] == ALERTS_HEADER and len(read_alerts(tmp_path)) == 3
+
+    # The same date again, from the same detector or from the persisted state, is a no-op
+    state = (detector.mean.copy(), detector.var.copy(), detector.count.copy())
+    assert detector.update(paths[-1]) == []
+    assert make_detector(tmp_path).update(paths[-1]) == []
+    assert make_detector(tmp_path).update(paths[0]) == []
+    for before, after in zip(state, (detector.mean, detector.var, detector.count)):
+        np.testing.assert_array_equal(before, after)
+    assert len(read_alerts(tmp_path)) == 3
+
+def test_small_drop_of_a_constant_kg_is_not_flagged(tmp_path, dictionary):
+    # A drop of 0.1 is 2 deviations with min_std, below the threshold
+    paths = write_snapshots(str(tmp_path), {'constant': [1.0, 1.0, 1.0, 1.0, 0.9]})
+    assert make_detector(tmp_path).replay(paths) == []
+    assert not os.path.isfile(tmp_path / 'alerts.csv')
+
+def test_severity_of_a_drop_to_zero_is_critical(tmp_path, dictionary):
+    # A drop to 0 is critical even when it is less than twice the threshold below the mean
+    detector = AnomalyDetector(METRICS, state_path=str(tmp_path / 'state.npz'), alerts_path=str(tmp_path / 'alerts.csv'),
+                               threshold=3.0, min_std=0.1, min_observations=2)
+    paths = write_snapshots(str(tmp_path), {'kg': [0.45, 0.45, 0.0]})
+    alerts = detector.replay(paths)
+    assert [(alert[6], alert[7]) for alert in alerts] == [(pytest.approx(-4.5), 'critical')]
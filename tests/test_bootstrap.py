@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from bootstrap import bootstrap_ci
+
+def naive_bootstrap_ci(values, n_resamples, confidence, seed, batch_size):
+    # One resample at a time with the same uniform numbers as bootstrap_ci: draw the indexes, then take the median and the mean
+    batches = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+    uniforms = np.concatenate([np.random.default_rng(batch_seed).random((size, values.shape[0]))
+                               for batch_seed, size in zip(np.random.SeedSequence(seed).spawn(len(batches)), batches)])
+    alpha = (1 - confidence) / 2
+    intervals = {'Median': np.full((2, values.shape[1]), np.nan), 'Mean': np.full((2, values.shape[1]), np.nan)}
+    for metric in range(values.shape[1]):
+        column = values[:, metric][~np.isnan(values[:, metric])]
+        if len(column) == 0:
+            continue
+        medians, means = [], []
+        for resample in uniforms:
+            sample = column[(resample[:len(column)] * len(column)).astype(int)]
+            medians.append(np.median(sample))
+            means.append(sample.mean())
+        intervals['Median'][:, metric] = np.quantile(medians, [alpha, 1 - alpha])
+        intervals['Mean'][:, metric] = np.quantile(means, [alpha, 1 - alpha])
+    return intervals
+
+def sample_values():
+    rng = np.random.default_rng(0)
+    values = rng.random((31, 5))
+    # Ties, as in the scores of the KGs
+    values[:, 1] = np.round(values[:, 1], 1)
+    # Metrics with different missing values, an even number of values and no values at all
+    values[[2, 7, 11], 2] = np.nan
+    values[[2, 7, 11, 20], 3] = np.nan
+    values[:, 4] = np.nan
+    return values
+
+def test_matches_a_naive_resample_loop():
+    values = sample_values()
+    intervals = bootstrap_ci(values, n_resamples=1200, seed=7, batch_size=500)
+    expected = naive_bootstrap_ci(values, 1200, 0.95, 7, 500)
+    for statistic in ('Median', 'Mean'):
+        assert intervals[statistic].shape == (2, values.shape[1])
+        np.testing.assert_allclose(intervals[statistic], expected[statistic], rtol=1e-12)
+        assert np.isnan(intervals[statistic][:, 4]).all()
+
+def test_same_result_with_more_jobs():
+    values = sample_values()
+    single = bootstrap_ci(values, n_resamples=2000, seed=3, n_jobs=1, batch_size=300)
+    parallel = bootstrap_ci(values, n_resamples=2000, seed=3, n_jobs=4, batch_size=300)
+    for statistic in ('Median', 'Mean'):
+        np.testing.assert_array_equal(single[statistic], parallel[statistic])
+
+@pytest.mark.parametrize('statistic', ['Median', 'Mean'])
+def test_coverage_of_the_intervals(statistic):
+    # Every column is an independent sample of a standard normal, whose median and mean are 0
+    values = np.random.default_rng(1).standard_normal((60, 400))
+    low, high = bootstrap_ci(values, n_resamples=2000, confidence=0.9, seed=5)[statistic]
+    assert (low < high).all()
+    coverage = ((low <= 0) & (0 <= high)).mean()
+    # Percentile intervals are slightly narrow with 60 values, a 0.9 interval should still cover the true value about 9 times out of 10
+    assert 0.84 <= coverage <= 0.95
@@ -0,0 +1,66 @@
+import json
+
+import pandas as pd
+import pytest
+
+import kg_id_dictionary
+import kghb_schema
+from delta_store import DeltaStore
+
+@pytest.fixture(autouse=True)
+def dictionary(tmp_path, monkeypatch):
+    # An empty dictionary, so that the test does not build it from the LOD Cloud dump
+    dictionary_path = tmp_path / 'kg_id_dictionary.json'
+    with open(dictionary_path, 'w', encoding='utf-8') as file:
+        json.dump({'topics': [], 'ids': [], 'in_lodc': [], 'topic_bits': []}, file)
+    monkeypatch.setattr(kg_id_dictionary, '_dictionary', kg_id_dictionary.KGIdDictionary(str(dictionary_path)))
+
+# Every snapshot as written by KGHeartBeat: sentinels, empty cells, a KG that disappears and comes back, a new KG, a changed row order,
+# a column added, and a snapshot with a KG analyzed twice (stored whole)
+SNAPSHOTS = {
+    '2024-06-02': 'KG id,Sparql endpoint,Availability score,License\na,Available,1.0,CC-BY\nb,offline,-,\nc,Available,0.50,"MIT, or ""GPL"""\n',
+    '2024-06-09': 'KG id,Sparql endpoint,Availability score,License\na,Available,1.0,CC-BY\nc,Available,0.5,"MIT, or ""GPL"""\nd,-,0,absent\n',
+    '2024-06-16': 'KG id,Sparql endpoint,Availability score,License\nd,Available,0.25,absent\nb,offline,-,\na,Available,1.0,CC0\nc,offline,0.5,MIT\n',
+    '2024-06-23': 'KG id,Sparql endpoint,Availability score,License\nd,Available,0.25,absent\nd,offline,0,absent\na,Available,1.0,CC0\n',
+    '2024-06-30': 'KG id,Sparql endpoint,Availability score,License,Security score\nd,Available,0.25,absent,1\na,Available,0.75,CC0,-\n',
+    '2024-07-07': 'KG id,Sparql endpoint,Availability score,License,Security score\nd,Available,0.25,absent,1\na,Available,0.75,CC0,0\ne,,,,\n',
+}
+
+def write_snapshots(folder):
+    folder.mkdir()
+    paths = {}
+    for analysis_date, content in SNAPSHOTS.items():
+        paths[analysis_date] = str(folder / f'{analysis_date}.csv')
+        with open(paths[analysis_date], 'w', encoding='utf-8', newline='') as file:
+            file.write(content)
+    return paths
+
+@pytest.mark.parametrize('keyframe_interval', [1, 3, 8])
+def test_reconstruct_is_the_raw_snapshot(tmp_path, keyframe_interval):
+    paths = write_snapshots(tmp_path / 'snapshots')
+    store = DeltaStore(str(tmp_path / 'store'), keyframe_interval=keyframe_interval)
+    store.build(str(tmp_path / 'snapshots'))
+    assert store.dates() == list(SNAPSHOTS)
+
+    # Reopened from the manifest, in reverse order so that every date is reconstructed from its keyframe
+    reopened = DeltaStore(str(tmp_path / 'store'))
+    for analysis_date in reversed(list(SNAPSHOTS)):
+        pd.testing.assert_frame_equal(reopened.reconstruct(analysis_date), kghb_schema.read_snapshot(paths[analysis_date], raw=True))
+
+    report = reopened.compression_report()
+    assert report['Snapshots'] == len(SNAPSHOTS) and report['Raw csv bytes'] == sum(len(content) for content in SNAPSHOTS.values())
+
+def test_snapshots_are_appended_in_order(tmp_path):
+    paths = write_snapshots(tmp_path / 'snapshots')
+    store = DeltaStore(str(tmp_path / 'store'))
+    for analysis_date in list(SNAPSHOTS)[:3]:
+        store.add(paths[analysis_date])
+    with pytest.raises(ValueError):
+        store.add(paths['2024-06-09'])
+
+    # Appended by a new process, the previous state is reconstructed from the store
+    reopened = DeltaStore(str(tmp_path / 'store'))
+    reopened.add(paths['2024-06-23'])
+    pd.testing.assert_frame_equal(DeltaStore(str(tmp_path / 'store')).reconstruct('2024-06-23'), kghb_schema.read_snapshot(paths['2024-06-23'], raw=True))
+    with pytest.raises(KeyError):
+        reopened.reconstruct('2024-06-30')
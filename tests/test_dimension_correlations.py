@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import kg_id_dictionary
+from dimension_correlations import DimensionCorrelations, correlation, merge_moments, pairwise_moments, pairwise_rank_moments
+
+DIMENSIONS = ['Availability score', 'Licensing score', 'Accuracy score', 'Security score']
+
+def sample_frame(seed, rows=40):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((rows, len(DIMENSIONS))), columns=DIMENSIONS)
+    df['Licensing score'] = (df['Availability score'] + rng.normal(0, 0.2, rows)).round(1)
+    # Ties, and columns with different missing rows
+    df['Security score'] = rng.integers(0, 3, rows) / 2
+    df.loc[rng.choice(rows, 6, replace=False), 'Accuracy score'] = np.nan
+    df.loc[rng.choice(rows, 9, replace=False), 'Security score'] = np.nan
+    return df
+
+def pooled_spearman(frames):
+    # Pearson correlation of the ranks taken within each frame, over the rows complete for each pair
+    result = np.full((len(DIMENSIONS), len(DIMENSIONS)), np.nan)
+    for i, first in enumerate(DIMENSIONS):
+        for j, second in enumerate(DIMENSIONS):
+            ranks = pd.concat([frame[[first, second]].dropna().rank() for frame in frames], ignore_index=True)
+            result[i, j] = np.corrcoef(ranks.to_numpy().T)[0, 1]
+    return result
+
+@pytest.mark.parametrize('method', ['pearson', 'spearman'])
+def test_matches_pandas_corr(method):
+    df = sample_frame(0)
+    moments = pairwise_moments if method == 'pearson' else pairwise_rank_moments
+    n, mean, m2, comoment = moments(df.to_numpy())
+    np.testing.assert_allclose(correlation(m2, comoment), df.corr(method).to_numpy(), rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(n, df.notna().astype(int).T.dot(df.notna().astype(int)).to_numpy())
+
+def test_merged_moments_match_pandas_corr_of_all_the_rows():
+    first, second = sample_frame(1), sample_frame(2, rows=25)
+    merged = merge_moments(pairwise_moments(first.to_numpy()), pairwise_moments(second.to_numpy()))
+    expected = pd.concat([first, second], ignore_index=True).corr()
+    np.testing.assert_allclose(correlation(merged[2], merged[3]), expected.to_numpy(), rtol=1e-12, atol=1e-12)
+
+def test_constant_column_and_too_few_rows_are_nan():
+    df = pd.DataFrame({'a': [1.0, 2.0, 3.0], 'b': [1.0, 1.0, 1.0], 'c': [np.nan, np.nan, 4.0]})
+    n, mean, m2, comoment = pairwise_moments(df.to_numpy())
+    corr = correlation(m2, comoment)
+    np.testing.assert_array_equal(np.isnan(corr), np.isnan(df.corr().to_numpy()))
+
+def test_snapshots_and_pooled_matrices(tmp_path, monkeypatch):
+    # An empty dictionary, every KG is in no-domain
+    dictionary_path = tmp_path / 'kg_id_dictionary.json'
+    with open(dictionary_path, 'w', encoding='utf-8') as file:
+        json.dump({'topics': [], 'ids': [], 'in_lodc': [], 'topic_bits': []}, file)
+    monkeypatch.setattr(kg_id_dictionary, '_dictionary', kg_id_dictionary.KGIdDictionary(str(dictionary_path)))
+
+    frames, paths = [], []
+    for seed, analysis_date in enumerate(['2024-06-02', '2024-06-09', '2024-06-16']):
+        df = sample_frame(seed + 10, rows=30 + seed)
+        df.insert(0, 'KG id', [f'kg-{row}' for row in range(len(df))])
+        df.insert(1, 'Sparql endpoint', ['Available'] * (len(df) - 4) + ['offline'] * 4)
+        path = tmp_path / f'{analysis_date}.csv'
+        df.to_csv(path, index=False, na_rep='-')
+        paths.append(str(path))
+        frames.append(df[df['Sparql endpoint'] == 'Available'][DIMENSIONS])
+
+    correlations = DimensionCorrelations(DIMENSIONS, topics=['no-domain'], state_path=str(tmp_path / 'state.npz'))
+    # Out of order, the snapshots are kept sorted by date
+    correlations.replay([paths[2], paths[0], paths[1]])
+    for position, frame in enumerate(frames):
+        for method in ('pearson', 'spearman'):
+            np.testing.assert_allclose(correlations.correlations(method)[0, position], frame.corr(method).to_numpy(), rtol=1e-10, atol=1e-12)
+
+    # Reloaded from the persisted statistics
+    reloaded = DimensionCorrelations(DIMENSIONS, topics=['no-domain'], state_path=str(tmp_path / 'state.npz'))
+    np.testing.assert_allclose(reloaded.pooled()[0], pd.concat(frames, ignore_index=True).corr().to_numpy(), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(reloaded.pooled(method='spearman')[0], pooled_spearman(frames), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(reloaded.pooled(start='2024-06-09', end='2024-06-09')[0], frames[1].corr().to_numpy(), rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(reloaded.pooled(start='2024-06-09')[0], pd.concat(frames[1:], ignore_index=True).corr().to_numpy(), rtol=1e-10, atol=1e-12)
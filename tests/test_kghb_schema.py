@@ -0,0 +1,48 @@
+import pandas as pd
+import kghb_schema
+
+def write_snapshot(tmp_path, rows, filename='2024-08-25.csv'):
+    file_path = tmp_path / filename
+    pd.DataFrame(rows).to_csv(file_path, index=False)
+    return str(file_path)
+
+def test_count_with_thousands_separator_does_not_abort_the_load(tmp_path):
+    file_path = write_snapshot(tmp_path, {
+        'Number of triples (query)': ['1,234', '7', '-', '12.5', 'many'],
+        'Availability score': ['0,5', '1', '-', '0.25', '0'],
+    })
+    df = kghb_schema.read_snapshot(file_path)
+
+    assert str(df['Number of triples (query)'].dtype) == 'Int64'
+    assert df['Number of triples (query)'].tolist()[:2] == [1234, 7]
+    # Sentinels, non-integral and non-numeric values become null
+    assert df['Number of triples (query)'].isna().tolist() == [False, False, True, True, True]
+    assert df['Availability score'].tolist()[:2] == [0.5, 1.0]
+    assert df['Availability score'].isna().tolist() == [False, False, True, False, False]
+
+def test_flag_with_non_integral_value_becomes_null(tmp_path):
+    file_path = write_snapshot(tmp_path, {'Availability of RDF dump (metadata)': ['True', 'False', '1', '0.5', '-']})
+    df = kghb_schema.read_snapshot(file_path)
+
+    assert str(df['Availability of RDF dump (metadata)'].dtype) == 'Int8'
+    assert df['Availability of RDF dump (metadata)'].tolist()[:3] == [1, 0, 1]
+    assert df['Availability of RDF dump (metadata)'].isna().tolist() == [False, False, False, True, True]
+
+def test_typed_counts_are_unchanged(tmp_path):
+    file_path = write_snapshot(tmp_path, {'Number of triples (query)': ['10', '-', '3'], 'Availability score': ['0.5', '1', '-']})
+    df = kghb_schema.read_snapshot(file_path)
+
+    assert df['Number of triples (query)'].tolist()[0] == 10 and df['Number of triples (query)'].isna().tolist() == [False, True, False]
+
+def test_read_snapshot_does_not_need_the_kg_id_dictionary(tmp_path, monkeypatch):
+    import kg_id_dictionary
+
+    def no_dictionary(*args, **kwargs):
+        raise AssertionError('the KG id dictionary should not be built to read a snapshot')
+    # As on a fresh checkout, where the dictionary would be built from the LOD Cloud dump
+    monkeypatch.setattr(kg_id_dictionary, '_dictionary', None)
+    monkeypatch.setattr(kg_id_dictionary, 'KGIdDictionary', no_dictionary)
+    file_path = write_snapshot(tmp_path, {'KG id': [' dbpedia ', 'wikidata'], 'Availability score': ['1', '-']})
+    df = kghb_schema.read_snapshot(file_path)
+
+    assert df['KG id'].tolist() == ['dbpedia', 'wikidata']
@@ -0,0 +1,58 @@
+import ast
+import random
+import warnings
+import numpy as np
+import pandas as pd
+from list_metrics_over_time import explode_list_column
+
+def literal_eval_reference(series):
+    '''
+        Elements and lengths of the lists as the previous parsing obtained them, with ast.literal_eval on every value.
+    '''
+    elements = []
+    index = []
+    lengths = pd.Series(np.nan, index=series.index)
+    for row, value in series.items():
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                parsed = ast.literal_eval(str(value).strip())
+        except Exception:
+            continue
+        if isinstance(parsed, list):
+            lengths[row] = len(parsed)
+            elements += [str(element) for element in parsed]
+            index += [row] * len(parsed)
+    return pd.Series(elements, index=index, dtype=object), lengths
+
+def assert_same_as_literal_eval(values):
+    series = pd.Series(values)
+    elements, lengths = explode_list_column(series)
+    expected_elements, expected_lengths = literal_eval_reference(series)
+    assert elements.tolist() == expected_elements.tolist()
+    assert elements.index.tolist() == expected_elements.index.tolist()
+    pd.testing.assert_series_equal(lengths, expected_lengths, check_names=False)
+
+def test_simple_lists():
+    assert_same_as_literal_eval(["['text/turtle', 'application/rdf+xml']", '["en", "it"]', '[]', "['a',]", None, '-', 'absent'])
+
+def test_escaped_strings():
+    assert_same_as_literal_eval([r"['a\'b', 'c']", r'["say \"hi\"", "x"]', r"['back\\slash']", r"['tab\there', 'new\nline']", r"['è']"])
+
+def test_bare_and_mixed_values():
+    assert_same_as_literal_eval(['[1, 2, 3]', "[1.50, 'a', True, None]", "[['nested'], 'b']", '[-3]'])
+
+def test_malformed_lists():
+    assert_same_as_literal_eval(["['unclosed, 'b']", '[a b]', "['a' 'b']", "[text/turtle]", "['a',,'b']", '[', ']', "['x'] extra", "('a', 'b')"])
+
+def test_random_lists():
+    rng = random.Random(42)
+    alphabet = ['a', 'b', ' ', ',', "'", '"', '\\', 'n', '/', '[', ']', 'è']
+    values = []
+    for _ in range(2000):
+        elements = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6))) for _ in range(rng.randint(0, 4))]
+        if rng.random() < 0.5:
+            values.append(repr(elements))
+        else:
+            values.append('[' + ', '.join(f"'{element}'" for element in elements) + ']')
+    assert_same_as_literal_eval(values)
@@ -0,0 +1,67 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from results_store import ResultsStore
+
+HEADER = ['Analysis date', 'Min', 'Max']
+PATH = 'evaluation_results/all/over_time/by_dimension/Accuracy score.csv'
+
+def count_rows(store_path):
+    with sqlite3.connect(store_path) as connection:
+        return connection.execute('SELECT COUNT(*) FROM results').fetchone()[0], connection.execute('SELECT COUNT(*) FROM outputs').fetchone()[0]
+
+def ingest(store_path, analysis_date, run_id):
+    # As update_stats_over_time: read the current table, add the row of the new analysis and write it back
+    store = ResultsStore(store_path, run_id=run_id)
+    table = store.read(PATH)
+    rows = [row for row in (table[1] if table else []) if row[0] != analysis_date] + [[analysis_date, 0.1, 0.9]]
+    store.put(PATH, HEADER, sorted(rows), metric='Accuracy score', date_column=0)
+    store.finish()
+    return store
+
+def test_store_keeps_one_version_per_output(tmp_path):
+    store_path = str(tmp_path / 'results.sqlite')
+    dates = [f'2024-0{month}-01' for month in range(1, 10)]
+    for run, analysis_date in enumerate(dates):
+        ingest(store_path, analysis_date, f'run-{run}')
+    assert count_rows(store_path) == (len(dates), 1)
+
+    store = ingest(store_path, dates[3], 'rerun')
+    assert count_rows(store_path) == (len(dates), 1)
+    header, rows = store.read(PATH)
+    assert header == HEADER
+    assert [row[0] for row in rows] == dates
+    assert len(store.query(metric='Accuracy score')) == len(dates)
+
+def test_run_ids_are_unique(tmp_path):
+    store_path = str(tmp_path / 'results.sqlite')
+    stores = [ResultsStore(store_path) for _ in range(20)]
+    assert len({store.run_id for store in stores}) == len(stores)
+
+def test_previous_versions_are_pruned(tmp_path):
+    store_path = str(tmp_path / 'results.sqlite')
+    for run_id, started in (('old', '2024-01-01T00:00:00'), ('new', '2024-02-01T00:00:00')):
+        store = ResultsStore(store_path, run_id=run_id)
+        with store.connection:
+            store.connection.execute('UPDATE runs SET started = ? WHERE run_id = ?', (started, run_id))
+            # Version written by a store that kept every run
+            store.connection.execute('INSERT INTO outputs VALUES (?, ?, NULL, ?, ?)', (run_id, PATH, '["Analysis date"]', '\r\n'))
+            store.connection.executemany('INSERT INTO results VALUES (?, ?, ?, NULL, NULL, NULL, ?)',
+                                         [(run_id, PATH, position, f'["{run_id}"]') for position in range(3)])
+        store.connection.close()
+
+    store = ResultsStore(store_path)
+    assert count_rows(store_path) == (3, 1)
+    assert store.read(PATH) == (['Analysis date'], [['new']] * 3)
+
+def test_frame_is_parsed_as_the_exported_csv(tmp_path):
+    store = ResultsStore(str(tmp_path / 'results.sqlite'), run_id='run')
+    path = 'evaluation_results/2024/media/punctual/dimensions_stats.csv'
+    store.put(path, ['Dimension', 'Min', 'Max', 'Mean'], [['Accuracy', 0.0, 1.0, 0.5], ['Licensing', 0.25, None, 0.75]])
+    store.export_csv(data_path=str(tmp_path))
+
+    pd.testing.assert_frame_equal(store.frame(path), pd.read_csv(tmp_path / path))
+    with pytest.raises(KeyError):
+        store.frame('evaluation_results/2024/unknown-topic/punctual/categories_stats.csv')
@@ -0,0 +1,132 @@
+from itertools import combinations, permutations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from significance import SignificanceTests, correct_p_values, rank_columns
+
+def significance_on(samples):
+    '''
+        SignificanceTests on the given values of a metric for every topic, without reading the snapshots.
+    '''
+    significance = SignificanceTests.__new__(SignificanceTests)
+    significance.topics = list(samples)
+    significance.data = {topic: pd.DataFrame({metric: pd.Series(values, dtype=float) for metric, values in metrics.items()})
+                         for topic, metrics in samples.items()}
+    return significance
+
+def h_statistic(samples):
+    # Textbook Kruskal-Wallis H with the tie correction
+    values = np.concatenate(samples)
+    n = len(values)
+    ranks = pd.Series(values).rank().to_numpy()
+    rank_sums = [part.sum() for part in np.split(ranks, np.cumsum([len(sample) for sample in samples])[:-1])]
+    h = 12 / (n * (n + 1)) * sum(rank_sum ** 2 / len(sample) for rank_sum, sample in zip(rank_sums, samples)) - 3 * (n + 1)
+    ties = pd.Series(values).value_counts().to_numpy()
+    return h / (1 - (ties ** 3 - ties).sum() / (n ** 3 - n))
+
+def exact_kruskal_p_value(samples):
+    # Fraction of all the distinct assignments of the values to the groups with an H at least as large as the observed one
+    values = np.concatenate(samples)
+    sizes = [len(sample) for sample in samples]
+    observed = h_statistic(samples)
+    labels = np.repeat(np.arange(len(sizes)), sizes)
+    assignments = {tuple(permutation) for permutation in permutations(labels)}
+    extreme = sum(h_statistic([values[np.array(assignment) == group] for group in range(len(sizes))]) >= observed - 1e-9 for assignment in assignments)
+    return extreme / len(assignments)
+
+def exact_mann_whitney_p_value(a, b):
+    values = np.concatenate([a, b])
+    ranks = pd.Series(values).rank().to_numpy()
+    center = len(a) * len(b) / 2
+    observed = abs(ranks[:len(a)].sum() - len(a) * (len(a) + 1) / 2 - center)
+    splits = list(combinations(range(len(values)), len(a)))
+    extreme = sum(abs(ranks[list(split)].sum() - len(a) * (len(a) + 1) / 2 - center) >= observed - 1e-9 for split in splits)
+    return extreme / len(splits)
+
+SAMPLES = {
+    'geography': {'Accuracy score': [0.1, 0.4, 0.4, 0.35], 'Licensing score': [1.0, 0.5, 0.5, 0.0]},
+    'media': {'Accuracy score': [0.8, 0.9, 0.4], 'Licensing score': [0.5, 1.0, 1.0]},
+    'linguistic': {'Accuracy score': [0.6, 0.7], 'Licensing score': [0.0, 0.5]},
+}
+
+def test_rank_columns():
+    values = np.array([[3.0, 1.0], [1.0, 1.0], [3.0, 1.0], [2.0, 1.0]])
+    ranks, ties = rank_columns(values)
+    assert ranks[:, 0].tolist() == [3.5, 1.0, 3.5, 2.0] and ranks[:, 1].tolist() == [2.5] * 4
+    assert ties.tolist() == [6.0, 60.0]
+
+def test_kruskal_wallis_matches_the_exact_test():
+    results = significance_on(SAMPLES).kruskal_wallis(['Accuracy score', 'Licensing score'], n_permutations=20000)
+    for metric, row in zip(['Accuracy score', 'Licensing score'], results.to_dict('records')):
+        samples = [np.array(SAMPLES[topic][metric]) for topic in SAMPLES]
+        assert row['Dimension'] == metric and row['Number of KGs'] == 9
+        assert row['H'] == pytest.approx(h_statistic(samples))
+        # Monte Carlo error of 20000 permutations
+        assert row['p-value'] == pytest.approx(exact_kruskal_p_value(samples), abs=0.015)
+
+def test_kruskal_wallis_matches_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    results = significance_on(SAMPLES).kruskal_wallis(['Accuracy score', 'Licensing score'], n_permutations=100)
+    for metric, h in zip(['Accuracy score', 'Licensing score'], results['H']):
+        assert h == pytest.approx(stats.kruskal(*[SAMPLES[topic][metric] for topic in SAMPLES]).statistic)
+
+def test_kruskal_wallis_constant_metric_is_not_significant():
+    samples = {topic: {'Security score': [1.0] * size, 'Accuracy score': values['Accuracy score']}
+               for (topic, values), size in zip(SAMPLES.items(), (4, 3, 2))}
+    results = significance_on(samples).kruskal_wallis(['Security score', 'Accuracy score'], n_permutations=2000)
+    constant = results.iloc[0]
+    assert np.isnan(constant['H']) and np.isnan(constant['p-value']) and np.isnan(constant['p-value (Holm)'])
+    # The constant metric is not part of the family corrected with Holm
+    assert results.iloc[1]['p-value (Holm)'] == results.iloc[1]['p-value']
+
+def test_kruskal_wallis_one_topic_with_values():
+    samples = {'geography': {'Accuracy score': [0.1, 0.4, 0.3]}, 'media': {'Accuracy score': []}, 'linguistic': {'Accuracy score': []}}
+    row = significance_on(samples).kruskal_wallis(['Accuracy score'], n_permutations=100).iloc[0]
+    assert row['Number of KGs'] == 3 and np.isnan(row['H']) and np.isnan(row['p-value'])
+
+def test_kruskal_wallis_empty_topic_is_left_out():
+    samples = dict(SAMPLES, publications={'Accuracy score': [], 'Licensing score': []})
+    with_empty = significance_on(samples).kruskal_wallis(['Accuracy score'], n_permutations=2000)
+    without = significance_on(SAMPLES).kruskal_wallis(['Accuracy score'], n_permutations=2000)
+    assert with_empty['H'].tolist() == without['H'].tolist()
+
+def test_pairwise_matches_the_exact_test():
+    results = significance_on(SAMPLES).pairwise(['Accuracy score', 'Licensing score'], n_permutations=20000)
+    assert len(results) == 6
+    for row in results.to_dict('records'):
+        a = np.array(SAMPLES[row['Topic A']][row['Dimension']])
+        b = np.array(SAMPLES[row['Topic B']][row['Dimension']])
+        ranks = pd.Series(np.concatenate([a, b])).rank().to_numpy()
+        u_statistic = ranks[:len(a)].sum() - len(a) * (len(a) + 1) / 2
+        assert (row['KGs in A'], row['KGs in B']) == (len(a), len(b))
+        assert row['U'] == u_statistic
+        assert row['Rank-biserial correlation'] == pytest.approx(2 * u_statistic / (len(a) * len(b)) - 1)
+        assert row['p-value'] == pytest.approx(exact_mann_whitney_p_value(a, b), abs=0.015)
+
+def test_pairwise_matches_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    results = significance_on(SAMPLES).pairwise(['Accuracy score'], n_permutations=100)
+    for row in results.to_dict('records'):
+        a, b = SAMPLES[row['Topic A']]['Accuracy score'], SAMPLES[row['Topic B']]['Accuracy score']
+        assert row['U'] == pytest.approx(stats.mannwhitneyu(a, b).statistic)
+
+def test_pairwise_constant_metric_is_not_significant():
+    samples = {'geography': {'Security score': [1.0, 1.0, 1.0]}, 'media': {'Security score': [1.0, 1.0]}}
+    row = significance_on(samples).pairwise(['Security score'], n_permutations=500).iloc[0]
+    assert row['p-value'] == 1.0 and row['Rank-biserial correlation'] == 0.0
+
+def test_holm_correction():
+    corrected = correct_p_values([0.01, 0.04, np.nan, 0.03, 0.005], 'holm')
+    assert corrected[[0, 1, 3, 4]] == pytest.approx([0.03, 0.06, 0.06, 0.02])
+    assert np.isnan(corrected[2])
+    assert correct_p_values([0.5, 0.6], 'holm').tolist() == [1.0, 1.0]
+
+def test_benjamini_hochberg_correction():
+    corrected = correct_p_values([0.01, 0.04, np.nan, 0.03, 0.005], 'bh')
+    assert corrected[[0, 1, 3, 4]] == pytest.approx([0.02, 0.04, 0.04, 0.02])
+    assert np.isnan(corrected[2])
+    assert np.isnan(correct_p_values([np.nan], 'bh')).all()
+    with pytest.raises(ValueError):
+        correct_p_values([0.1], 'bonferroni')
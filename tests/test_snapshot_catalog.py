@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+import snapshot_catalog
+from snapshot_catalog import CATALOG_VERSION, SnapshotCatalog
+
+def write_snapshot(folder, name, status):
+    path = os.path.join(folder, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(f'KG id,Sparql endpoint,Availability score\nkg-1,{status},0.5\nkg-2,{status},1.0\n')
+    return path
+
+def test_save_replaces_the_catalog(tmp_path):
+    catalog_path = str(tmp_path / 'snapshot_catalog.json')
+    paths = [write_snapshot(tmp_path, '2024-11-17.csv', 'Available'), write_snapshot(tmp_path, '2024-11-24.csv', 'offline')]
+    catalog = SnapshotCatalog(catalog_path)
+    assert catalog.refresh(paths) == paths
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+    with open(catalog_path, encoding='utf-8') as file:
+        assert json.load(file)['version'] == CATALOG_VERSION
+    reopened = SnapshotCatalog(catalog_path)
+    assert reopened.refresh(paths) == []
+    assert reopened.select(paths, where=[('Sparql endpoint', '==', 'Available')]) == paths[:1]
+
+def test_unreadable_catalog_is_empty(tmp_path):
+    catalog_path = str(tmp_path / 'snapshot_catalog.json')
+    paths = [write_snapshot(tmp_path, '2024-11-17.csv', 'Available')]
+    SnapshotCatalog(catalog_path).refresh(paths)
+    with open(catalog_path, 'r+', encoding='utf-8') as file:
+        # As a catalog truncated while it was written
+        file.truncate(os.path.getsize(catalog_path) // 2)
+
+    catalog = SnapshotCatalog(catalog_path)
+    assert catalog.entries == {}
+    assert catalog.refresh(paths) == paths
+    assert SnapshotCatalog(catalog_path).refresh(paths) == []
+
+    for content in ('', '[]', '{"version": 1}'):
+        with open(catalog_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        assert SnapshotCatalog(catalog_path).entries == {}
+
+def test_interrupted_save_keeps_the_previous_catalog(tmp_path, monkeypatch):
+    catalog_path = str(tmp_path / 'snapshot_catalog.json')
+    paths = [write_snapshot(tmp_path, '2024-11-17.csv', 'Available')]
+    catalog = SnapshotCatalog(catalog_path)
+    catalog.refresh(paths)
+
+    def interrupted_dump(data, file, **kwargs):
+        file.write('{"version": ')
+        raise KeyboardInterrupt
+    monkeypatch.setattr(snapshot_catalog.json, 'dump', interrupted_dump)
+    with pytest.raises(KeyboardInterrupt):
+        catalog.save()
+    monkeypatch.undo()
+    assert SnapshotCatalog(catalog_path).refresh(paths) == []
@@ -0,0 +1,44 @@
+import json
+
+import pandas as pd
+import pytest
+
+import kg_id_dictionary
+from snapshot_diff import SnapshotDiff
+
+COLUMNS = ['Sparql endpoint', 'Availability score', 'Understandability score']
+
+@pytest.fixture(autouse=True)
+def dictionary(tmp_path, monkeypatch):
+    # An empty dictionary, so that the test does not build it from the LOD Cloud dump
+    dictionary_path = tmp_path / 'kg_id_dictionary.json'
+    with open(dictionary_path, 'w', encoding='utf-8') as file:
+        json.dump({'topics': [], 'ids': [], 'in_lodc': [], 'topic_bits': []}, file)
+    monkeypatch.setattr(kg_id_dictionary, '_dictionary', kg_id_dictionary.KGIdDictionary(str(dictionary_path)))
+
+def write_snapshot(tmp_path, analysis_date, rows):
+    path = tmp_path / f'{analysis_date}.csv'
+    pd.DataFrame(rows, columns=['KG id'] + COLUMNS).to_csv(path, index=False)
+    return str(path)
+
+def test_diff_of_two_snapshots(tmp_path):
+    old = write_snapshot(tmp_path, '2024-06-02', [['a', 'Available', 1.0, 0.5], ['b', 'offline', 0.5, 0.5], ['gone', 'Available', 1.0, 0.5]])
+    new = write_snapshot(tmp_path, '2024-06-09', [['b', 'Available', 0.25, 0.5], ['a', 'Available', 1.0, 0.75], ['new', 'Available', 1.0, 0.5]])
+    feed = SnapshotDiff(COLUMNS).diff(old, new)
+    assert feed.to_dict('records') == [
+        {'KG id': 'b', 'Column': 'Sparql endpoint', 'Old': 'offline', 'New': 'Available', 'Delta': pytest.approx(float('nan'), nan_ok=True)},
+        {'KG id': 'b', 'Column': 'Availability score', 'Old': 0.5, 'New': 0.25, 'Delta': -0.25},
+        {'KG id': 'a', 'Column': 'Understandability score', 'Old': 0.5, 'New': 0.75, 'Delta': 0.25},
+        {'KG id': 'gone', 'Column': 'Presence', 'Old': 'present', 'New': 'absent', 'Delta': pytest.approx(float('nan'), nan_ok=True)},
+        {'KG id': 'new', 'Column': 'Presence', 'Old': 'absent', 'New': 'present', 'Delta': pytest.approx(float('nan'), nan_ok=True)},
+    ]
+
+def test_columns_calculated_differently_are_not_compared(tmp_path):
+    # The Understandability score changed calculation after May 5, 2024
+    old = write_snapshot(tmp_path, '2024-04-28', [['a', 'Available', 1.0, 0.2]])
+    new = write_snapshot(tmp_path, '2024-05-12', [['a', 'Available', 0.5, 0.9]])
+    feed = SnapshotDiff(COLUMNS).diff(old, new)
+    assert feed[['KG id', 'Column', 'Delta']].values.tolist() == [['a', 'Availability score', -0.5]]
+
+    change_log = SnapshotDiff(COLUMNS).change_log([new, old])
+    assert change_log['Column'].tolist() == ['Availability score']
@@ -0,0 +1,160 @@
+import os
+import time
+from snapshot_watcher import SnapshotWatcher
+
+def write(file_path, content):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+def poll(watcher, seconds):
+    '''
+        Run the polling loop of the watcher for some seconds, processing the snapshots that became ready, and return them in order.
+    '''
+    ready = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        watcher._wait_for_changes()
+        for file_path in watcher.check():
+            watcher.process(file_path)
+            ready.append(file_path)
+    return ready
+
+def polling_watcher(watch_dir, on_snapshot=lambda file_path: None, **kwargs):
+    return SnapshotWatcher(str(watch_dir), on_snapshot, debounce=0.3, poll_interval=0.02, use_inotify=False, **kwargs)
+
+def failing_on(*failing):
+    def on_snapshot(file_path):
+        if file_path in failing:
+            raise ValueError('broken snapshot')
+    return on_snapshot
+
+def test_other_files_are_ignored(tmp_path):
+    watcher = polling_watcher(tmp_path)
+    write(tmp_path / 'notes.csv', 'x\n')
+    write(tmp_path / '2024-11-24.txt', 'x\n')
+
+    assert poll(watcher, 0.5) == []
+
+def test_new_snapshot_is_ready_only_after_the_debounce(tmp_path):
+    watcher = polling_watcher(tmp_path)
+    snapshot = str(tmp_path / '2024-11-24.csv')
+    write(snapshot, 'KG id\n')
+    # The file keeps growing for longer than the debounce interval
+    for row in range(4):
+        assert poll(watcher, 0.15) == []
+        with open(snapshot, 'a', encoding='utf-8') as file:
+            file.write(f'kg{row}\n')
+
+    assert poll(watcher, 0.6) == [snapshot]
+    # Processed once
+    assert poll(watcher, 0.5) == []
+
+def test_snapshot_overwritten_after_processing_is_processed_again(tmp_path):
+    watcher = polling_watcher(tmp_path)
+    snapshot = str(tmp_path / '2024-11-24.csv')
+    write(snapshot, 'KG id\na\n')
+    assert poll(watcher, 0.6) == [snapshot]
+
+    write(snapshot, 'KG id\na\nb\n')
+    assert poll(watcher, 0.6) == [snapshot]
+
+    # Touching an existing snapshot re-triggers it too, as inotify would
+    stat = os.stat(snapshot)
+    os.utime(snapshot, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert poll(watcher, 0.6) == [snapshot]
+
+def test_snapshots_not_done_before_a_restart_are_processed(tmp_path):
+    log_path = str(tmp_path / 'log.jsonl')
+    done, overwritten, failed, missed = (str(tmp_path / f'2024-11-{day:02d}.csv') for day in (3, 10, 17, 24))
+    for snapshot in (done, overwritten, failed):
+        write(snapshot, 'KG id\na\n')
+    assert poll(polling_watcher(tmp_path, failing_on(failed), log_path=log_path), 0.6) == [done, overwritten, failed]
+
+    # While the watcher is down a new snapshot is written and a done one is overwritten
+    write(missed, 'KG id\na\n')
+    write(overwritten, 'KG id\na\nb\n')
+    assert poll(polling_watcher(tmp_path, log_path=log_path), 0.6) == [overwritten, failed, missed]
+
+    # Everything is done now
+    assert poll(polling_watcher(tmp_path, log_path=log_path), 0.5) == []
+
+def test_snapshots_already_ingested_without_a_record_are_skipped(tmp_path):
+    old, new = str(tmp_path / '2024-11-17.csv'), str(tmp_path / '2024-11-24.csv')
+    write(old, 'KG id\na\n')
+    write(new, 'KG id\na\n')
+    watcher = polling_watcher(tmp_path, log_path=str(tmp_path / 'log.jsonl'), ingested=lambda file_path: file_path == old)
+    assert poll(watcher, 0.6) == [new]
+
+def test_failed_snapshot_is_retried(tmp_path):
+    attempts = []
+    def on_snapshot(file_path):
+        attempts.append(file_path)
+        if len(attempts) == 1:
+            raise OSError('disk full')
+    watcher = polling_watcher(tmp_path, on_snapshot, retry_interval=0.8)
+    snapshot = str(tmp_path / '2024-11-24.csv')
+    write(snapshot, 'KG id\na\n')
+
+    assert poll(watcher, 0.45) == [snapshot]
+    # Not retried before the retry interval
+    assert poll(watcher, 0.2) == []
+    assert poll(watcher, 1.2) == [snapshot]
+    # Done at the second attempt
+    assert poll(watcher, 0.6) == []
+    assert attempts == [snapshot, snapshot]
+
+def test_failed_snapshot_is_retried_when_overwritten(tmp_path):
+    snapshot = str(tmp_path / '2024-11-24.csv')
+    attempts = []
+    def on_snapshot(file_path):
+        attempts.append(file_path)
+        if len(attempts) == 1:
+            raise ValueError('truncated snapshot')
+    watcher = polling_watcher(tmp_path, on_snapshot)
+    write(snapshot, 'KG id\n')
+    assert poll(watcher, 0.6) == [snapshot]
+
+    write(snapshot, 'KG id\na\n')
+    assert poll(watcher, 0.6) == [snapshot]
+    assert poll(watcher, 0.5) == []
+    assert len(attempts) == 2
+
+def test_snapshots_left_by_stop_are_processed_by_the_next_run(tmp_path):
+    log_path = str(tmp_path / 'log.jsonl')
+    snapshots = [str(tmp_path / f'2024-11-{day}.csv') for day in (17, 24)]
+    for snapshot in snapshots:
+        write(snapshot, 'KG id\na\n')
+    processed = []
+    def on_snapshot(file_path):
+        processed.append(file_path)
+        watcher.stop()
+    watcher = SnapshotWatcher(str(tmp_path), on_snapshot, debounce=0.2, poll_interval=0.02, use_inotify=False, log_path=log_path)
+    watcher.run(timeout=2)
+    assert processed == snapshots[:1]
+
+    restarted = []
+    SnapshotWatcher(str(tmp_path), restarted.append, debounce=0.2, poll_interval=0.02, use_inotify=False, log_path=log_path).run(timeout=0.6)
+    assert restarted == snapshots[1:]
+
+def test_run_processes_the_new_snapshots_until_the_timeout(tmp_path):
+    processed = []
+    watcher = SnapshotWatcher(str(tmp_path), processed.append, debounce=0.2, poll_interval=0.02, use_inotify=False,
+                              log_path=str(tmp_path / 'log.jsonl'))
+    write(tmp_path / '2024-11-24.csv', 'KG id\na\n')
+    watcher.run(timeout=0.8)
+
+    assert processed == [str(tmp_path / '2024-11-24.csv')]
+    with open(tmp_path / 'log.jsonl', encoding='utf-8') as file:
+        assert '"status": "done"' in file.read()
+
+def test_snapshots_not_done_are_processed_with_inotify(tmp_path):
+    log_path = str(tmp_path / 'log.jsonl')
+    done, missed = str(tmp_path / '2024-11-17.csv'), str(tmp_path / '2024-11-24.csv')
+    write(done, 'KG id\na\n')
+    SnapshotWatcher(str(tmp_path), lambda file_path: None, debounce=0.2, poll_interval=0.02, use_inotify=False, log_path=log_path).run(timeout=0.6)
+    write(missed, 'KG id\na\n')
+
+    processed = []
+    watcher = SnapshotWatcher(str(tmp_path), processed.append, debounce=0.2, poll_interval=0.05, log_path=log_path)
+    watcher.run(timeout=0.8)
+    assert processed == [missed]
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from sparql_prober import ASK_QUERY, SparqlProber
+
+ASK_RESULT = json.dumps({'head': {}, 'boolean': True}).encode()
+SELECT_RESULT = json.dumps({'head': {'vars': ['s']}, 'results': {'bindings': [{'s': {'type': 'uri', 'value': 'http://example.org/s'}}]}}).encode()
+HTML_PAGE = b'<html><body>Welcome to our SPARQL endpoint</body></html>'
+
+class Endpoint(BaseHTTPRequestHandler):
+    '''
+        Stand-in for the SPARQL endpoints, the path selects the behaviour:
+        /ask answers every query, /select answers only the SELECT queries, /html returns a page with status 200, /slow never answers in time,
+        /redirect redirects to /ask, /chunked answers with a chunked body and /close closes the connection after every response.
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type='application/sparql-results+json', chunked=False, close=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if close:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(body), 7):
+                chunk = body[start:start + 7]
+                self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query).get('query', [''])[0]
+        host = self.headers['Host'].split(':')[0]
+        server = self.server
+        with server.lock:
+            server.requests.append((host, parts.path, self.client_address, time.monotonic()))
+            server.in_flight[host] = server.in_flight.get(host, 0) + 1
+            server.max_in_flight[host] = max(server.max_in_flight.get(host, 0), server.in_flight[host])
+        try:
+            time.sleep(server.delay)
+            result = ASK_RESULT if query == ASK_QUERY else SELECT_RESULT
+            if parts.path.startswith('/ask'):
+                self.send(200, result)
+            elif parts.path == '/select':
+                if query == ASK_QUERY:
+                    self.send(400, b'ASK queries are not supported', 'text/plain')
+                else:
+                    self.send(200, SELECT_RESULT)
+            elif parts.path == '/html':
+                self.send(200, HTML_PAGE, 'text/html')
+            elif parts.path == '/slow':
+                time.sleep(1)
+                self.send(200, result)
+            elif parts.path == '/redirect':
+                self.send_response(303)
+                self.send_header('Location', '/ask/redirected')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+            elif parts.path == '/chunked':
+                self.send(200, result, chunked=True)
+            elif parts.path == '/close':
+                self.send(200, result, close=True)
+            else:
+                self.send(404, b'Not found', 'text/plain')
+        except OSError:
+            # The prober gave up on the request
+            self.close_connection = True
+        finally:
+            with server.lock:
+                server.in_flight[host] -= 1
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Endpoint)
+    server.daemon_threads = True
+    server.block_on_close = False
+    server.lock = threading.Lock()
+    server.requests = []
+    server.in_flight = {}
+    server.max_in_flight = {}
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def endpoint(server, path, host='127.0.0.1'):
+    return f'http://{host}:{server.server_address[1]}{path}'
+
+def prober(**kwargs):
+    settings = {'timeout': 0.3, 'deadline': 3.0, 'latency_queries': 3, 'throughput_window': 0.05}
+    settings.update(kwargs)
+    return SparqlProber(**settings)
+
+def probe(server, path, **kwargs):
+    return prober(**kwargs).run([endpoint(server, path)]).iloc[0]
+
+def test_ask(server):
+    result = probe(server, '/ask')
+    assert result['Available'] and result['Query'] == 'ASK' and result['HTTP status'] == 200 and result['Error'] == ''
+    assert result['Latency (ms)'] > 0 and result['Throughput (queries/s)'] > 0
+    assert result['Latency score'] == 1.0 and 0 < result['Performance score'] <= 1.0
+    # All the queries of the endpoint are sent on the same kept-alive connection
+    assert len({client for host, path, client, moment in server.requests}) == 1
+
+def test_select_fallback(server):
+    result = probe(server, '/select')
+    assert result['Available'] and result['Query'] == 'SELECT' and result['HTTP status'] == 200
+    assert [path for host, path, client, moment in server.requests].count('/select') > 2
+
+def test_html_page_is_not_available(server):
+    result = probe(server, '/html')
+    assert not result['Available'] and result['HTTP status'] == 200
+    assert result['Error'] == 'No SPARQL result (HTTP 200)'
+    assert result['Performance score'] == 0.0
+
+def test_timeout(server):
+    start = time.monotonic()
+    result = probe(server, '/slow')
+    assert not result['Available'] and result['Error'] == 'Timeout'
+    assert time.monotonic() - start < 1
+
+def test_deadline(server):
+    server.delay = 0.02
+    result = probe(server, '/ask', deadline=0.3, throughput_window=1.0)
+    # The endpoint answered, only the measure of the throughput is incomplete
+    assert result['Available'] and result['Error'] == 'Timeout'
+    assert result['Latency (ms)'] > 0 and result['Throughput (queries/s)'] != result['Throughput (queries/s)']
+
+def test_redirect_chunked_and_closed_connections(server):
+    probes = prober().run([endpoint(server, path) for path in ('/redirect', '/chunked', '/close')])
+    assert probes['Available'].all() and (probes['Query'] == 'ASK').all()
+    paths = [path for host, path, client, moment in server.requests]
+    # The redirect is followed once, the next queries go to the new location
+    assert paths.count('/redirect') == 1 and paths.count('/ask/redirected') > 2
+    assert len({client for host, path, client, moment in server.requests if path == '/close'}) == paths.count('/close')
+
+def test_unreachable_endpoint(server):
+    probes = prober().run(['http://127.0.0.1:9/sparql', 'ftp://example.org/sparql'])
+    assert not probes['Available'].any()
+    assert probes['Error'].str.startswith(('ConnectionRefusedError', 'OSError', 'HTTPError')).all()
+
+def test_per_host_limit(server):
+    server.delay = 0.02
+    urls = [endpoint(server, f'/ask/{index}') for index in range(6)] + [endpoint(server, f'/ask/{index}', 'localhost') for index in range(6)]
+    probes = prober(per_host=2).run(urls)
+    assert probes['Available'].all()
+    assert server.max_in_flight == {'127.0.0.1': 2, 'localhost': 2}
+
+def test_busy_host_does_not_hold_the_global_slots(server):
+    server.delay = 0.02
+    urls = [endpoint(server, f'/ask/{index}') for index in range(3)] + [endpoint(server, '/ask/other', 'localhost')]
+    probes = prober(max_concurrency=2, per_host=1, throughput_window=0.2).run(urls)
+    assert probes['Available'].all()
+    first_end = max(moment for host, path, client, moment in server.requests if path == '/ask/0')
+    other_start = min(moment for host, path, client, moment in server.requests if path == '/ask/other')
+    # The other host is probed while the first endpoint is, not after the probes queued for the busy host took the global slots
+    assert other_start < first_end
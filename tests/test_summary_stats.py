@@ -0,0 +1,65 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import summary_stats
+
+def pandas_stats(series):
+    with warnings.catch_warnings():
+        # pandas warns about the median of an empty column
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return [series.min(), series.quantile(0.25), series.median(), series.quantile(0.75), series.max(), series.mean()]
+
+def assert_same(row, expected):
+    # The statistics must be the ones of pandas to the last digit, NaN included
+    assert len(row) == len(expected)
+    for value, reference in zip(row, expected):
+        if pd.isna(reference):
+            assert np.isnan(value)
+        else:
+            assert value == reference and type(value) is type(reference.item() if hasattr(reference, 'item') else reference)
+
+def random_frame(rng, rows, columns):
+    values = rng.choice([rng.random(), 0.0, 1.0, np.nan], size=(rows, columns)) + rng.normal(scale=1e3, size=(rows, columns)) * rng.integers(0, 2, size=(rows, columns))
+    return pd.DataFrame(values)
+
+def test_compute_matches_pandas():
+    rng = np.random.default_rng(45)
+    for rows in (0, 1, 2, 3, 4, 5, 7, 10, 101, 1000):
+        df = random_frame(rng, rows, 6)
+        # All-NaN column and column with a single value
+        df[6] = np.nan
+        if rows:
+            df[7] = [np.nan] * (rows - 1) + [0.3]
+        for stats, column in zip(summary_stats.compute(df.to_numpy()), df.columns):
+            assert_same(summary_stats.to_row(stats), pandas_stats(df[column]))
+
+def test_compute_one_column():
+    values = np.array([0.5, np.nan, 0.1, 0.9, 0.3])
+    assert_same(summary_stats.to_row(summary_stats.compute(values)[0]), pandas_stats(pd.Series(values)))
+
+def test_integer_columns():
+    rng = np.random.default_rng(46)
+    for rows in (1, 2, 5, 40):
+        series = pd.Series(rng.integers(-100, 10 ** 6, size=rows))
+        row = summary_stats.to_row(summary_stats.compute(series.to_numpy(dtype=float))[0], integer=True)
+        assert_same(row, pandas_stats(series))
+    assert all(np.isnan(value) for value in summary_stats.to_row(summary_stats.compute(np.array([np.nan]))[0], integer=True))
+
+def test_compute_grouped_matches_pandas():
+    rng = np.random.default_rng(47)
+    n_groups = 12
+    values = random_frame(rng, 500, 1)[0].to_numpy()
+    # Group 3 is all NaN, groups 5 and 11 (the last one) are empty
+    codes = rng.choice([code for code in range(n_groups) if code not in (5, 11)], size=len(values))
+    values[codes == 3] = np.nan
+
+    stats = summary_stats.compute_grouped(values, codes, n_groups)
+    assert stats.shape == (n_groups, len(summary_stats.STATS))
+    series = pd.Series(values)
+    for group in range(n_groups):
+        assert_same(summary_stats.to_row(stats[group]), pandas_stats(series[codes == group]))
+
+    assert_same(summary_stats.to_row(summary_stats.compute_grouped(values, codes)[3]), pandas_stats(series[codes == 3]))
+    assert summary_stats.compute_grouped(np.array([]), np.array([], dtype=int)).shape == (0, len(summary_stats.STATS))